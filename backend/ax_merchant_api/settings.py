@@ -300,6 +300,22 @@ AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME", "assuredexpress")
 
 # Ably Configuration
 ABLY_API_KEY = os.getenv("ABLY_API_KEY", "")
+# Process-wide publisher (dispatcher.ably_publisher): bounded queue, per-channel batches
+ABLY_PUBLISH_QUEUE_SIZE = int(os.getenv("ABLY_PUBLISH_QUEUE_SIZE", "10000"))
+ABLY_PUBLISH_BATCH_SIZE = int(os.getenv("ABLY_PUBLISH_BATCH_SIZE", "100"))
+# Post-commit side effects (dispatcher.side_effects): "thread" pool, "celery" or "inline"
+SIDE_EFFECTS_BACKEND = os.getenv("SIDE_EFFECTS_BACKEND", "thread")
+SIDE_EFFECTS_WORKERS = int(os.getenv("SIDE_EFFECTS_WORKERS", "4"))
+SIDE_EFFECTS_QUEUE_SIZE = int(os.getenv("SIDE_EFFECTS_QUEUE_SIZE", "1000"))
+# AblyTokenView: token lifetime (Ably max 24h) and how long before expiry a cached token is replaced
+ABLY_TOKEN_TTL_MS = int(os.getenv("ABLY_TOKEN_TTL_MS", str(24 * 60 * 60 * 1000)))
+ABLY_TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("ABLY_TOKEN_REFRESH_MARGIN_SECONDS", "3600"))
+
+# Vehicle telemetry broadcast: publish only assets that moved/changed, with a
+# periodic full snapshot so clients can resync.
+VEHICLE_TELEMETRY_MIN_MOVE_METERS = float(os.getenv("VEHICLE_TELEMETRY_MIN_MOVE_METERS", "20"))
+VEHICLE_TELEMETRY_SNAPSHOT_SECONDS = int(os.getenv("VEHICLE_TELEMETRY_SNAPSHOT_SECONDS", "300"))
+VEHICLE_TELEMETRY_MAX_MESSAGE_BYTES = int(os.getenv("VEHICLE_TELEMETRY_MAX_MESSAGE_BYTES", "60000"))
 
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
@@ -321,6 +337,22 @@ CELERY_BEAT_SCHEDULE = {
         "task": "webhooks.tasks.webhook_retry_cron",
         "schedule": 30.0,
     },
+    "flush-rider-locations": {
+        "task": "riders.tasks.flush_rider_locations",
+        "schedule": float(os.getenv("RIDER_GPS_FLUSH_SECONDS", "5")),
+    },
+    "compact-rider-location-history": {
+        "task": "riders.tasks.compact_rider_location_history",
+        "schedule": crontab(hour=3, minute=15),
+    },
+    "drain-notification-outbox": {
+        "task": "riders.tasks.drain_notification_outbox",
+        "schedule": float(os.getenv("NOTIFICATION_OUTBOX_DRAIN_SECONDS", "2")),
+    },
+    "purge-notification-outbox": {
+        "task": "riders.tasks.purge_notification_outbox",
+        "schedule": crontab(hour=3, minute=45),
+    },
 }
 
 # Production Security Settings
@@ -346,3 +378,63 @@ RESPOND_IO_BASE_URL = os.getenv("RESPOND_IO_BASE_URL", "https://api.respond.io/v
 
 # Google Maps API Configuration
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
+GOOGLE_DIRECTIONS_URL = os.getenv(
+    "GOOGLE_DIRECTIONS_URL", "https://maps.googleapis.com/maps/api/directions/json"
+)
+GOOGLE_GEOCODE_URL = os.getenv(
+    "GOOGLE_GEOCODE_URL", "https://maps.googleapis.com/maps/api/geocode/json"
+)
+GOOGLE_DISTANCE_MATRIX_URL = os.getenv(
+    "GOOGLE_DISTANCE_MATRIX_URL",
+    "https://maps.googleapis.com/maps/api/distancematrix/json",
+)
+
+# Geocode cache (orders.geocode_cache) and bulk geocoder pool size
+GEOCODE_CACHE_TTL_SECONDS = int(
+    os.getenv("GEOCODE_CACHE_TTL_SECONDS", str(30 * 24 * 3600))
+)
+GEOCODE_MAX_WORKERS = int(os.getenv("GEOCODE_MAX_WORKERS", "8"))
+
+# Route cache (orders.route_cache): geohash precision 8 ≈ 38m x 19m cells
+ROUTE_CACHE_GEOHASH_PRECISION = int(os.getenv("ROUTE_CACHE_GEOHASH_PRECISION", "8"))
+ROUTE_CACHE_TTL_SECONDS = int(os.getenv("ROUTE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+ROUTE_CACHE_DB_MAX_AGE_DAYS = int(os.getenv("ROUTE_CACHE_DB_MAX_AGE_DAYS", "90"))
+
+# Multi-drop routing (orders.utils.route_drops): must finish inside gunicorn's 3s timeout
+ROUTE_DEADLINE_SECONDS = float(os.getenv("ROUTE_DEADLINE_SECONDS", "2.5"))
+ROUTE_MAX_WORKERS = int(os.getenv("ROUTE_MAX_WORKERS", "8"))
+ROUTE_MATRIX_MIN_DROPS = int(os.getenv("ROUTE_MATRIX_MIN_DROPS", "3"))
+# Share of the deadline the Distance Matrix attempt may use before falling back
+ROUTE_MATRIX_DEADLINE_FRACTION = float(os.getenv("ROUTE_MATRIX_DEADLINE_FRACTION", "0.5"))
+# Use the calibrated offline estimator (orders.route_estimator) when Directions fails
+ROUTE_ESTIMATE_FALLBACK = os.getenv("ROUTE_ESTIMATE_FALLBACK", "True") == "True"
+
+# Bulk Import (orders.bulk_import): deliveries per INSERT, and size above which imports run in Celery
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "500"))
+BULK_IMPORT_SYNC_MAX_ROWS = int(os.getenv("BULK_IMPORT_SYNC_MAX_ROWS", "2000"))
+# Order numbers (orders.order_numbers): >1 leases that many numbers per worker per round trip, e.g. 100
+ORDER_NUMBER_BLOCK_SIZE = int(os.getenv("ORDER_NUMBER_BLOCK_SIZE", "1"))
+
+# Relay planner (dispatcher.relay_planner): "distance" = fewest road km, "legs" = fewest handoffs
+RELAY_PLANNER_OBJECTIVE = os.getenv("RELAY_PLANNER_OBJECTIVE", "distance")
+# In-process rider geo-index (dispatcher.rider_index) rebuild interval
+RIDER_INDEX_REFRESH_SECONDS = float(os.getenv("RIDER_INDEX_REFRESH_SECONDS", "15"))
+# New-order push goes to the K nearest eligible riders (dispatcher.fanout)
+NEW_ORDER_FANOUT_K = int(os.getenv("NEW_ORDER_FANOUT_K", "20"))
+# Rider notification outbox (riders.outbox), drained by drain-notification-outbox
+NOTIFICATION_OUTBOX_BATCH = int(os.getenv("NOTIFICATION_OUTBOX_BATCH", "500"))
+NOTIFICATION_MAX_PER_MINUTE = int(os.getenv("NOTIFICATION_MAX_PER_MINUTE", "6000"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+NOTIFICATION_RETRY_BASE_SECONDS = float(os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", "15"))
+NOTIFICATION_OUTBOX_RETENTION_DAYS = int(os.getenv("NOTIFICATION_OUTBOX_RETENTION_DAYS", "7"))
+
+# Buffered GPS ingestion (riders.location_buffer); flushed by flush-rider-locations
+RIDER_GPS_BUFFER_ENABLED = os.getenv("RIDER_GPS_BUFFER_ENABLED", "True") == "True"
+# Device timestamps further ahead of server time than this are rejected
+RIDER_GPS_MAX_FUTURE_SKEW_SECONDS = float(os.getenv("RIDER_GPS_MAX_FUTURE_SKEW_SECONDS", "120"))
+# Rider location history (riders.location_history): raw for RAW_DAYS, then
+# Douglas-Peucker thinned per trip, deleted after RETENTION_DAYS
+RIDER_LOCATION_RAW_DAYS = int(os.getenv("RIDER_LOCATION_RAW_DAYS", "7"))
+RIDER_LOCATION_RETENTION_DAYS = int(os.getenv("RIDER_LOCATION_RETENTION_DAYS", "180"))
+RIDER_LOCATION_SIMPLIFY_METERS = float(os.getenv("RIDER_LOCATION_SIMPLIFY_METERS", "15"))
+RIDER_LOCATION_TRIP_GAP_MINUTES = float(os.getenv("RIDER_LOCATION_TRIP_GAP_MINUTES", "10"))
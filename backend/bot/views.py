@@ -11,7 +11,7 @@ from datetime import datetime, timedelta
 
 from authentication.models import User
 from wallet.models import Wallet, Transaction, VirtualAccount
-from orders.models import Order, Delivery, Vehicle
+from orders.models import Order, Vehicle
 from .authentication import BotAPIKeyAuthentication
 from .permissions import IsBotService, IsBotWithMerchant
 from .serializers import (
@@ -225,11 +225,12 @@ class GetPriceQuoteView(APIView):
         vehicle_type = data.get('vehicle_type', '').lower()
 
         # Import geocoding utility from orders app
-        from orders.utils import geocode_address, calculate_route
+        from orders.utils import geocode_many, calculate_route_or_estimate
 
-        # Geocode addresses
-        pickup_coords = geocode_address(pickup_address)
-        dropoff_coords = geocode_address(dropoff_address)
+        # Geocode both addresses in one cached, concurrent call
+        coords = geocode_many([pickup_address, dropoff_address])
+        pickup_coords = coords.get(pickup_address)
+        dropoff_coords = coords.get(dropoff_address)
 
         if not pickup_coords or not dropoff_coords:
             return Response({
@@ -238,8 +239,8 @@ class GetPriceQuoteView(APIView):
                 'bot_response': "I couldn't find those addresses. Can you be more specific?"
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Calculate route
-        route_data = calculate_route(pickup_coords, [dropoff_coords])
+        # Calculate route (offline estimate if Maps is unreachable)
+        route_data = calculate_route_or_estimate(pickup_coords, [dropoff_coords])
 
         if not route_data:
             return Response({
@@ -250,6 +251,7 @@ class GetPriceQuoteView(APIView):
 
         distance_km = route_data['distance_km']
         duration_minutes = route_data['duration_minutes']
+        estimated = bool(route_data.get('estimated'))
 
         # Get vehicle pricing
         if vehicle_type:
@@ -257,9 +259,13 @@ class GetPriceQuoteView(APIView):
         else:
             vehicles = Vehicle.objects.filter(is_active=True).order_by('base_price')
 
+        from orders.pricing import calculate_effective_fares
+
+        vehicles = list(vehicles)
+        [fares] = calculate_effective_fares(None, vehicles, [(distance_km, duration_minutes)])
+
         prices = []
-        for vehicle in vehicles:
-            price = vehicle.calculate_fare(distance_km, duration_minutes)
+        for vehicle, price in zip(vehicles, fares):
             prices.append({
                 'vehicle': vehicle.name,
                 'price': price,
@@ -274,13 +280,16 @@ class GetPriceQuoteView(APIView):
         else:
             price_lines = [f"{p['vehicle'].title()}: {p['formatted_price']}" for p in prices]
             bot_msg = f"Here are your options:\n" + "\n".join(price_lines) + f"\n\n({prices[0]['distance_km']}km, ~{prices[0]['duration_minutes']} mins)"
+        if estimated:
+            bot_msg += "\n\nMaps is unavailable, so this is an estimate; the final price may differ."
 
         return Response({
             'success': True,
             'data': {
                 'prices': prices,
                 'distance_km': distance_km,
-                'duration_minutes': duration_minutes
+                'duration_minutes': duration_minutes,
+                'estimated': estimated
             },
             'bot_response': bot_msg
         })
@@ -320,11 +329,12 @@ class CreateOrderView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Import geocoding from orders app
-        from orders.utils import geocode_address, calculate_route
+        from orders.utils import geocode_many, calculate_route
 
-        # Geocode addresses
-        pickup_coords = geocode_address(data['pickup_address'])
-        dropoff_coords = geocode_address(data['dropoff_address'])
+        # Geocode both addresses in one cached, concurrent call
+        coords = geocode_many([data['pickup_address'], data['dropoff_address']])
+        pickup_coords = coords.get(data['pickup_address'])
+        dropoff_coords = coords.get(data['dropoff_address'])
 
         if not pickup_coords or not dropoff_coords:
             return Response({
@@ -347,47 +357,43 @@ class CreateOrderView(APIView):
         duration_minutes = route_data['duration_minutes']
         total_amount = vehicle.calculate_fare(distance_km, duration_minutes)
 
-        # Check wallet balance
-        if merchant.wallet.balance < total_amount:
+        # Shared order pipeline: wallet locked and checked, escrow held atomically
+        from orders.services import InsufficientBalance, OrderCreationError, create_order
+
+        try:
+            order = create_order(
+                merchant,
+                vehicle,
+                mode='quick',
+                total_amount=total_amount,
+                order_fields={
+                    'pickup_address': data['pickup_address'],
+                    'sender_name': data['pickup_contact_name'],
+                    'sender_phone': data['pickup_contact_phone'],
+                    'payment_method': 'wallet',
+                    'distance_km': distance_km,
+                    'duration_minutes': duration_minutes,
+                },
+                deliveries=[{
+                    'dropoff_address': data['dropoff_address'],
+                    'receiver_name': data['dropoff_contact_name'],
+                    'receiver_phone': data['dropoff_contact_phone'],
+                    'package_type': data.get('package_type', 'parcel'),
+                    'notes': data.get('dropoff_notes', ''),
+                }],
+            )
+        except InsufficientBalance as e:
             return Response({
                 'success': False,
                 'message': 'Insufficient wallet balance',
-                'bot_response': f"You need {format_currency(total_amount)} but only have {format_currency(merchant.wallet.balance)}. Top up your wallet first."
+                'bot_response': f"You need {format_currency(e.required)} but only have {format_currency(e.available)}. Top up your wallet first."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except OrderCreationError as e:
+            return Response({
+                'success': False,
+                'errors': e.errors,
+                'bot_response': "I couldn't create that order. Check your wallet and try again."
             }, status=status.HTTP_400_BAD_REQUEST)
-
-        # Create order
-        from django.db import transaction as db_transaction
-
-        with db_transaction.atomic():
-            order = Order.objects.create(
-                user=merchant,
-                vehicle=vehicle,
-                mode='quick_send',
-                pickup_address=data['pickup_address'],
-                sender_name=data['pickup_contact_name'],
-                sender_phone=data['pickup_contact_phone'],
-                total_amount=total_amount,
-                distance_km=distance_km,
-                duration_minutes=duration_minutes,
-                status='pending'
-            )
-
-            # Create delivery
-            Delivery.objects.create(
-                order=order,
-                dropoff_address=data['dropoff_address'],
-                receiver_name=data['dropoff_contact_name'],
-                receiver_phone=data['dropoff_contact_phone'],
-                package_type=data.get('package_type', 'parcel'),
-                notes=data.get('dropoff_notes', '')
-            )
-
-            # Deduct from wallet (escrow)
-            merchant.wallet.debit(
-                amount=total_amount,
-                description=f"Order {order.order_number}",
-                reference=f"order_{order.order_number}"
-            )
 
         order_serializer = BotOrderSerializer(order)
 
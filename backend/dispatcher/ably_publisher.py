@@ -0,0 +1,199 @@
+"""
+Long-lived Ably publisher.
+
+One daemon thread per process runs an event loop holding a single AblyRest
+client, so publishes reuse its HTTP connection pool instead of opening a new
+TLS connection and event loop per event. Request code calls ``publish``,
+which only puts the message on a bounded queue and returns; when the queue
+is full the message is dropped and logged rather than blocking the request.
+
+Each time the loop wakes it drains everything queued, groups it by channel
+and sends each channel's messages as one multi-message publish (up to
+ABLY_PUBLISH_BATCH_SIZE), so a burst of events costs a handful of requests.
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 100
+# After a wake-up, wait this long for more of the burst before publishing.
+PUBLISH_LINGER_SECONDS = 0.01
+MAX_CONCURRENT_PUBLISHES = 8
+
+
+def _default_client_factory(api_key):
+    from ably import AblyRest
+
+    return AblyRest(api_key)
+
+
+class AblyPublisher:
+    def __init__(
+        self,
+        api_key: str,
+        client_factory: Callable = _default_client_factory,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.api_key = api_key
+        self.client_factory = client_factory
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._loop = None
+        self._wakeup = None
+        self._pid = None
+        self._client = None
+        self.stats = {"queued": 0, "dropped": 0, "published": 0, "requests": 0, "errors": 0}
+
+    # ── producer side (any thread) ──────────────────────────────────────
+
+    def publish(self, channel: str, name: str, data) -> bool:
+        """Queue a message. Returns False if it was dropped."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((channel, name, data))
+        except queue.Full:
+            self.stats["dropped"] += 1
+            logger.warning(f"ably publisher: queue full, dropped [{name}] on {channel}")
+            return False
+        self.stats["queued"] += 1
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # Loop already closed (interpreter shutdown)
+            return False
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far is published. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def call(self, fn: Callable, timeout: float = 10.0):
+        """
+        Run ``fn(client)``, a coroutine function, on the publisher's loop with
+        its long-lived client and return the result, for the few request/reply
+        calls (e.g. token requests) that should not build their own client.
+        """
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(fn(self._client), self._loop).result(timeout)
+
+    def _ensure_started(self) -> None:
+        # A forked worker inherits the object but not the thread.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            ready = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, args=(ready,), name="ably-publisher", daemon=True
+            )
+            self._thread.start()
+            ready.wait(timeout=5)
+
+    # ── consumer side (publisher thread) ────────────────────────────────
+
+    def _run(self, ready: threading.Event) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._wakeup = asyncio.Event()
+        self._client = self.client_factory(self.api_key)
+        ready.set()
+        self._loop.run_until_complete(self._consume())
+
+    def _drain(self):
+        """Queued messages grouped by channel, preserving order within each."""
+        by_channel = OrderedDict()
+        while True:
+            try:
+                channel, name, data = self._queue.get_nowait()
+            except queue.Empty:
+                return by_channel
+            by_channel.setdefault(channel, []).append((name, data))
+
+    async def _publish_channel(self, client, semaphore, channel_name, messages):
+        from ably.types.message import Message
+
+        async with semaphore:
+            for i in range(0, len(messages), self.batch_size):
+                chunk = messages[i : i + self.batch_size]
+                try:
+                    channel = client.channels.get(channel_name)
+                    await channel.publish(messages=[Message(name, data) for name, data in chunk])
+                    self.stats["published"] += len(chunk)
+                except Exception as exc:
+                    self.stats["errors"] += 1
+                    logger.error(
+                        f"ably publisher: publish of {len(chunk)} messages to {channel_name} failed: {exc}"
+                    )
+                finally:
+                    self.stats["requests"] += 1
+                    for _ in chunk:
+                        self._queue.task_done()
+
+    async def _consume(self) -> None:
+        client = self._client
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_PUBLISHES)
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await asyncio.sleep(PUBLISH_LINGER_SECONDS)
+            batch = self._drain()
+            if batch:
+                await asyncio.gather(
+                    *(
+                        self._publish_channel(client, semaphore, channel, messages)
+                        for channel, messages in batch.items()
+                    )
+                )
+
+
+_publisher: Optional[AblyPublisher] = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher() -> Optional[AblyPublisher]:
+    """The process-wide publisher, or None when ABLY_API_KEY is not set."""
+    global _publisher
+    api_key = getattr(settings, "ABLY_API_KEY", "")
+    if not api_key:
+        return None
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = AblyPublisher(
+                    api_key,
+                    queue_size=int(getattr(settings, "ABLY_PUBLISH_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)),
+                    batch_size=int(getattr(settings, "ABLY_PUBLISH_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+                )
+                atexit.register(_publisher.flush, 2.0)
+    return _publisher
+
+
+def publish(channel: str, name: str, data) -> bool:
+    """Queue ``data`` for Ably without blocking. Returns False if not queued."""
+    publisher = get_publisher()
+    if publisher is None:
+        logger.warning(f"ably publisher: ABLY_API_KEY not configured, skipping [{name}] on {channel}")
+        return False
+    return publisher.publish(channel, name, data)
@@ -0,0 +1,128 @@
+"""
+Ably token issuance for AblyTokenView.
+
+Tokens are cached per (user, capability) until ABLY_TOKEN_REFRESH_MARGIN_SECONDS
+before they expire, so app launches and reconnects reuse one token instead
+of asking Ably each time. Cache misses go through the process-wide Ably
+client (dispatcher.ably_publisher) rather than a new client and event loop.
+
+Token requests are signed locally with the API key secret (HMAC, as the Ably
+SDK does), which needs no network call at all.
+"""
+
+import hashlib
+import logging
+import time
+import uuid
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_KEY = "ably_token:{user_id}:{capability}"
+# Ably's maximum token lifetime.
+DEFAULT_TOKEN_TTL_MS = 24 * 60 * 60 * 1000
+DEFAULT_REFRESH_MARGIN_SECONDS = 60 * 60
+
+
+def capability_for(rider_id: Optional[str]) -> Dict:
+    # Wildcard capability: covers "assigned-{any-rider-id}" and the broadcast feed.
+    return {
+        "dispatch-feed": ["subscribe"],
+        "vehicle-telemetry": ["subscribe"],
+        "assigned-*": ["subscribe"],
+        "for-you": ["subscribe"],
+        "for-you*": ["subscribe"],
+        f"for-you-{rider_id}": ["subscribe"],
+        "assigned*": ["subscribe"],
+        "order*": ["subscribe"],
+        "location-update": ["publish", "subscribe"],
+    }
+
+
+def _canonical(capability: Dict) -> str:
+    from ably.types.capability import Capability
+
+    return str(Capability(capability))
+
+
+def sign_token_request(api_key: str, capability: Dict, ttl_ms: int = DEFAULT_TOKEN_TTL_MS) -> Dict:
+    """A signed Ably TokenRequest dict, built locally from the API key."""
+    from ably.types.tokenrequest import TokenRequest
+
+    key_name, key_secret = api_key.split(":", 1)
+    token_request = TokenRequest(
+        key_name=key_name,
+        ttl=int(ttl_ms),
+        capability=_canonical(capability),
+        timestamp=int(time.time() * 1000),
+        nonce=uuid.uuid4().hex[:16],
+    )
+    token_request.sign_request(key_secret)
+    return token_request.to_dict()
+
+
+def _request_token(capability: Dict, ttl_ms: int) -> Dict:
+    from .ably_publisher import get_publisher
+
+    publisher = get_publisher()
+    if publisher is None:
+        raise RuntimeError("Ably not configured")
+
+    async def _request(client):
+        details = await client.auth.request_token(
+            {"capability": _canonical(capability), "ttl": ttl_ms}
+        )
+        return details.to_dict()
+
+    return publisher.call(_request)
+
+
+def get_token(user_id, capability: Dict, ttl_ms: Optional[int] = None) -> Dict:
+    """
+    Token details dict ({"token", "expires", "issued", ...}) for ``user_id``
+    with ``capability``, from the cache when the cached token is still fresh.
+    """
+    if ttl_ms is None:
+        ttl_ms = int(getattr(settings, "ABLY_TOKEN_TTL_MS", DEFAULT_TOKEN_TTL_MS))
+    margin = int(getattr(settings, "ABLY_TOKEN_REFRESH_MARGIN_SECONDS", DEFAULT_REFRESH_MARGIN_SECONDS))
+    digest = hashlib.sha1(_canonical(capability).encode()).hexdigest()
+    key = TOKEN_CACHE_KEY.format(user_id=user_id, capability=digest)
+
+    try:
+        cached = cache.get(key)
+    except Exception as exc:
+        logger.warning(f"ably tokens: cache read failed: {exc}")
+        cached = None
+    if cached and cached["expires"] / 1000 - time.time() > margin:
+        return cached
+
+    details = _request_token(capability, ttl_ms)
+    remaining = int(details["expires"] / 1000 - time.time() - margin)
+    if remaining > 0:
+        try:
+            cache.set(key, details, remaining)
+        except Exception as exc:
+            logger.warning(f"ably tokens: cache write failed: {exc}")
+    return details
+
+
+def issue_tokens(user) -> Dict:
+    """Response body for AblyTokenView: a (cached) token plus a fresh signed token request."""
+    api_key = settings.ABLY_API_KEY
+    rider_id = None
+    try:
+        rider_id = user.rider_profile.rider_id
+    except Exception:
+        pass
+
+    capability = capability_for(rider_id)
+    details = get_token(user.pk, capability)
+    return {
+        "token": details["token"],
+        "token_request": sign_token_request(
+            api_key, capability, int(getattr(settings, "ABLY_TOKEN_TTL_MS", DEFAULT_TOKEN_TTL_MS))
+        ),
+    }
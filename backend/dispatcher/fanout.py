@@ -0,0 +1,96 @@
+"""
+New-order rider fan-out.
+
+Instead of pushing every online rider, a new order goes to the
+NEW_ORDER_FANOUT_K nearest eligible riders around the pickup, looked up in
+the in-process rider geo-index (dispatcher.rider_index). Eligible means
+online, active, authorised, within SystemSettings.auto_assign_radius_km,
+on a matching vehicle type (riders with none set match anything) and below
+the SystemSettings.max_concurrent_<vehicle> limit of in-flight orders.
+
+Selection runs in the notification outbox worker (riders.outbox), which
+sends the chosen riders one bulk insert of notification rows and one FCM
+multicast, so the cost of creating an order no longer grows with fleet size.
+"""
+
+import logging
+from typing import List, Optional
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FANOUT_K = 20
+DEFAULT_RADIUS_KM = 5
+DEFAULT_MAX_CONCURRENT = 1
+
+# Orders a rider is still working on, for the concurrency cap.
+ACTIVE_ORDER_STATUSES = ("Assigned", "Started", "Pickup", "Fulfilling", "Arrived")
+
+
+def _dispatch_rules():
+    from .models import SystemSettings
+
+    try:
+        return SystemSettings.objects.first()
+    except Exception as exc:
+        logger.warning(f"fanout: could not load SystemSettings: {exc}")
+        return None
+
+
+def _max_concurrent(rules, vehicle) -> int:
+    if rules is None or vehicle is None:
+        return DEFAULT_MAX_CONCURRENT
+    return getattr(
+        rules, f"max_concurrent_{vehicle.name.strip().lower()}", DEFAULT_MAX_CONCURRENT
+    )
+
+
+def select_fanout_riders(order, k: Optional[int] = None) -> List:
+    """
+    Riders to offer ``order`` to, nearest first. Orders without pickup
+    coordinates fall back to the k most recently located online riders.
+    """
+    from .models import Rider
+    from .rider_index import nearest_riders
+
+    if k is None:
+        k = int(getattr(settings, "NEW_ORDER_FANOUT_K", DEFAULT_FANOUT_K))
+    rules = _dispatch_rules()
+    radius_km = float(rules.auto_assign_radius_km if rules else DEFAULT_RADIUS_KM)
+    cap = _max_concurrent(rules, order.vehicle)
+
+    eligible = Rider.objects.filter(
+        status=Rider.Status.ONLINE, is_active=True, is_authorized=True
+    )
+    if order.vehicle_id:
+        eligible = eligible.filter(
+            Q(vehicle_type_id=order.vehicle_id) | Q(vehicle_type__isnull=True)
+        )
+    eligible = eligible.annotate(
+        active_orders=Count(
+            "rider_orders", filter=Q(rider_orders__status__in=ACTIVE_ORDER_STATUSES)
+        )
+    ).filter(active_orders__lt=cap)
+
+    if order.pickup_latitude is None or order.pickup_longitude is None:
+        return list(eligible.order_by("-last_location_update")[:k])
+
+    # Over-fetch: some index hits will be at their concurrency cap.
+    hits = nearest_riders(
+        order.pickup_latitude,
+        order.pickup_longitude,
+        k=k * 2,
+        max_radius_km=radius_km,
+        statuses=[Rider.Status.ONLINE],
+        vehicle_type_id=order.vehicle_id,
+        active_only=True,
+        accept_unset_vehicle=True,
+    )
+    if not hits:
+        return []
+
+    by_id = {r.id: r for r in eligible.filter(id__in=[rider_id for rider_id, _ in hits])}
+    return [by_id[rider_id] for rider_id, _ in hits if rider_id in by_id][:k]
+
@@ -0,0 +1,138 @@
+"""
+In-memory spatial index over lat/lng points.
+
+A uniform grid in degree space sized so each cell is roughly ``cell_km``
+across at the data's latitude. Radius and k-nearest queries only visit the
+cells that overlap the query's bounding box and then apply the exact
+haversine test, so results are identical to a brute-force scan.
+"""
+
+import math
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+KM_PER_DEG = 6371.0 * math.pi / 180.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in KM."""
+    r = 6371.0
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lng2 - lng1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * r * math.asin(math.sqrt(a))
+
+
+class GeoGridIndex:
+    """
+    Grid index over ``items``. ``coords(item)`` returns (lat, lng) or None;
+    items without coordinates are skipped. Positions returned by queries
+    refer to ``self.items`` and are in input order.
+    """
+
+    def __init__(
+        self,
+        items: Iterable,
+        coords: Callable[[object], Optional[Tuple[float, float]]],
+        cell_km: float = 5.0,
+    ):
+        self.items = []
+        self.points: List[Tuple[float, float]] = []
+        for item in items:
+            c = coords(item)
+            if c is None or c[0] is None or c[1] is None:
+                continue
+            self.items.append(item)
+            self.points.append((float(c[0]), float(c[1])))
+
+        ref_lat = (
+            sum(lat for lat, _ in self.points) / len(self.points) if self.points else 0.0
+        )
+        self.cell_lat = cell_km / KM_PER_DEG
+        self.cell_lng = cell_km / (KM_PER_DEG * max(math.cos(math.radians(ref_lat)), 0.01))
+
+        self.cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for pos, (lat, lng) in enumerate(self.points):
+            self.cells[self._cell(lat, lng)].append(pos)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_lat), math.floor(lng / self.cell_lng))
+
+    def within_radius(self, lat: float, lng: float, radius_km: float) -> List[Tuple[int, float]]:
+        """[(position, distance_km), ...] for items within radius_km, in input order."""
+        lat, lng = float(lat), float(lng)
+        if radius_km < 0 or not self.points:
+            return []
+
+        # Conservative bounding box (1% slack); the haversine test is exact.
+        dlat = radius_km * 1.01 / KM_PER_DEG
+        max_abs_lat = min(abs(lat) + dlat, 89.9)
+        dlng = min(radius_km * 1.01 / (KM_PER_DEG * math.cos(math.radians(max_abs_lat))), 180.0)
+
+        lo_i, lo_j = self._cell(lat - dlat, lng - dlng)
+        hi_i, hi_j = self._cell(lat + dlat, lng + dlng)
+
+        out = []
+        if (hi_i - lo_i + 1) * (hi_j - lo_j + 1) > len(self.cells):
+            # Query box bigger than the populated grid: walk occupied cells.
+            candidates = (
+                pos
+                for (i, j), positions in self.cells.items()
+                if lo_i <= i <= hi_i and lo_j <= j <= hi_j
+                for pos in positions
+            )
+        else:
+            candidates = (
+                pos
+                for i in range(lo_i, hi_i + 1)
+                for j in range(lo_j, hi_j + 1)
+                for pos in self.cells.get((i, j), ())
+            )
+
+        for pos in candidates:
+            p_lat, p_lng = self.points[pos]
+            d = haversine_km(lat, lng, p_lat, p_lng)
+            if d <= radius_km:
+                out.append((pos, d))
+        out.sort()
+        return out
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int = 1,
+        max_radius_km: Optional[float] = None,
+        predicate: Optional[Callable[[object], bool]] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        The k nearest items as [(position, distance_km), ...], closest first.
+
+        Searches a growing radius (one cell, then doubling) until k matches
+        are found inside it, so the answer is exact without a full scan.
+        ``predicate(item)`` filters candidates.
+        """
+        if k <= 0 or not self.points:
+            return []
+
+        cell_km = self.cell_lat * KM_PER_DEG
+        # Beyond this every item is inside the radius anyway.
+        limit = max_radius_km if max_radius_km is not None else math.pi * 6371.0
+        radius = min(cell_km, limit)
+        while True:
+            hits = [
+                (d, pos)
+                for pos, d in self.within_radius(lat, lng, radius)
+                if predicate is None or predicate(self.items[pos])
+            ]
+            if len(hits) >= k or radius >= limit:
+                hits.sort()
+                return [(pos, d) for d, pos in hits[:k]]
+            radius = min(radius * 2, limit)
@@ -7,6 +7,7 @@ telemetry into VehicleAsset records, creating new assets where needed.
 Usage:
     python manage.py sync_bike_telemetry
     python manage.py sync_bike_telemetry --dry-run
+    python manage.py sync_bike_telemetry --full-snapshot
 """
 
 from __future__ import annotations
@@ -323,6 +324,12 @@ class Command(BaseCommand):
             default=False,
             help="Fetch data and log what would happen without writing to the database.",
         )
+        parser.add_argument(
+            "--full-snapshot",
+            action="store_true",
+            default=False,
+            help="Publish every vehicle to Ably instead of only the ones that changed.",
+        )
 
     def handle(self, *args, **options):
         dry_run = options["dry_run"]
@@ -392,12 +399,12 @@ class Command(BaseCommand):
 
         # ── Step 5: publish to Ably for real-time frontend updates ──
         if not dry_run and (counts["created"] + counts["updated"]) > 0:
-            self._publish_to_ably()
+            self._publish_to_ably(full_snapshot=options["full_snapshot"])
 
-    def _publish_to_ably(self):
+    def _publish_to_ably(self, full_snapshot=False):
         """
-        Serialize all VehicleAsset records and publish to the
-        'vehicle-telemetry' Ably channel so the dispatcher frontend
+        Publish changed VehicleAsset records (or a periodic full snapshot) to
+        the 'vehicle-telemetry' Ably channel so the dispatcher frontend
         receives live map updates without polling.
         """
         try:
@@ -409,23 +416,17 @@ class Command(BaseCommand):
                 ))
                 return
 
-            import asyncio
-            from ably import AblyRest
-            from dispatcher.serializers import VehicleAssetSerializer
+            from dispatcher.telemetry_broadcast import broadcast_telemetry
 
-            assets = VehicleAsset.objects.select_related().all()
-            payload = VehicleAssetSerializer(assets, many=True).data
-
-            async def _publish():
-                client = AblyRest(api_key)
-                channel = client.channels.get("vehicle-telemetry")
-                await channel.publish("telemetry_update", payload)
-
-            asyncio.run(_publish())
+            stats = broadcast_telemetry(force_snapshot=full_snapshot)
             self.stdout.write(self.style.SUCCESS(
-                "Published %d vehicle(s) to Ably channel 'vehicle-telemetry'" % len(payload)
+                "Published %(changed)d of %(assets)d vehicle(s) to Ably channel "
+                "'vehicle-telemetry' (%(mode)s, %(messages)d message(s))" % stats
             ))
-            logger.info("sync_bike_telemetry: published %d vehicles to Ably", len(payload))
+            logger.info(
+                "sync_bike_telemetry: published %d/%d vehicles to Ably (%s, %d messages)",
+                stats["changed"], stats["assets"], stats["mode"], stats["messages"],
+            )
         except Exception as exc:
             # Never let Ably failure break the sync
             logger.error("sync_bike_telemetry: Ably publish failed — %s", exc)
@@ -0,0 +1,151 @@
+"""
+Graph-based relay path planner.
+
+Relay nodes are graph vertices; an edge joins two nodes whose straight-line
+distance is within the largest leg cap, weighted by estimated road km
+(haversine × the zone's calibrated road factor, see orders.route_estimator).
+The adjacency is built once per relay-node cache refresh, which happens
+whenever a RelayNode row changes (dispatcher.signals).
+
+``RelayGraph.plan`` picks, in one call:
+1. the smallest cap from the ladder that admits any pickup → dropoff path
+   (a minimax search over leg length), then
+2. the best path whose legs all fit that cap, by A* with an admissible
+   haversine heuristic — fewest road km, or fewest legs (ties broken by km).
+"""
+
+import heapq
+import math
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .geo_index import GeoGridIndex, haversine_km
+
+RELAY_LEG_CAPS_KM = (18.0, 25.0, 35.0, 50.0, 80.0)
+
+# Per-km weight of road distance when minimising legs; small enough that
+# distance only ever breaks ties between paths with the same leg count.
+_LEGS_DISTANCE_WEIGHT = 1e-4
+
+_SOURCE = -1
+_TARGET = -2
+
+
+class RelayGraph:
+    def __init__(
+        self,
+        index: GeoGridIndex,
+        road_factor: Callable[[float, float], float] = lambda lat, lng: 1.0,
+        max_edge_km: float = max(RELAY_LEG_CAPS_KM),
+    ):
+        self.index = index
+        self.road_factor = road_factor
+        self.max_edge_km = max_edge_km
+        self.factors = [road_factor(lat, lng) for lat, lng in index.points]
+        self.min_factor = min(self.factors + [1.0])
+
+        # adjacency[pos] = [(neighbour_pos, haversine_km, road_km), ...]
+        self.adjacency: List[List[Tuple[int, float, float]]] = []
+        for pos, (lat, lng) in enumerate(index.points):
+            self.adjacency.append(
+                [
+                    (other, d, d * self.factors[pos])
+                    for other, d in index.within_radius(lat, lng, max_edge_km)
+                    if other != pos
+                ]
+            )
+
+    def _edges(self, u, pickup, dropoff, source_edges, target_edges):
+        """Edges out of u, including the virtual pickup/dropoff vertices."""
+        if u == _SOURCE:
+            for v, d in source_edges:
+                yield v, d, d * self.road_factor(*pickup)
+            d = haversine_km(*pickup, *dropoff)
+            if d <= self.max_edge_km:
+                yield _TARGET, d, d * self.road_factor(*pickup)
+            return
+        yield from self.adjacency[u]
+        d = target_edges.get(u)
+        if d is not None:
+            yield _TARGET, d, d * self.factors[u]
+
+    def _min_bottleneck(self, pickup, dropoff, source_edges, target_edges) -> Optional[float]:
+        """Smallest possible longest leg over all pickup → dropoff paths."""
+        best = {_SOURCE: 0.0}
+        heap = [(0.0, _SOURCE)]
+        while heap:
+            b, u = heapq.heappop(heap)
+            if u == _TARGET:
+                return b
+            if b > best.get(u, math.inf):
+                continue
+            for v, d, _road in self._edges(u, pickup, dropoff, source_edges, target_edges):
+                nb = max(b, d)
+                if nb < best.get(v, math.inf):
+                    best[v] = nb
+                    heapq.heappush(heap, (nb, v))
+        return None
+
+    def _astar(self, pickup, dropoff, cap, objective, source_edges, target_edges) -> Optional[List[int]]:
+        def h(u):
+            lat, lng = pickup if u == _SOURCE else self.index.points[u]
+            straight = haversine_km(lat, lng, *dropoff)
+            if objective == "legs":
+                return math.ceil(straight / cap - 1e-9) + _LEGS_DISTANCE_WEIGHT * straight * self.min_factor
+            return straight * self.min_factor
+
+        g = {_SOURCE: 0.0}
+        parent = {}
+        heap = [(h(_SOURCE), 0.0, _SOURCE)]
+        closed = set()
+        while heap:
+            _f, cost, u = heapq.heappop(heap)
+            if u == _TARGET:
+                path = []
+                while u != _SOURCE:
+                    u = parent[u]
+                    if u != _SOURCE:
+                        path.append(u)
+                return path[::-1]
+            if u in closed:
+                continue
+            closed.add(u)
+            for v, d, road in self._edges(u, pickup, dropoff, source_edges, target_edges):
+                if d > cap or v in closed:
+                    continue
+                step = 1.0 + _LEGS_DISTANCE_WEIGHT * road if objective == "legs" else road
+                nc = cost + step
+                if nc < g.get(v, math.inf):
+                    g[v] = nc
+                    parent[v] = u
+                    heapq.heappush(heap, (nc + (0.0 if v == _TARGET else h(v)), nc, v))
+        return None
+
+    def plan(
+        self,
+        pickup: Dict,
+        dropoff: Dict,
+        caps: Sequence[float] = RELAY_LEG_CAPS_KM,
+        objective: str = "distance",
+    ) -> Optional[Tuple[List, float]]:
+        """
+        Relay nodes to pass through, in order, and the leg cap used.
+
+        Returns ([], cap) when the direct leg fits the smallest workable cap,
+        and None when no path fits the largest cap.
+        """
+        p = (float(pickup["lat"]), float(pickup["lng"]))
+        t = (float(dropoff["lat"]), float(dropoff["lng"]))
+        max_cap = min(max(caps), self.max_edge_km)
+
+        source_edges = self.index.within_radius(*p, max_cap)
+        target_edges = dict(self.index.within_radius(*t, max_cap))
+
+        bottleneck = self._min_bottleneck(p, t, source_edges, target_edges)
+        if bottleneck is None or bottleneck > max_cap:
+            return None
+        cap = min(c for c in caps if c >= bottleneck)
+
+        path = self._astar(p, t, cap, objective, source_edges, target_edges)
+        if path is None:
+            return None
+        return [self.index.items[pos] for pos in path], cap
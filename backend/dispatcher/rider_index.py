@@ -0,0 +1,148 @@
+"""
+Live geo-index of rider positions.
+
+An in-process GeoGridIndex over every rider with a GPS fix, rebuilt from
+Rider.current_latitude/current_longitude at most every
+RIDER_INDEX_REFRESH_SECONDS. Queries filter on status, authorisation and
+vehicle type without touching the database, so a relay leg suggestion is
+one index lookup plus (optionally) one fetch of the chosen Rider rows.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from .geo_index import GeoGridIndex
+
+RiderPoint = namedtuple(
+    "RiderPoint",
+    ["id", "lat", "lng", "status", "is_authorized", "is_active", "vehicle_type_id"],
+)
+
+_index = {"ts": 0.0, "index": None}
+_index_lock = threading.Lock()
+
+
+def _build_index() -> GeoGridIndex:
+    from .models import Rider
+
+    rows = Rider.objects.filter(
+        current_latitude__isnull=False,
+        current_longitude__isnull=False,
+    ).values_list(
+        "id",
+        "current_latitude",
+        "current_longitude",
+        "status",
+        "is_authorized",
+        "is_active",
+        "vehicle_type_id",
+    )
+    points = [
+        RiderPoint(r_id, float(lat), float(lng), status, authorized, active, vt_id)
+        for r_id, lat, lng, status, authorized, active, vt_id in rows
+        # 0,0 is the "no fix" sentinel used across the codebase
+        if abs(float(lat)) > 1e-9 or abs(float(lng)) > 1e-9
+    ]
+    return GeoGridIndex(points, lambda p: (p.lat, p.lng), cell_km=2.0)
+
+
+def get_rider_index() -> GeoGridIndex:
+    ttl = float(getattr(settings, "RIDER_INDEX_REFRESH_SECONDS", 15))
+    now = time.time()
+    index = _index["index"]
+    if index is not None and (now - _index["ts"]) < ttl:
+        return index
+
+    with _index_lock:
+        if _index["index"] is None or (time.time() - _index["ts"]) >= ttl:
+            _index["index"] = _build_index()
+            _index["ts"] = time.time()
+        return _index["index"]
+
+
+def invalidate_rider_index() -> None:
+    _index["index"] = None
+
+
+def _predicate(
+    statuses: Optional[Iterable[str]],
+    authorized_only: bool,
+    vehicle_type_id,
+    exclude_ids: Optional[Iterable] = None,
+    active_only: bool = False,
+    accept_unset_vehicle: bool = False,
+):
+    statuses = set(statuses) if statuses else None
+    exclude = set(exclude_ids or ())
+
+    def accept(p: RiderPoint) -> bool:
+        if authorized_only and not p.is_authorized:
+            return False
+        if active_only and not p.is_active:
+            return False
+        if statuses is not None and p.status not in statuses:
+            return False
+        if vehicle_type_id is not None and p.vehicle_type_id != vehicle_type_id:
+            if not (accept_unset_vehicle and p.vehicle_type_id is None):
+                return False
+        return p.id not in exclude
+
+    return accept
+
+
+def nearest_riders(
+    lat: float,
+    lng: float,
+    k: int = 1,
+    max_radius_km: Optional[float] = None,
+    statuses: Optional[Iterable[str]] = None,
+    authorized_only: bool = True,
+    vehicle_type_id=None,
+    exclude_ids: Optional[Iterable] = None,
+    active_only: bool = False,
+    accept_unset_vehicle: bool = False,
+) -> List[Tuple[object, float]]:
+    """
+    [(rider_id, distance_km), ...] for the k nearest matching riders.
+    ``accept_unset_vehicle`` lets riders with no vehicle type match a
+    ``vehicle_type_id`` filter.
+    """
+    index = get_rider_index()
+    accept = _predicate(
+        statuses,
+        authorized_only,
+        vehicle_type_id,
+        exclude_ids,
+        active_only=active_only,
+        accept_unset_vehicle=accept_unset_vehicle,
+    )
+    return [
+        (index.items[pos].id, d)
+        for pos, d in index.nearest(
+            float(lat), float(lng), k, max_radius_km=max_radius_km, predicate=accept
+        )
+    ]
+
+
+def riders_within(
+    lat: float,
+    lng: float,
+    radius_km: float,
+    statuses: Optional[Iterable[str]] = None,
+    authorized_only: bool = True,
+    vehicle_type_id=None,
+) -> List[Tuple[object, float]]:
+    """[(rider_id, distance_km), ...] for matching riders within radius_km, closest first."""
+    index = get_rider_index()
+    accept = _predicate(statuses, authorized_only, vehicle_type_id)
+    hits = [
+        (d, index.items[pos].id)
+        for pos, d in index.within_radius(float(lat), float(lng), radius_km)
+        if accept(index.items[pos])
+    ]
+    hits.sort(key=lambda h: h[0])
+    return [(rider_id, d) for d, rider_id in hits]
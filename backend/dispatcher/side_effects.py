@@ -0,0 +1,167 @@
+"""
+Post-commit side effects: activity-feed events, webhooks.
+
+Views call ``dispatch(name, **kwargs)`` where they used to start a daemon
+thread. The effect is recorded with transaction.on_commit, so nothing runs
+for a transaction that rolls back and handlers never read uncommitted rows.
+After commit it is released to SIDE_EFFECTS_BACKEND:
+
+- "thread" (default): a bounded in-process pool of SIDE_EFFECTS_WORKERS
+  threads fed by a queue of SIDE_EFFECTS_QUEUE_SIZE. When the queue is full
+  the effect is dropped and counted rather than blocking the request.
+- "celery": the run_side_effect task, falling back to the pool if the
+  broker is unreachable.
+- "inline": run in the committing thread (management commands, tests).
+
+Handlers are looked up by name in HANDLERS so the Celery task can run them;
+kwargs are made JSON-safe at dispatch time. ``side_effect_stats`` reports
+queue depth and dispatched (released after commit)/executed/failed/dropped
+counters, per process and (best effort) across workers; admins can read it
+at /api/dispatch/side-effects/stats/.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+from collections import Counter
+from typing import Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {
+    "activity": "dispatcher.utils.emit_activity",
+    "webhook": "webhooks.utils.trigger_webhook",
+}
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 1000
+STATS_CACHE_KEY = "side_effects:stats:{name}"
+STAT_NAMES = ("dispatched", "executed", "failed", "dropped")
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += n
+    try:
+        key = STATS_CACHE_KEY.format(name=name)
+        try:
+            cache.incr(key, n)
+        except ValueError:
+            cache.set(key, n, None)
+    except Exception:
+        pass
+
+
+def run_side_effect(name: str, kwargs: Dict) -> bool:
+    """Run one effect now. Returns False (and logs) if the handler raised."""
+    try:
+        import_string(HANDLERS[name])(**kwargs)
+        _count("executed")
+        return True
+    except Exception as e:
+        _count("failed")
+        logger.error(f"side effect {name} failed: {e}")
+        return False
+
+
+class _Pool:
+    """Fixed worker threads draining a bounded queue."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    def _ensure_started(self) -> None:
+        # A forked worker inherits the queue but not the threads.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(
+                maxsize=int(getattr(settings, "SIDE_EFFECTS_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+            )
+            for i in range(int(getattr(settings, "SIDE_EFFECTS_WORKERS", DEFAULT_WORKERS))):
+                threading.Thread(
+                    target=self._work, name=f"side-effects-{i}", daemon=True
+                ).start()
+            self._pid = os.getpid()
+
+    def _work(self) -> None:
+        q = self._queue
+        while True:
+            name, kwargs = q.get()
+            try:
+                # Long-lived thread: drop connections past CONN_MAX_AGE or broken
+                close_old_connections()
+                run_side_effect(name, kwargs)
+            finally:
+                q.task_done()
+
+    def submit(self, name: str, kwargs: Dict) -> bool:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((name, kwargs))
+            return True
+        except queue.Full:
+            _count("dropped")
+            logger.warning(f"side effects: queue full, dropped {name}")
+            return False
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+
+
+_pool = _Pool()
+
+
+def _release(name: str, kwargs: Dict) -> None:
+    _count("dispatched")
+    backend = getattr(settings, "SIDE_EFFECTS_BACKEND", "thread")
+    if backend == "inline":
+        run_side_effect(name, kwargs)
+        return
+    if backend == "celery":
+        from .tasks import run_side_effect_task
+
+        try:
+            run_side_effect_task.delay(name, kwargs)
+            return
+        except Exception as e:
+            logger.warning(f"side effects: could not queue {name} on Celery, using thread pool: {e}")
+    _pool.submit(name, kwargs)
+
+
+def dispatch(name: str, **kwargs) -> None:
+    """Run handler ``name`` with ``kwargs`` once the current transaction commits."""
+    if name not in HANDLERS:
+        raise KeyError(f"Unknown side effect: {name}")
+    # Snapshot now: the payload reflects this transaction, and Celery needs JSON.
+    kwargs = json.loads(json.dumps(kwargs, cls=DjangoJSONEncoder))
+    transaction.on_commit(lambda: _release(name, kwargs))
+
+
+def side_effect_stats() -> Dict[str, Dict[str, int]]:
+    """Counters and queue depth for this process and (best effort) across workers."""
+    with _stats_lock:
+        local = {n: _stats[n] for n in STAT_NAMES}
+    local["queue_depth"] = _pool.depth()
+    shared = {}
+    try:
+        for n in STAT_NAMES:
+            shared[n] = int(cache.get(STATS_CACHE_KEY.format(name=n)) or 0)
+    except Exception:
+        shared = {}
+    return {"process": local, "shared": shared}
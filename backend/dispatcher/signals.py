@@ -1,8 +1,8 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-import threading
 from django.contrib.auth import get_user_model
-from .models import Rider, DispatcherProfile, Merchant
+from .models import Rider, DispatcherProfile, Merchant, RelayNode
 
 User = get_user_model()
 
@@ -15,23 +15,34 @@ def create_user_profile(sender, instance, created, **kwargs):
         elif instance.usertype == "Merchant":
             Merchant.objects.create(user=instance)
 
-            # Trigger merchant-created webhook in background
-            def _trigger_merchant_created():
-                try:
-                    from webhooks.utils import trigger_webhook
-                    from authentication.serializers import UserSerializer
+            # merchant-created webhook, released once the signup commits
+            try:
+                from authentication.serializers import UserSerializer
 
-                    payload = {
+                from .side_effects import dispatch
+
+                dispatch(
+                    "webhook",
+                    event_name="merchant-created",
+                    payload={
                         "event": "merchant-created",
                         "timestamp": instance.created_at.isoformat(),
                         "data": UserSerializer(instance).data,
-                    }
-                    trigger_webhook("merchant-created", payload)
-                except Exception as e:
-                    import logging
+                    },
+                )
+            except Exception as e:
+                import logging
+
+                logging.getLogger(__name__).error(
+                    f"Failed to queue merchant-created webhook from signal: {e}"
+                )
+
 
-                    logging.getLogger(__name__).error(
-                        f"Failed to trigger merchant-created webhook from signal: {e}"
-                    )
+@receiver(post_save, sender=RelayNode)
+@receiver(post_delete, sender=RelayNode)
+def invalidate_relay_graph(sender, instance, **kwargs):
+    """Rebuild the relay node index/graph everywhere after a hub changes."""
+    from .tasks import invalidate_relay_nodes_cache
 
-            threading.Thread(target=_trigger_merchant_created, daemon=True).start()
+    invalidate_relay_nodes_cache()
+    transaction.on_commit(invalidate_relay_nodes_cache)
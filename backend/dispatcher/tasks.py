@@ -3,9 +3,9 @@ import logging
 import time
 import math
 import secrets
+import uuid
 from decimal import Decimal, ROUND_HALF_UP
 
-import requests
 from celery import shared_task
 from django.conf import settings
 from .models import Rider
@@ -14,8 +14,9 @@ from .utils import MailgunEmailService
 logger = logging.getLogger(__name__)
 
 
-_RELAY_NODES_CACHE = {"ts": 0.0, "nodes": None}
+_RELAY_NODES_CACHE = {"ts": 0.0, "nodes": None, "index": None, "graph": None, "version": None}
 _RELAY_NODES_TTL_SECONDS = 300
+RELAY_NODES_VERSION_KEY = "relay_nodes:ver"
 
 
 def _haversine_km(lat1, lng1, lat2, lng2):
@@ -31,12 +32,39 @@ def _haversine_km(lat1, lng1, lat2, lng2):
     return 2 * r * math.asin(math.sqrt(a))
 
 
+def _relay_nodes_version():
+    """Shared token bumped by dispatcher.signals whenever a RelayNode changes."""
+    from django.core.cache import cache
+
+    try:
+        version = cache.get(RELAY_NODES_VERSION_KEY)
+        if version is None:
+            cache.add(RELAY_NODES_VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(RELAY_NODES_VERSION_KEY)
+        return version
+    except Exception:
+        return None
+
+
+def invalidate_relay_nodes_cache():
+    """Drop cached relay nodes, index and graph in every process."""
+    from django.core.cache import cache
+
+    _RELAY_NODES_CACHE.update({"nodes": None, "index": None, "graph": None})
+    try:
+        cache.set(RELAY_NODES_VERSION_KEY, uuid.uuid4().hex, None)
+    except Exception as exc:
+        logger.warning(f"Relay node cache invalidation failed: {exc}")
+
+
 def _get_active_relay_nodes_cached():
     from .models import RelayNode
 
     now = time.time()
+    version = _relay_nodes_version()
     if (
         _RELAY_NODES_CACHE["nodes"] is not None
+        and _RELAY_NODES_CACHE["version"] == version
         and (now - _RELAY_NODES_CACHE["ts"]) < _RELAY_NODES_TTL_SECONDS
     ):
         return _RELAY_NODES_CACHE["nodes"]
@@ -47,12 +75,42 @@ def _get_active_relay_nodes_cached():
         .only("id", "name", "latitude", "longitude", "zone")
     )
     _RELAY_NODES_CACHE["nodes"] = nodes
+    _RELAY_NODES_CACHE["index"] = None
+    _RELAY_NODES_CACHE["graph"] = None
+    _RELAY_NODES_CACHE["version"] = version
     _RELAY_NODES_CACHE["ts"] = now
     return nodes
 
 
+def _get_relay_node_index_cached():
+    """Grid index over the cached active relay nodes (rebuilt with them)."""
+    from .geo_index import GeoGridIndex
+
+    nodes = _get_active_relay_nodes_cached()
+    index = _RELAY_NODES_CACHE["index"]
+    if index is None:
+        index = GeoGridIndex(nodes, lambda n: (n.latitude, n.longitude))
+        _RELAY_NODES_CACHE["index"] = index
+    return index
+
+
+def _get_relay_graph_cached():
+    """Relay node adjacency graph (rebuilt only when the node set changes)."""
+    from orders.route_estimator import road_factor_for
+    from .relay_planner import RelayGraph
+
+    index = _get_relay_node_index_cached()
+    graph = _RELAY_NODES_CACHE["graph"]
+    if graph is None or graph.index is not index:
+        graph = RelayGraph(index, road_factor=road_factor_for)
+        _RELAY_NODES_CACHE["graph"] = graph
+    return graph
+
+
 def _directions_legs(origin, points):
     """Return list of (distance_km, duration_minutes) between origin->points[0]->..."""
+    from orders.route_cache import get_route_legs
+
     api_key = getattr(settings, "GOOGLE_MAPS_API_KEY", None)
     if not api_key:
         return None
@@ -60,68 +118,26 @@ def _directions_legs(origin, points):
     if not points:
         return []
 
-    origin_str = f"{origin['lat']},{origin['lng']}"
-    destination_str = f"{points[-1]['lat']},{points[-1]['lng']}"
-    waypoints = points[:-1]
-
-    params = {
-        "origin": origin_str,
-        "destination": destination_str,
-        "key": api_key,
-    }
-    if waypoints:
-        params["waypoints"] = "|".join([f"{p['lat']},{p['lng']}" for p in waypoints])
-
-    # 1-hour cache for identical waypoint chains
-    try:
-        from django.core.cache import cache
-
-        cache_key = "relay_route_legs:" + "->".join(
-            [origin_str] + [f"{p['lat']},{p['lng']}" for p in points]
-        )
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-    except Exception:
-        cache_key = None
-
-    url = "https://maps.googleapis.com/maps/api/directions/json"
-    resp = requests.get(url, params=params, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
-
-    if data.get("status") != "OK" or not data.get("routes"):
+    # Shared geohash-keyed route cache (Redis + DB cold tier)
+    legs = get_route_legs(origin, points)
+    if legs is None:
         return None
 
-    legs = data["routes"][0].get("legs") or []
     out = []
-    for leg in legs:
-        d_km = (leg["distance"]["value"] or 0) / 1000.0
-        t_min = int(round((leg["duration"]["value"] or 0) / 60.0))
+    for d_m, t_s in legs:
+        d_km = (d_m or 0) / 1000.0
+        t_min = int(round((t_s or 0) / 60.0))
         out.append((round(d_km, 2), t_min))
-
-    if cache_key:
-        try:
-            from django.core.cache import cache
-
-            cache.set(cache_key, out, timeout=3600)
-        except Exception:
-            pass
-
     return out
 
 
 def _estimate_legs_haversine(origin, points):
+    """Offline leg estimate, calibrated by zone/hour (orders.route_estimator)."""
+    from orders.route_estimator import estimate_legs
+
     if not points:
         return []
-    prev = origin
-    out = []
-    for p in points:
-        d = _haversine_km(prev["lat"], prev["lng"], p["lat"], p["lng"])
-        # simple Lagos ETA heuristic: 4 mins per km
-        out.append((round(d, 2), int(max(1, round(d * 4)))))
-        prev = p
-    return out
+    return estimate_legs(origin, points)
 
 
 RELAY_THRESHOLD_KM = 18.0  # Orders longer than this are split via relay hubs
@@ -129,67 +145,26 @@ RELAY_THRESHOLD_KM = 18.0  # Orders longer than this are split via relay hubs
 
 def _nearest_rider_to(lat, lng):
     """Return the nearest authorized rider (with GPS) to (lat, lng)."""
-    riders = Rider.objects.filter(
-        is_authorized=True,
-        current_latitude__isnull=False,
-        current_longitude__isnull=False,
-    )
-    best, best_d = None, None
-    for r in riders[:200]:
-        d = _haversine_km(lat, lng, float(r.current_latitude), float(r.current_longitude))
-        if best is None or d < best_d:
-            best, best_d = r, d
-    return best
+    from .rider_index import nearest_riders
 
+    found = nearest_riders(lat, lng, k=1)
+    if not found:
+        return None
+    return Rider.objects.filter(pk=found[0][0]).first()
 
-def _build_greedy_relay_hops(pickup, dropoff, max_leg_km_est=90.0, max_hops=12):
-    """Greedy hop selection using haversine distance as a cheap proxy."""
-    nodes = _get_active_relay_nodes_cached()
-    direct = _haversine_km(pickup["lat"], pickup["lng"], dropoff["lat"], dropoff["lng"])
-
-    # Filter nodes roughly "near" the pickup→dropoff corridor (triangle inequality)
-    filtered = []
-    for n in nodes:
-        if n.latitude is None or n.longitude is None:
-            continue
-        d1 = _haversine_km(pickup["lat"], pickup["lng"], float(n.latitude), float(n.longitude))
-        d2 = _haversine_km(float(n.latitude), float(n.longitude), dropoff["lat"], dropoff["lng"])
-        if (d1 + d2) <= (direct * 1.6):
-            filtered.append(n)
-
-    hops = []
-    cur = pickup
-    remaining = _haversine_km(cur["lat"], cur["lng"], dropoff["lat"], dropoff["lng"])
-
-    while remaining > max_leg_km_est:
-        best = None
-        best_remaining = None
-        for n in filtered:
-            n_lat, n_lng = float(n.latitude), float(n.longitude)
-            leg = _haversine_km(cur["lat"], cur["lng"], n_lat, n_lng)
-            if leg > max_leg_km_est:
-                continue
-            rem = _haversine_km(n_lat, n_lng, dropoff["lat"], dropoff["lng"])
-            # must make progress
-            if rem >= remaining - 1.0:
-                continue
-            if best is None or rem < best_remaining:
-                best = n
-                best_remaining = rem
-
-        if not best:
-            break
-
-        hops.append(best)
-        cur = {"lat": float(best.latitude), "lng": float(best.longitude)}
-        remaining = best_remaining
-
-        if len(hops) >= max_hops:
-            break
-
-    # If still far and we couldn't hop, signal failure by returning None
-    if _haversine_km(cur["lat"], cur["lng"], dropoff["lat"], dropoff["lng"]) > max_leg_km_est:
+
+def _plan_relay_hops(pickup, dropoff):
+    """
+    Relay nodes for pickup → dropoff, or None when no chain of legs within
+    the largest cap exists. Uses the smallest cap that works and, under it,
+    the shortest path by estimated road km (RELAY_PLANNER_OBJECTIVE="legs"
+    minimises handoffs instead).
+    """
+    objective = getattr(settings, "RELAY_PLANNER_OBJECTIVE", "distance")
+    planned = _get_relay_graph_cached().plan(pickup, dropoff, objective=objective)
+    if planned is None:
         return None
+    hops, _cap = planned
     return hops
 
 
@@ -352,9 +327,9 @@ def generate_relay_legs_sync(order_id):
 
             # Build hop chain.
             # Orders ≤ 18 km go direct (single leg, no hub handoffs).
-            # Orders > 18 km must pass through relay hubs — the algorithm
-            # tries progressively relaxed per-leg caps until a valid path
-            # is found or all caps are exhausted (→ fail).
+            # Orders > 18 km must pass through relay hubs — the planner
+            # picks the smallest per-leg cap (18…80 km) that admits a path
+            # and the best path under it, or None if none exists (→ fail).
             # IMPORTANT: use explicit `is None` — an empty list [] means a
             # valid direct single-leg delivery and must not trigger the
             # fallback path.
@@ -365,13 +340,7 @@ def generate_relay_legs_sync(order_id):
             if direct_km <= RELAY_THRESHOLD_KM:
                 hop_nodes = []  # short enough — direct delivery, no hubs needed
             else:
-                hop_nodes = None
-                for max_leg in [18.0, 25.0, 35.0, 50.0, 80.0]:
-                    hop_nodes = _build_greedy_relay_hops(
-                        pickup, dropoff, max_leg_km_est=max_leg
-                    )
-                    if hop_nodes is not None:
-                        break
+                hop_nodes = _plan_relay_hops(pickup, dropoff)
 
             if hop_nodes is None:
                 order.routing_status = Order.RoutingStatus.FAILED
@@ -524,3 +493,11 @@ def generate_relay_legs_sync(order_id):
         except Exception:
             pass
         return False
+
+
+@shared_task
+def run_side_effect_task(name, kwargs):
+    """Run a post-commit side effect released by dispatcher.side_effects."""
+    from .side_effects import run_side_effect
+
+    return run_side_effect(name, kwargs)
@@ -0,0 +1,170 @@
+"""
+Delta broadcast of vehicle telemetry to the 'vehicle-telemetry' Ably channel.
+
+After each sync_bike_telemetry run only assets whose position moved more
+than VEHICLE_TELEMETRY_MIN_MOVE_METERS, or whose engine status / online flag
+changed, since they were last published are serialized and sent. The last
+published state per asset lives in the cache, so it survives between cron
+runs. Every VEHICLE_TELEMETRY_SNAPSHOT_SECONDS the whole fleet is sent
+instead, so clients that missed deltas resync.
+
+Payloads stay a list of VehicleAssetSerializer dicts on the existing
+'telemetry_update' event (the portal merges them by id), split across as
+many messages as needed to keep each under VEHICLE_TELEMETRY_MAX_MESSAGE_BYTES
+(Ably rejects messages over 64 KiB).
+"""
+
+import json
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_NAME = "vehicle-telemetry"
+EVENT_NAME = "telemetry_update"
+STATE_CACHE_KEY = "vehicle_telemetry:published_state"
+SNAPSHOT_CACHE_KEY = "vehicle_telemetry:last_snapshot_at"
+# Long enough to outlive any gap between syncs; a miss just forces a snapshot.
+STATE_CACHE_TTL = 24 * 60 * 60
+
+DEFAULT_MIN_MOVE_METERS = 20
+DEFAULT_SNAPSHOT_SECONDS = 300
+# Ably's limit is 64 KiB per message including the envelope.
+DEFAULT_MAX_MESSAGE_BYTES = 60000
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _state_of(latitude, longitude, engine_status, is_active) -> List:
+    return [
+        float(latitude) if latitude is not None else None,
+        float(longitude) if longitude is not None else None,
+        engine_status,
+        bool(is_active),
+    ]
+
+
+def has_changed(previous: Optional[List], current: List, min_move_m: float) -> bool:
+    """True if ``current`` differs enough from the last published state."""
+    from orders.route_estimator import haversine_km
+
+    if previous is None:
+        return True
+    if previous[2:] != current[2:]:
+        return True
+    if None in previous[:2] or None in current[:2]:
+        return previous[:2] != current[:2]
+    return haversine_km(previous[0], previous[1], current[0], current[1]) * 1000 >= min_move_m
+
+
+def chunk_payload(items: List[Dict], max_bytes: int) -> List[List[Dict]]:
+    """Split ``items`` into lists whose JSON encoding stays under ``max_bytes``."""
+    chunks, current, size = [], [], 2  # the enclosing []
+    for item in items:
+        item_size = len(json.dumps(item, cls=DjangoJSONEncoder)) + 2  # ", "
+        if current and size + item_size > max_bytes:
+            chunks.append(current)
+            current, size = [], 2
+        current.append(item)
+        size += item_size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _ably_publish_chunks(chunks: List[List[Dict]]) -> None:
+    """Publish each chunk as its own message over a single Ably client."""
+    import asyncio
+
+    from ably import AblyRest
+
+    async def _publish():
+        client = AblyRest(settings.ABLY_API_KEY)
+        channel = client.channels.get(CHANNEL_NAME)
+        for chunk in chunks:
+            await channel.publish(EVENT_NAME, json.loads(json.dumps(chunk, cls=DjangoJSONEncoder)))
+
+    asyncio.run(_publish())
+
+
+def broadcast_telemetry(
+    publish_chunks: Optional[Callable] = None,
+    force_snapshot: bool = False,
+    now: Optional[float] = None,
+) -> Dict:
+    """
+    Publish changed vehicle assets (or a full snapshot when one is due).
+
+    Returns {"mode", "assets", "changed", "messages"}. The published state is
+    only recorded once every chunk went out, so a failed publish is retried
+    in full on the next sync.
+    """
+    from dispatcher.models import Rider, VehicleAsset
+    from dispatcher.serializers import VehicleAssetSerializer
+
+    if publish_chunks is None:
+        publish_chunks = _ably_publish_chunks
+    if now is None:
+        now = time.time()
+
+    min_move_m = float(_setting("VEHICLE_TELEMETRY_MIN_MOVE_METERS", DEFAULT_MIN_MOVE_METERS))
+    snapshot_every = float(_setting("VEHICLE_TELEMETRY_SNAPSHOT_SECONDS", DEFAULT_SNAPSHOT_SECONDS))
+    max_bytes = int(_setting("VEHICLE_TELEMETRY_MAX_MESSAGE_BYTES", DEFAULT_MAX_MESSAGE_BYTES))
+
+    published = cache.get(STATE_CACHE_KEY)
+    last_snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+    snapshot = (
+        force_snapshot
+        or published is None
+        or last_snapshot is None
+        or now - last_snapshot >= snapshot_every
+    )
+    published = published or {}
+
+    # Compare on four columns; only the changed assets are serialized.
+    current = {
+        str(asset_id): _state_of(lat, lng, engine, active)
+        for asset_id, lat, lng, engine, active in VehicleAsset.objects.values_list(
+            "id", "latitude", "longitude", "engine_status", "is_active"
+        )
+    }
+    if snapshot:
+        changed = list(current)
+    else:
+        changed = [
+            asset_id
+            for asset_id, state in current.items()
+            if has_changed(published.get(asset_id), state, min_move_m)
+        ]
+
+    stats = {
+        "mode": "snapshot" if snapshot else "delta",
+        "assets": len(current),
+        "changed": len(changed),
+        "messages": 0,
+    }
+    if not changed:
+        return stats
+
+    assets = VehicleAsset.objects.filter(id__in=changed).prefetch_related(
+        Prefetch("riders", queryset=Rider.objects.select_related("user").order_by("created_at"))
+    )
+    chunks = chunk_payload(list(VehicleAssetSerializer(assets, many=True).data), max_bytes)
+    publish_chunks(chunks)
+    stats["messages"] = len(chunks)
+
+    # Forget deleted assets so the state does not grow without bound.
+    state = {asset_id: published[asset_id] for asset_id in current if asset_id in published}
+    state.update({asset_id: current[asset_id] for asset_id in changed})
+    cache.set(STATE_CACHE_KEY, state, STATE_CACHE_TTL)
+    if snapshot:
+        cache.set(SNAPSHOT_CACHE_KEY, now, STATE_CACHE_TTL)
+    return stats
@@ -1,7 +1,9 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 from unittest.mock import patch
 from decimal import Decimal
 import datetime
+import asyncio
+import time
 
 from rest_framework import serializers
 from rest_framework.test import APIClient
@@ -716,3 +718,635 @@ class VehicleAssetOrdersTodayEndpointTests(TestCase):
         self.assertIsNotNone(row)
         self.assertEqual(row.get("orders_today"), 1)
 
+
+
+class RelayNodeIndexTests(TestCase):
+    def setUp(self):
+        import random
+        from dispatcher import tasks
+        from dispatcher.models import RelayNode
+
+        rng = random.Random(7)
+        for i in range(300):
+            RelayNode.objects.create(
+                name=f"Hub {i}",
+                address=f"Hub {i}",
+                latitude=6.2 + rng.random() * 1.2,
+                longitude=2.9 + rng.random() * 1.6,
+            )
+        tasks._RELAY_NODES_CACHE.update({"ts": 0.0, "nodes": None, "index": None})
+        self.addCleanup(
+            tasks._RELAY_NODES_CACHE.update, {"ts": 0.0, "nodes": None, "index": None}
+        )
+        self.rng = rng
+
+    def _brute_force(self, points, pickup, dropoff, caps, legs=False):
+        """(cap, best cost) by plain Dijkstra over every cap in turn."""
+        import heapq
+        from dispatcher.geo_index import haversine_km as h
+
+        verts = [pickup] + points + [dropoff]
+        for cap in caps:
+            dist = {0: 0.0}
+            heap = [(0.0, 0)]
+            done = set()
+            while heap:
+                c, u = heapq.heappop(heap)
+                if u in done:
+                    continue
+                done.add(u)
+                for v in range(1, len(verts)):
+                    d = h(*verts[u], *verts[v])
+                    if v == u or d > cap:
+                        continue
+                    nc = c + (1 if legs else d)
+                    if nc < dist.get(v, float("inf")):
+                        dist[v] = nc
+                        heapq.heappush(heap, (nc, v))
+            if len(verts) - 1 in dist:
+                return cap, dist[len(verts) - 1]
+        return None
+
+    def test_radius_query_matches_brute_force(self):
+        from dispatcher.geo_index import GeoGridIndex, haversine_km
+        from dispatcher.tasks import _get_active_relay_nodes_cached
+
+        nodes = _get_active_relay_nodes_cached()
+        index = GeoGridIndex(nodes, lambda n: (n.latitude, n.longitude))
+        for _ in range(50):
+            lat = 6.2 + self.rng.random() * 1.2
+            lng = 2.9 + self.rng.random() * 1.6
+            radius = self.rng.choice([0.5, 3.0, 18.0, 80.0])
+            expected = [
+                i for i, n in enumerate(index.items)
+                if haversine_km(lat, lng, n.latitude, n.longitude) <= radius
+            ]
+            self.assertEqual([pos for pos, _ in index.within_radius(lat, lng, radius)], expected)
+
+    def _path_cost(self, pickup, hops, dropoff):
+        from dispatcher.geo_index import haversine_km as h
+
+        stops = [pickup] + [(n.latitude, n.longitude) for n in hops] + [dropoff]
+        legs = [h(*a, *b) for a, b in zip(stops, stops[1:])]
+        return max(legs), sum(legs), len(legs)
+
+    def test_planner_finds_smallest_cap_and_shortest_path(self):
+        from dispatcher.relay_planner import RELAY_LEG_CAPS_KM
+        from dispatcher.tasks import _get_relay_graph_cached
+
+        graph = _get_relay_graph_cached()
+        points = graph.index.points
+        with self.assertNumQueries(0):
+            for _ in range(15):
+                pickup = (6.2 + self.rng.random() * 1.2, 2.9 + self.rng.random() * 1.6)
+                dropoff = (6.2 + self.rng.random() * 1.2, 2.9 + self.rng.random() * 1.6)
+                p = {"lat": pickup[0], "lng": pickup[1]}
+                d = {"lat": dropoff[0], "lng": dropoff[1]}
+
+                for objective, legs in (("distance", False), ("legs", True)):
+                    expected = self._brute_force(points, pickup, dropoff, RELAY_LEG_CAPS_KM, legs)
+                    planned = graph.plan(p, d, objective=objective)
+                    if expected is None:
+                        self.assertIsNone(planned)
+                        continue
+                    hops, cap = planned
+                    longest, km, n_legs = self._path_cost(pickup, hops, dropoff)
+                    self.assertEqual(cap, expected[0])
+                    self.assertLessEqual(longest, cap)
+                    self.assertAlmostEqual(n_legs if legs else km, expected[1], places=6)
+
+    def test_graph_rebuilt_when_relay_node_changes(self):
+        from dispatcher.models import RelayNode
+        from dispatcher.tasks import _get_relay_graph_cached, _plan_relay_hops
+
+        graph = _get_relay_graph_cached()
+        self.assertIs(_get_relay_graph_cached(), graph)
+
+        # Far offshore, well away from the seeded hubs: ~166 km apart
+        pickup = {"lat": 5.0, "lng": 3.0}
+        dropoff = {"lat": 5.0, "lng": 4.5}
+        self.assertIsNone(_plan_relay_hops(pickup, dropoff))
+
+        west = RelayNode.objects.create(
+            name="West", address="West", latitude=5.0, longitude=3.5
+        )
+        self.assertIsNot(_get_relay_graph_cached(), graph)
+        self.assertIsNone(_plan_relay_hops(pickup, dropoff))
+
+        east = RelayNode.objects.create(
+            name="East", address="East", latitude=5.0, longitude=4.0
+        )
+        self.assertEqual(_plan_relay_hops(pickup, dropoff), [west, east])
+
+
+class RiderGeoIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        import random
+        from authentication.models import User
+        from dispatcher.models import Rider
+        from orders.models import Vehicle
+
+        cls.bike = Vehicle.objects.create(name="Bike", max_weight_kg=10, base_price=500)
+        cls.van = Vehicle.objects.create(name="Van", max_weight_kg=500, base_price=900)
+
+        # bulk_create: hashing 240 passwords would dominate the test
+        users = User.objects.bulk_create(
+            [
+                User(phone=f"0807{i:07d}", email=f"geo-rider-{i}@example.com", usertype="Rider")
+                for i in range(240)
+            ]
+        )
+        rng = random.Random(11)
+        Rider.objects.bulk_create(
+            [
+                Rider(
+                    user=user,
+                    rider_id=f"{700000 + i}",
+                    is_authorized=i % 7 != 0,
+                    status=rng.choice(["online", "offline", "on_delivery"]),
+                    vehicle_type=cls.van if i % 3 == 0 else cls.bike,
+                    current_latitude=Decimal(f"{6.3 + rng.random() * 0.5:.6f}"),
+                    current_longitude=Decimal(f"{3.2 + rng.random() * 0.5:.6f}"),
+                )
+                for i, user in enumerate(users)
+            ]
+        )
+        cls.riders = list(Rider.objects.all())
+
+    def setUp(self):
+        import random
+        from dispatcher import rider_index
+
+        rider_index.invalidate_rider_index()
+        self.addCleanup(rider_index.invalidate_rider_index)
+        self.rng = random.Random(11)
+
+    def _brute_force(self, lat, lng, accept):
+        from dispatcher.geo_index import haversine_km
+
+        scored = [
+            (haversine_km(lat, lng, float(r.current_latitude), float(r.current_longitude)), r.id)
+            for r in self.riders
+            if accept(r)
+        ]
+        return sorted(scored)
+
+    def test_k_nearest_matches_brute_force_with_filters(self):
+        from dispatcher.rider_index import nearest_riders, riders_within
+
+        for _ in range(20):
+            lat = 6.3 + self.rng.random() * 0.5
+            lng = 3.2 + self.rng.random() * 0.5
+
+            expected = self._brute_force(
+                lat, lng,
+                lambda r: r.is_authorized and r.status == "online" and r.vehicle_type_id == self.bike.id,
+            )[:5]
+            got = nearest_riders(
+                lat, lng, k=5, statuses=["online"], vehicle_type_id=self.bike.id
+            )
+            self.assertEqual([r_id for r_id, _ in got], [r_id for _, r_id in expected])
+
+            within = riders_within(lat, lng, 3.0, authorized_only=False)
+            self.assertEqual(
+                [r_id for r_id, _ in within],
+                [r_id for d, r_id in self._brute_force(lat, lng, lambda r: True) if d <= 3.0],
+            )
+
+    def test_nearest_rider_not_limited_to_first_200(self):
+        from authentication.models import User
+        from dispatcher.models import Rider
+        from dispatcher.tasks import _nearest_rider_to
+
+        user = User.objects.create_user(
+            phone="08099998888", email="late-rider@example.com", password="x", usertype="Rider"
+        )
+        late = Rider.objects.create(
+            user=user,
+            is_authorized=True,
+            current_latitude=Decimal("6.900000"),
+            current_longitude=Decimal("3.900000"),
+        )
+        with self.assertNumQueries(2):  # one index build, one Rider fetch
+            self.assertEqual(_nearest_rider_to(6.9001, 3.9001), late)
+        with self.assertNumQueries(1):
+            self.assertEqual(_nearest_rider_to(6.9001, 3.9001), late)
+
+
+class NewOrderFanoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from authentication.models import User
+        from dispatcher.models import Rider, SystemSettings
+        from orders.models import Order, Vehicle
+        from riders.models import RiderDevice
+
+        cls.bike = Vehicle.objects.create(name="Bike", max_weight_kg=10, base_price=500)
+        cls.van = Vehicle.objects.create(name="Van", max_weight_kg=500, base_price=900)
+        SystemSettings.objects.create(auto_assign_radius_km=5, max_concurrent_bike=1)
+
+        specs = {
+            # name: (status, vehicle, lat offset in degrees, authorized)
+            "near_bike": ("online", cls.bike, 0.01, True),
+            "nearer_unset": ("online", None, 0.005, True),
+            "near_van": ("online", cls.van, 0.01, True),
+            "near_offline": ("offline", cls.bike, 0.01, True),
+            "near_unauthorized": ("online", cls.bike, 0.01, False),
+            "far_bike": ("online", cls.bike, 0.2, True),
+            "busy_bike": ("online", cls.bike, 0.002, True),
+        }
+        users = User.objects.bulk_create(
+            [
+                User(phone=f"0809{i:07d}", email=f"fanout-{i}@example.com", usertype="Rider")
+                for i in range(len(specs))
+            ]
+        )
+        Rider.objects.bulk_create(
+            [
+                Rider(
+                    user=user,
+                    rider_id=f"{800000 + i}",
+                    status=status,
+                    is_authorized=authorized,
+                    vehicle_type=vehicle,
+                    current_latitude=Decimal(f"{6.5 + offset:.6f}"),
+                    current_longitude=Decimal("3.300000"),
+                )
+                for i, (user, (status, vehicle, offset, authorized)) in enumerate(
+                    zip(users, specs.values())
+                )
+            ]
+        )
+        cls.riders = {
+            name: Rider.objects.get(rider_id=f"{800000 + i}") for i, name in enumerate(specs)
+        }
+        RiderDevice.objects.create(
+            rider=cls.riders["near_bike"], device_id="fanout-d1", fcm_token="tok-1"
+        )
+        RiderDevice.objects.create(
+            rider=cls.riders["nearer_unset"], device_id="fanout-d2", fcm_token="tok-2"
+        )
+        RiderDevice.objects.create(
+            rider=cls.riders["far_bike"], device_id="fanout-d3", fcm_token="tok-3"
+        )
+
+        merchant = User.objects.create(phone="08090000999", email="fanout-merchant@example.com")
+        order_fields = dict(
+            user=merchant,
+            vehicle=cls.bike,
+            pickup_address="Pickup",
+            pickup_latitude=6.5,
+            pickup_longitude=3.3,
+            sender_name="Sender",
+            sender_phone="0800",
+            total_amount=Decimal("1000"),
+        )
+        Order.objects.create(
+            order_number="FAN-BUSY", rider=cls.riders["busy_bike"], status="Assigned", **order_fields
+        )
+        cls.order = Order.objects.create(order_number="FAN-NEW", **order_fields)
+
+    def setUp(self):
+        from dispatcher import rider_index
+
+        rider_index.invalidate_rider_index()
+        self.addCleanup(rider_index.invalidate_rider_index)
+
+    def test_selects_nearest_eligible_riders_only(self):
+        from dispatcher.fanout import select_fanout_riders
+
+        chosen = select_fanout_riders(self.order, k=10)
+        self.assertEqual(
+            [r.id for r in chosen],
+            [self.riders["nearer_unset"].id, self.riders["near_bike"].id],
+        )
+        self.assertEqual(len(select_fanout_riders(self.order, k=1)), 1)
+
+
+class AblyPublisherTests(SimpleTestCase):
+    def _client(self, gate=None):
+        published = []
+
+        class _Channel:
+            def __init__(self, name):
+                self.name = name
+
+            async def publish(self, messages):
+                if gate is not None and not published:
+                    # Hold the first request so later messages pile up behind it
+                    await asyncio.get_running_loop().run_in_executor(None, gate.wait, 5)
+                published.append((self.name, [(m.name, m.data) for m in messages]))
+
+        class _Channels:
+            def get(self, name):
+                return _Channel(name)
+
+        class _Client:
+            channels = _Channels()
+
+        created = []
+
+        def factory(api_key):
+            created.append(api_key)
+            return _Client()
+
+        return factory, published, created
+
+    def test_one_client_for_many_publishes_and_bursts_are_batched(self):
+        import threading
+        from dispatcher.ably_publisher import AblyPublisher
+
+        gate = threading.Event()
+        factory, published, created = self._client(gate)
+        publisher = AblyPublisher("key", client_factory=factory)
+
+        self.assertTrue(publisher.publish("dispatch-feed", "activity", {"n": 0}))
+        time.sleep(0.1)  # first request is now in flight, held by the gate
+        for n in range(1, 4):
+            publisher.publish("dispatch-feed", "activity", {"n": n})
+        publisher.publish("for-you-123456", "order_assigned", {"order": "X"})
+        gate.set()
+        self.assertTrue(publisher.flush(timeout=5))
+
+        self.assertEqual(created, ["key"])
+        self.assertEqual(published[0], ("dispatch-feed", [("activity", {"n": 0})]))
+        self.assertIn(
+            ("dispatch-feed", [("activity", {"n": 1}), ("activity", {"n": 2}), ("activity", {"n": 3})]),
+            published,
+        )
+        self.assertIn(("for-you-123456", [("order_assigned", {"order": "X"})]), published)
+        self.assertEqual(publisher.stats["requests"], 3)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        import threading
+        from dispatcher.ably_publisher import AblyPublisher
+
+        gate = threading.Event()
+        factory, published, _ = self._client(gate)
+        publisher = AblyPublisher("key", client_factory=factory, queue_size=2)
+
+        publisher.publish("c", "e", 0)
+        time.sleep(0.1)
+        results = [publisher.publish("c", "e", n) for n in range(1, 5)]
+        gate.set()
+        publisher.flush(timeout=5)
+
+        self.assertEqual(results, [True, True, False, False])
+        self.assertEqual(publisher.stats["dropped"], 2)
+
+    def test_call_runs_on_the_shared_client(self):
+        from dispatcher.ably_publisher import AblyPublisher
+
+        factory, _, created = self._client()
+        publisher = AblyPublisher("key", client_factory=factory)
+
+        async def _channel_name(client):
+            return client.channels.get("x").name
+
+        self.assertEqual(publisher.call(_channel_name), "x")
+        publisher.publish("c", "e", {})
+        publisher.flush(timeout=5)
+        self.assertEqual(created, ["key"])
+
+    @override_settings(ABLY_API_KEY="")
+    def test_publish_without_api_key_is_a_no_op(self):
+        from dispatcher.ably_publisher import publish
+
+        self.assertFalse(publish("dispatch-feed", "activity", {}))
+
+
+class TelemetryBroadcastTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from .models import VehicleAsset
+
+        VehicleAsset.objects.bulk_create(
+            [
+                VehicleAsset(
+                    asset_id=f"AXTB{i:05d}",
+                    plate_number=f"TB-{i:03d}",
+                    vehicle_type="bike",
+                    latitude=Decimal("6.5000000"),
+                    longitude=Decimal("3.3000000") + Decimal(i) / 100,
+                    engine_status="off",
+                )
+                for i in range(3)
+            ]
+        )
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .telemetry_broadcast import SNAPSHOT_CACHE_KEY, STATE_CACHE_KEY
+
+        cache.delete_many([STATE_CACHE_KEY, SNAPSHOT_CACHE_KEY])
+        self.sent = []
+
+    def _broadcast(self, now, **kwargs):
+        from .telemetry_broadcast import broadcast_telemetry
+
+        return broadcast_telemetry(publish_chunks=self.sent.append, now=now, **kwargs)
+
+    def test_first_run_snapshots_then_only_changes_are_published(self):
+        from .models import VehicleAsset
+
+        stats = self._broadcast(now=1000)
+        self.assertEqual((stats["mode"], stats["changed"]), ("snapshot", 3))
+
+        # Nothing changed: nothing published
+        stats = self._broadcast(now=1010)
+        self.assertEqual((stats["mode"], stats["changed"], stats["messages"]), ("delta", 0, 0))
+        self.assertEqual(len(self.sent), 1)
+
+        moved = VehicleAsset.objects.get(plate_number="TB-000")
+        moved.latitude = Decimal("6.5010000")  # ~110 m
+        moved.save(update_fields=["latitude"])
+        jitter = VehicleAsset.objects.get(plate_number="TB-001")
+        jitter.latitude = Decimal("6.5000500")  # ~5 m, under the threshold
+        jitter.save(update_fields=["latitude"])
+        VehicleAsset.objects.filter(plate_number="TB-002").update(engine_status="on")
+
+        stats = self._broadcast(now=1020)
+        self.assertEqual(stats["changed"], 2)
+        self.assertEqual(
+            sorted(item["plate_number"] for chunk in self.sent[-1] for item in chunk),
+            ["TB-000", "TB-002"],
+        )
+
+    @override_settings(VEHICLE_TELEMETRY_SNAPSHOT_SECONDS=60)
+    def test_full_snapshot_is_resent_periodically(self):
+        self._broadcast(now=1000)
+        self.assertEqual(self._broadcast(now=1030)["changed"], 0)
+        stats = self._broadcast(now=1061)
+        self.assertEqual((stats["mode"], stats["changed"]), ("snapshot", 3))
+
+    def test_failed_publish_is_retried_on_next_sync(self):
+        from .telemetry_broadcast import broadcast_telemetry
+
+        def failing(chunks):
+            raise RuntimeError("ably down")
+
+        with self.assertRaises(RuntimeError):
+            broadcast_telemetry(publish_chunks=failing, now=1000)
+        self.assertEqual(self._broadcast(now=1010)["changed"], 3)
+
+    def test_chunks_stay_under_message_size(self):
+        import json
+        from .telemetry_broadcast import chunk_payload
+
+        items = [{"id": i, "pad": "x" * 100} for i in range(50)]
+        chunks = chunk_payload(items, max_bytes=1000)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual([item for chunk in chunks for item in chunk], items)
+        for chunk in chunks:
+            self.assertLessEqual(len(json.dumps(chunk)), 1000)
+
+
+@override_settings(ABLY_API_KEY="appid.keyid:secret", ABLY_TOKEN_REFRESH_MARGIN_SECONDS=3600)
+class AblyTokenViewTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from authentication.models import User
+
+        cache.clear()
+        self.user = User.objects.create_user(
+            phone="08055553333",
+            email="ably_token@example.com",
+            password="testpassword",
+            usertype="Dispatcher",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _details(self, expires_in_s):
+        now_ms = int(time.time() * 1000)
+        return {"token": f"tok-{now_ms}", "issued": now_ms, "expires": now_ms + expires_in_s * 1000}
+
+    def test_token_is_cached_until_near_expiry(self):
+        with patch(
+            "dispatcher.ably_tokens._request_token", return_value=self._details(24 * 3600)
+        ) as request_token:
+            first = self.client.get("/api/dispatch/ably-token/")
+            second = self.client.get("/api/dispatch/ably-token/")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data["token"], second.data["token"])
+        self.assertEqual(request_token.call_count, 1)
+
+    def test_token_inside_refresh_margin_is_replaced(self):
+        from dispatcher.ably_tokens import capability_for, get_token
+
+        capability = capability_for(None)
+        with patch("dispatcher.ably_tokens._request_token", return_value=self._details(1800)):
+            get_token(self.user.pk, capability)  # expires within the margin: not cached
+        with patch(
+            "dispatcher.ably_tokens._request_token", return_value=self._details(24 * 3600)
+        ) as request_token:
+            get_token(self.user.pk, capability)
+        self.assertEqual(request_token.call_count, 1)
+
+    def test_token_request_is_signed_locally(self):
+        from ably.types.tokenrequest import TokenRequest
+        from dispatcher.ably_tokens import capability_for, sign_token_request
+
+        signed = sign_token_request("appid.keyid:secret", capability_for("R1"), ttl_ms=60000)
+        self.assertEqual(signed["keyName"], "appid.keyid")
+        self.assertIn("for-you-R1", signed["capability"])
+
+        expected = TokenRequest.from_json({k: v for k, v in signed.items() if k != "mac"})
+        expected.sign_request("secret")
+        self.assertEqual(signed["mac"], expected.mac)
+
+
+class SideEffectDispatcherTests(TestCase):
+    def test_effect_is_not_released_when_the_transaction_rolls_back(self):
+        from django.db import transaction
+        from dispatcher.side_effects import dispatch, side_effect_stats
+
+        before = side_effect_stats()["process"]["dispatched"]
+        with patch("webhooks.utils.trigger_webhook") as webhook:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                try:
+                    with transaction.atomic():
+                        dispatch("webhook", event_name="order-created", payload={"n": 1})
+                        raise RuntimeError("rolled back")
+                except RuntimeError:
+                    pass
+
+        self.assertEqual(callbacks, [])
+        webhook.assert_not_called()
+        self.assertEqual(side_effect_stats()["process"]["dispatched"], before)
+
+    def test_stats_endpoint_is_admin_only(self):
+        from authentication.models import User
+
+        user = User.objects.create_user(
+            phone="08055554444", email="side_effects@example.com", password="testpassword"
+        )
+        client = APIClient()
+        client.force_authenticate(user=user)
+        self.assertEqual(client.get("/api/dispatch/side-effects/stats/").status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = client.get("/api/dispatch/side-effects/stats/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("queue_depth", response.data["process"])
+        self.assertIn("dropped", response.data["process"])
+
+    @override_settings(SIDE_EFFECTS_BACKEND="inline")
+    def test_effect_runs_after_commit_with_json_safe_kwargs(self):
+        from dispatcher.side_effects import dispatch
+
+        with patch("webhooks.utils.trigger_webhook") as webhook:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                dispatch(
+                    "webhook",
+                    event_name="order-completed",
+                    payload={"amount": Decimal("1500.00")},
+                )
+                webhook.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        webhook.assert_called_once_with(
+            event_name="order-completed", payload={"amount": "1500.00"}
+        )
+
+    @override_settings(SIDE_EFFECTS_BACKEND="celery")
+    def test_celery_backend_queues_the_task(self):
+        from dispatcher.side_effects import dispatch
+
+        with patch("dispatcher.tasks.run_side_effect_task.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                dispatch("activity", event_type="cancelled", order_id="6158001", text="x")
+
+        delay.assert_called_once_with(
+            "activity", {"event_type": "cancelled", "order_id": "6158001", "text": "x"}
+        )
+
+    @override_settings(SIDE_EFFECTS_WORKERS=0, SIDE_EFFECTS_QUEUE_SIZE=1)
+    def test_full_pool_queue_drops_and_counts(self):
+        from dispatcher.side_effects import _Pool, side_effect_stats
+
+        pool = _Pool()
+        before = side_effect_stats()["process"]["dropped"]
+
+        self.assertTrue(pool.submit("activity", {}))
+        self.assertFalse(pool.submit("activity", {}))
+
+        self.assertEqual(pool.depth(), 1)
+        self.assertEqual(side_effect_stats()["process"]["dropped"], before + 1)
+
+    def test_failing_handler_is_counted(self):
+        from dispatcher.side_effects import run_side_effect, side_effect_stats
+
+        before = side_effect_stats()["process"]
+        with patch("dispatcher.utils.emit_activity", side_effect=RuntimeError("down")):
+            self.assertFalse(run_side_effect("activity", {"event_type": "x"}))
+        with patch("dispatcher.utils.emit_activity"):
+            self.assertTrue(run_side_effect("activity", {"event_type": "x"}))
+
+        after = side_effect_stats()["process"]
+        self.assertEqual(after["failed"], before["failed"] + 1)
+        self.assertEqual(after["executed"], before["executed"] + 1)
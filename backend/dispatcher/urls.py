@@ -10,6 +10,7 @@ from .views import (
     S3PresignedUrlView,
     ActivityFeedView,
     AblyTokenView,
+    SideEffectStatsView,
     ZoneViewSet,
     RelayNodeViewSet,
     DispatcherViewSet,
@@ -36,5 +37,6 @@ urlpatterns = [
     path("s3/presigned-url/", S3PresignedUrlView.as_view(), name="s3-presigned-url"),
     path("activity/", ActivityFeedView.as_view(), name="activity-feed"),
     path("ably-token/", AblyTokenView.as_view(), name="ably-token"),
+    path("side-effects/stats/", SideEffectStatsView.as_view(), name="side-effect-stats"),
     path("", include(router.urls)),
 ]
@@ -28,17 +28,9 @@ def emit_activity(event_type, order_id, text, color="gold", metadata=None):
         logger.error(f"emit_activity: DB write failed for {order_id}: {exc}")
         return
 
-    # 2. Publish to Ably
+    # 2. Publish to Ably (queued; sent by the process-wide publisher thread)
     try:
-        api_key = getattr(settings, "ABLY_API_KEY", "")
-        if not api_key:
-            logger.warning(
-                "emit_activity: ABLY_API_KEY not configured, skipping publish"
-            )
-            return
-
-        import asyncio
-        from ably import AblyRest
+        from .ably_publisher import publish
 
         payload = {
             "id": str(entry.id),
@@ -49,14 +41,8 @@ def emit_activity(event_type, order_id, text, color="gold", metadata=None):
             "metadata": entry.metadata,
             "created_at": entry.created_at.isoformat(),
         }
-
-        async def _publish():
-            client = AblyRest(api_key)
-            channel = client.channels.get("dispatch-feed")
-            await channel.publish("activity", payload)
-
-        asyncio.run(_publish())
-        logger.info(f"emit_activity: published [{event_type}] {order_id}")
+        if publish("dispatch-feed", "activity", payload):
+            logger.info(f"emit_activity: queued [{event_type}] {order_id}")
     except Exception as exc:
         logger.error(f"emit_activity: Ably publish failed for {order_id}: {exc}")
 
@@ -16,7 +16,7 @@ from .utils import emit_activity
 from django.contrib.auth import authenticate, get_user_model
 from django.db.models import Count, Q, Prefetch
 from django.utils import timezone
-from riders.notifications import notify_rider
+from riders.outbox import queue_rider_notification
 from riders.views import publish_order_assigned_event
 
 logger = logging.getLogger(__name__)
@@ -207,7 +207,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         # If a rider is already assigned at creation time, notify them
         if order.rider:
             try:
-                notify_rider(
+                queue_rider_notification(
                     rider=order.rider,
                     title="New Order Assigned 📦",
                     body=f"A new order #{order.order_number} from {merchant_name} has been assigned to you.",
@@ -256,7 +256,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
             # Push notification to the assigned rider
             try:
-                notify_rider(
+                queue_rider_notification(
                     rider=rider,
                     title="New Order Assigned 📦",
                     body=f"Order #{order.order_number} has been assigned to you. Please head to the pickup location.",
@@ -552,12 +552,23 @@ class ActivityFeedView(views.APIView):
         return Response(serializer.data)
 
 
+class SideEffectStatsView(views.APIView):
+    """Queue depth and dispatched/executed/failed/dropped counts of dispatcher.side_effects."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        from .side_effects import side_effect_stats
+
+        return Response(side_effect_stats())
+
+
 class AblyTokenView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        import json
         from django.conf import settings as django_settings
+        from .ably_tokens import issue_tokens
 
         api_key = getattr(django_settings, "ABLY_API_KEY", "")
         if not api_key:
@@ -565,47 +576,9 @@ class AblyTokenView(views.APIView):
                 {"error": "Ably not configured"},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE,
             )
-        rider_id = None
-        try:
-            rider_id = request.user.rider_profile.rider_id
-        except Exception:
-            pass
-
-        # Wildcard capability: covers "assigned-{any-rider-id}" and the broadcast feed.
-        # Dispatchers (no rider profile) only get dispatch-feed.
-        capability = {
-            "dispatch-feed": ["subscribe"],
-            "vehicle-telemetry": ["subscribe"],
-            "assigned-*": ["subscribe"],
-            "for-you": ["subscribe"],
-            "for-you*": ["subscribe"],
-            f"for-you-{rider_id}": ["subscribe"],
-            "assigned*": ["subscribe"],
-            "order*": ["subscribe"],
-            "location-update": ["publish", "subscribe"],
-        }
 
         try:
-            import asyncio
-            from ably import AblyRest
-
-            async def _create_both():
-                client = AblyRest(api_key)
-                params = {
-                    "capability": json.dumps(capability),
-                    "ttl": 24 * 60 * 60 * 1000,  # 24 hours in ms (Ably max)
-                }
-                token_details = await client.auth.request_token(params)
-                token_request = await client.auth.create_token_request(params)
-                return token_details, token_request
-
-            token_details, token_request = asyncio.run(_create_both())
-            return Response(
-                {
-                    "token": token_details.token,
-                    "token_request": token_request.to_dict(),
-                }
-            )
+            return Response(issue_tokens(request.user))
         except Exception as exc:
             return Response(
                 {"error": str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
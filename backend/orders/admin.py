@@ -1,5 +1,14 @@
 from django.contrib import admin
-from .models import Vehicle, Order, Delivery, OrderLeg, MerchantPricingOverride
+from .models import (
+    Vehicle,
+    Order,
+    Delivery,
+    OrderLeg,
+    MerchantPricingOverride,
+    RouteCacheEntry,
+    GeocodeCacheEntry,
+    RouteEstimateCoefficient,
+)
 
 
 class DeliveryInline(admin.TabularInline):
@@ -48,6 +57,20 @@ class MerchantPricingOverrideAdmin(admin.ModelAdmin):
     ordering = ["-created_at"]
 
 
+@admin.register(RouteCacheEntry)
+class RouteCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ["cache_key", "hits", "created_at", "last_hit_at"]
+    search_fields = ["cache_key"]
+    ordering = ["-last_hit_at"]
+
+
+@admin.register(GeocodeCacheEntry)
+class GeocodeCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ["address", "latitude", "longitude", "hits", "last_hit_at"]
+    search_fields = ["address"]
+    ordering = ["-last_hit_at"]
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     """Admin configuration for Order model."""
@@ -141,3 +164,10 @@ class OrderLegAdmin(admin.ModelAdmin):
     search_fields = ['order__order_number', 'rider__rider_id', 'hub_pin']
     readonly_fields = ['id', 'hub_pin', 'created_at']
     ordering = ['order', 'leg_number']
+
+
+@admin.register(RouteEstimateCoefficient)
+class RouteEstimateCoefficientAdmin(admin.ModelAdmin):
+    list_display = ["zone", "hour", "road_factor", "minutes_per_km", "samples", "fitted_at"]
+    list_filter = ["zone"]
+    ordering = ["zone", "hour"]
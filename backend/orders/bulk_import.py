@@ -0,0 +1,193 @@
+"""
+Bulk Import order ingestion.
+
+A Bulk Import is one Order with many Delivery rows. The whole payload is
+validated in one BulkImportSerializer pass and ``create_bulk_order`` hands it
+to the shared order pipeline (orders.services), which inserts the deliveries
+with bulk_create in BULK_IMPORT_BATCH_SIZE batches, holds escrow once, and
+sends one activity-feed event, one new-order fan-out and one order-created
+webhook for the import, rather than per stop.
+
+Payloads come from the JSON body or an uploaded CSV/JSON file
+(``parse_upload``). Imports with more than BULK_IMPORT_SYNC_MAX_ROWS stops
+are handed to the process_bulk_import Celery task; its progress is kept in
+the cache under the job id and served by BulkImportStatusView.
+"""
+
+import csv
+import io
+import json
+import logging
+import uuid
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .services import OrderCreationError
+
+logger = logging.getLogger(__name__)
+
+JOB_CACHE_KEY = "bulk_import:job:{job_id}"
+JOB_TTL_SECONDS = 24 * 60 * 60
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_SYNC_MAX_ROWS = 2000
+
+# Per-stop columns accepted in an uploaded CSV (see MultiDropDeliverySerializer).
+DELIVERY_COLUMNS = (
+    "dropoff_address",
+    "receiver_name",
+    "receiver_phone",
+    "package_type",
+    "notes",
+    "cod_amount",
+    "distance_km",
+    "duration_minutes",
+)
+
+
+class BulkImportError(OrderCreationError):
+    """Upload could not be parsed or failed validation."""
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _parse_csv(raw: bytes):
+    reader = csv.DictReader(io.StringIO(raw.decode("utf-8-sig")))
+    deliveries = []
+    for row in reader:
+        stop = {}
+        for column in DELIVERY_COLUMNS:
+            value = (row.get(column) or "").strip()
+            if value:
+                stop[column] = value
+        if stop:
+            deliveries.append(stop)
+    return deliveries
+
+
+def parse_upload(request_data, upload) -> Dict:
+    """
+    Import payload from the request fields plus an optional uploaded file.
+
+    A CSV file has one stop per row with DELIVERY_COLUMNS headers; a JSON
+    file holds either the full payload or just the list of deliveries.
+    Order-level fields (pickup, vehicle, route metrics...) come from the
+    request fields and are overridden by those in a full JSON payload.
+    """
+    if hasattr(request_data, "dict"):
+        payload = request_data.dict()
+    else:
+        payload = dict(request_data)
+    payload.pop("file", None)
+    if upload is None:
+        return payload
+
+    raw = upload.read()
+    name = (getattr(upload, "name", "") or "").lower()
+    try:
+        if name.endswith(".json") or raw.lstrip()[:1] in (b"{", b"["):
+            content = json.loads(raw.decode("utf-8-sig"))
+            if isinstance(content, list):
+                payload["deliveries"] = content
+            else:
+                payload.update(content)
+        else:
+            payload["deliveries"] = _parse_csv(raw)
+    except (ValueError, UnicodeDecodeError, csv.Error) as exc:
+        raise BulkImportError({"file": [f"Could not parse upload: {exc}"]})
+    return payload
+
+
+def validate_import(payload: Dict) -> Dict:
+    from .serializers import BulkImportSerializer
+
+    serializer = BulkImportSerializer(data=payload)
+    if not serializer.is_valid():
+        raise BulkImportError(serializer.errors)
+    return serializer.validated_data
+
+
+def create_bulk_order(user, data: Dict, progress: Optional[Callable] = None):
+    """
+    Create a Bulk Import order from validated ``data`` through the shared
+    order pipeline (orders.services). Raises OrderCreationError, with
+    nothing written, when the wallet cannot cover it. ``progress(done, total)``
+    is called after each delivery batch.
+    """
+    from .models import Vehicle
+    from .services import create_order, order_fields_from, stop_fields_from
+
+    vehicle = Vehicle.objects.get(name=data["vehicle"], is_active=True)
+    unit_fare = vehicle.calculate_fare(data.get("distance_km", 0), data.get("duration_minutes", 0))
+    return create_order(
+        user,
+        vehicle,
+        mode="bulk",
+        total_amount=unit_fare * len(data["deliveries"]),
+        order_fields=order_fields_from(data),
+        deliveries=[stop_fields_from(stop) for stop in data["deliveries"]],
+        progress=progress,
+        batch_size=int(_setting("BULK_IMPORT_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+    )
+
+
+# ── Background jobs ─────────────────────────────────────────────────────
+
+
+def _set_job(job_id: str, **fields) -> Dict:
+    key = JOB_CACHE_KEY.format(job_id=job_id)
+    job = cache.get(key) or {"job_id": job_id}
+    job.update(fields)
+    cache.set(key, job, JOB_TTL_SECONDS)
+    return job
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    return cache.get(JOB_CACHE_KEY.format(job_id=job_id))
+
+
+def should_run_in_background(payload: Dict) -> bool:
+    deliveries = payload.get("deliveries") or []
+    return len(deliveries) > int(_setting("BULK_IMPORT_SYNC_MAX_ROWS", DEFAULT_SYNC_MAX_ROWS))
+
+
+def start_job(user, payload: Dict) -> Dict:
+    """Queue ``payload`` (JSON-compatible, not yet validated) for the worker."""
+    from .tasks import process_bulk_import
+
+    job_id = uuid.uuid4().hex
+    job = _set_job(
+        job_id,
+        user_id=str(user.pk),
+        status="queued",
+        total=len(payload.get("deliveries") or []),
+        processed=0,
+        order_number=None,
+        errors=None,
+    )
+    transaction.on_commit(lambda: process_bulk_import.delay(job_id, str(user.pk), payload))
+    return job
+
+
+def run_job(job_id: str, user_id: str, payload: Dict) -> Dict:
+    """Worker side of ``start_job``. Returns the final job state."""
+    from authentication.models import User
+
+    _set_job(job_id, status="running")
+    try:
+        user = User.objects.get(pk=user_id)
+        data = validate_import(payload)
+        order = create_bulk_order(
+            user, data, progress=lambda done, total: _set_job(job_id, processed=done)
+        )
+    except OrderCreationError as e:
+        return _set_job(job_id, status="failed", errors=e.errors, processed=0)
+    except Exception as e:
+        logger.error(f"Error in process_bulk_import {job_id}: {str(e)}")
+        return _set_job(job_id, status="failed", errors={"detail": [str(e)]}, processed=0)
+    return _set_job(job_id, status="done", order_number=order.order_number)
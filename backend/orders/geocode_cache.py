@@ -0,0 +1,146 @@
+"""
+Geocoding cache keyed by normalised address text.
+
+Tiers: process-local LRU -> shared cache (Redis) -> GeocodeCacheEntry table.
+Only successful lookups are stored; ``orders.utils.geocode_address`` and
+``orders.utils.geocode_many`` read and fill it.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_CACHE_KEY_PREFIX = "geocode:"
+GEOCODE_LOCAL_MAX_ENTRIES = 2048
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+_SEPARATORS = re.compile(r"[\s,;.]+")
+
+
+def normalize_address(address: str) -> str:
+    """Lower-case, collapse whitespace and separators."""
+    return _SEPARATORS.sub(" ", (address or "").lower()).strip()
+
+
+def address_key(address: str) -> str:
+    return hashlib.sha1(normalize_address(address).encode()).hexdigest()
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "GEOCODE_CACHE_TTL_SECONDS", 30 * 24 * 3600))
+
+
+def _remember_local(key: str, coords: Dict[str, float]) -> None:
+    with _local_lock:
+        _local[key] = coords
+        _local.move_to_end(key)
+        while len(_local) > GEOCODE_LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+
+
+def get_cached_many(addresses: Iterable[str]) -> Dict[str, Dict[str, float]]:
+    """Return ``{address_key: {'lat', 'lng'}}`` for every cached address."""
+    from .models import GeocodeCacheEntry
+
+    keys = {address_key(a) for a in addresses if a}
+    found = {}
+
+    for key in keys:
+        coords = _local.get(key)
+        if coords is not None:
+            found[key] = coords
+
+    missing = keys - found.keys()
+    if missing:
+        try:
+            shared = cache.get_many([GEOCODE_CACHE_KEY_PREFIX + k for k in missing])
+        except Exception:
+            shared = {}
+        for cache_key, coords in shared.items():
+            key = cache_key[len(GEOCODE_CACHE_KEY_PREFIX):]
+            found[key] = coords
+            _remember_local(key, coords)
+
+    missing = keys - found.keys()
+    if missing:
+        rows = list(
+            GeocodeCacheEntry.objects.filter(address_key__in=missing).values_list(
+                "address_key", "latitude", "longitude"
+            )
+        )
+        if rows:
+            GeocodeCacheEntry.objects.filter(
+                address_key__in=[r[0] for r in rows]
+            ).update(hits=F("hits") + 1, last_hit_at=timezone.now())
+        promote = {}
+        for key, lat, lng in rows:
+            coords = {"lat": lat, "lng": lng}
+            found[key] = coords
+            promote[GEOCODE_CACHE_KEY_PREFIX + key] = coords
+            _remember_local(key, coords)
+        if promote:
+            try:
+                cache.set_many(promote, _ttl())
+            except Exception:
+                pass
+
+    return found
+
+
+def get_cached(address: str) -> Optional[Dict[str, float]]:
+    return get_cached_many([address]).get(address_key(address))
+
+
+def store_many(results: Dict[str, Dict[str, float]]) -> None:
+    """Persist ``{address: {'lat', 'lng'}}`` to every tier."""
+    from .models import GeocodeCacheEntry
+
+    rows = {}
+    for address, coords in results.items():
+        if not coords:
+            continue
+        key = address_key(address)
+        rows[key] = GeocodeCacheEntry(
+            address_key=key,
+            address=normalize_address(address),
+            latitude=coords["lat"],
+            longitude=coords["lng"],
+        )
+        _remember_local(key, coords)
+
+    if not rows:
+        return
+
+    try:
+        cache.set_many(
+            {
+                GEOCODE_CACHE_KEY_PREFIX + key: {"lat": r.latitude, "lng": r.longitude}
+                for key, r in rows.items()
+            },
+            _ttl(),
+        )
+    except Exception:
+        pass
+
+    try:
+        with transaction.atomic():
+            GeocodeCacheEntry.objects.bulk_create(rows.values(), ignore_conflicts=True)
+    except Exception as exc:
+        logger.warning(f"geocode_cache: DB write failed: {exc}")
+
+
+def store(address: str, coords: Dict[str, float]) -> None:
+    store_many({address: coords})
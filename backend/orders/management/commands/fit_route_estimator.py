@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.route_estimator import fit_coefficients
+
+
+class Command(BaseCommand):
+    help = (
+        "Refit the offline route estimator (road factor and minutes per km, "
+        "by zone and hour of day) from stored delivery distances/durations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Use deliveries from orders created in the last N days (default 90).",
+        )
+        parser.add_argument(
+            "--min-samples",
+            type=int,
+            default=20,
+            help="Minimum legs for a zone/hour bucket to be stored (default 20).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the fitted coefficients without saving them.",
+        )
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        min_samples = options["min_samples"]
+        if days <= 0:
+            raise CommandError("--days must be > 0")
+        if min_samples < 1:
+            raise CommandError("--min-samples must be >= 1")
+
+        result = fit_coefficients(
+            since_days=days, min_samples=min_samples, dry_run=options["dry_run"]
+        )
+
+        for row in sorted(
+            result["rows"],
+            key=lambda r: (str(r.zone_id or ""), -1 if r.hour is None else r.hour),
+        ):
+            self.stdout.write(
+                f"zone={row.zone_id or '*'} hour={'*' if row.hour is None else row.hour} "
+                f"road_factor={row.road_factor} minutes_per_km={row.minutes_per_km} "
+                f"samples={row.samples}"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Route estimator {'fitted (dry run)' if options['dry_run'] else 'fitted'} "
+                f"scanned_legs={result['scanned']} used_legs={result['kept']} "
+                f"buckets={result['buckets']}"
+            )
+        )
@@ -65,51 +65,19 @@ class Vehicle(models.Model):
         If the vehicle has ``pricing_tiers`` (JSON field), the tiered algorithm
         is used — this must match the frontend's ``calcTieredPrice`` exactly so
         the price the user sees during checkout equals the price stored on the
-        order.
+        order. The tier config is compiled once per instance and reused until
+        the row is saved (see ``get_fare_schedule``).
 
         Otherwise falls back to the legacy formula:
             base_fare + rate_per_km * dist + rate_per_minute * dur
         with ``min_fee`` as a floor.
         """
-        from decimal import Decimal, ROUND_HALF_UP
-        import math
-
-        km = float(distance_km)
+        from decimal import Decimal
 
         # ── Tiered pricing (mirrors frontend calcTieredPrice) ──────────
-        pt = self.pricing_tiers
-        if pt and pt.get("type") == "tiered":
-            floor_km = float(pt.get("floor_km", 0))
-            floor_fee = float(pt.get("floor_fee", 0))
-            tiers = pt.get("tiers") or []
-
-            if km <= floor_km:
-                return Decimal(str(floor_fee)).quantize(Decimal("0.01"))
-
-            # Generic tiered pricing (supports 3-tier legacy + 4-tier 25km breakpoint + future tiers)
-            prev_max_km = floor_km
-            prev_rate = None
-            for i, tier in enumerate(tiers):
-                if not isinstance(tier, dict):
-                    continue
-                rate = float(tier.get("rate") or 0)
-                max_km = tier.get("max_km")
-
-                min_floor = floor_fee if i == 0 else round(prev_max_km * float(prev_rate or 0))
-
-                # Unbounded tier (or missing max) applies to any remaining distances
-                if max_km is None or km <= float(max_km):
-                    price = max(round(km * rate), round(min_floor))
-                    return Decimal(str(price)).quantize(Decimal("0.01"))
-
-                prev_max_km = float(max_km)
-                prev_rate = rate
-
-            # Fallback for unexpected tier config
-            last_rate = float(tiers[-1].get("rate") or 0) if tiers else 0
-            min_floor = floor_fee if prev_rate is None else round(prev_max_km * float(prev_rate or 0))
-            price = max(round(km * last_rate), round(min_floor))
-            return Decimal(str(price)).quantize(Decimal("0.01"))
+        schedule = self.get_fare_schedule()
+        if schedule is not None:
+            return schedule.fare(distance_km)
 
         # ── Legacy formula ─────────────────────────────────────────────
         dist = Decimal(str(distance_km))
@@ -136,6 +104,16 @@ class Vehicle(models.Model):
 
         return total.quantize(Decimal("0.01"))
 
+    def get_fare_schedule(self):
+        """Compiled ``pricing_tiers`` (see orders.pricing.TieredFareSchedule)."""
+        from .pricing import get_fare_schedule
+
+        return get_fare_schedule(self)
+
+    def save(self, *args, **kwargs):
+        self.__dict__.pop("_fare_schedule", None)
+        super().save(*args, **kwargs)
+
 
 class MerchantPricingOverride(models.Model):
     """Optional per-merchant pricing override for a specific vehicle.
@@ -189,6 +167,16 @@ class MerchantPricingOverride(models.Model):
     def __str__(self):
         return f"Override: {self.merchant_id} × {self.vehicle.name}"
 
+    def get_fare_schedule(self):
+        """Compiled ``pricing_tiers`` (see orders.pricing.TieredFareSchedule)."""
+        from .pricing import get_fare_schedule
+
+        return get_fare_schedule(self)
+
+    def save(self, *args, **kwargs):
+        self.__dict__.pop("_fare_schedule", None)
+        super().save(*args, **kwargs)
+
 
 class Order(models.Model):
     """Main order model for delivery requests."""
@@ -359,21 +347,71 @@ class Order(models.Model):
     def __str__(self):
         return f"Order {self.order_number} - {self.user.business_name}"
 
+    # ── Dirty tracking ──
+    # The values an order was loaded with are kept on the instance, so save()
+    # writes only the fields that changed (a concurrent save of other fields
+    # is not overwritten with stale values) and signals can see the previous
+    # status without reading the row again.
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def _remember_values(self, fields=None):
+        """Record the current value of ``fields`` (default: all loaded) as saved."""
+        deferred = self.get_deferred_fields()
+        loaded = dict(getattr(self, "_loaded_values", None) or {})
+        for field in self._meta.concrete_fields:
+            if field.attname in deferred:
+                continue
+            if fields is None or field.name in fields or field.attname in fields:
+                loaded[field.attname] = getattr(self, field.attname)
+        self._loaded_values = loaded
+
+    def loaded_value(self, attname, default=None):
+        """Value of ``attname`` when this order was loaded or last saved."""
+        return (getattr(self, "_loaded_values", None) or {}).get(attname, default)
+
+    def changed_fields(self):
+        """Names of loaded fields whose value differs from the last load/save."""
+        loaded = getattr(self, "_loaded_values", None) or {}
+        return [
+            field.name
+            for field in self._meta.concrete_fields
+            if field.attname in loaded and getattr(self, field.attname) != loaded[field.attname]
+        ]
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._remember_values(fields)
+
     def save(self, *args, **kwargs):
-        """Generate order number if not exists."""
+        """Generate order number if not exists; update only changed fields."""
         if not self.order_number:
-            # Generate order number: 6XXXXXX format
-            last_order = Order.objects.order_by("-created_at").first()
-            if last_order and last_order.order_number:
-                try:
-                    last_num = int(last_order.order_number)
-                    self.order_number = str(last_num + 1)
-                except ValueError:
-                    self.order_number = str(6158000 + Order.objects.count() + 1)
-            else:
-                self.order_number = "6158000"
+            from .order_numbers import next_order_number
+
+            self.order_number = next_order_number()
+
+        if (
+            not args
+            and not self._state.adding
+            and getattr(self, "_loaded_values", None) is not None
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            changed = self.changed_fields()
+            # auto_now fields are set during save, so they are always written
+            changed += [
+                f.name
+                for f in self._meta.concrete_fields
+                if getattr(f, "auto_now", False) and f.name not in changed
+            ]
+            kwargs["update_fields"] = changed
 
         super().save(*args, **kwargs)
+        self._remember_values(kwargs.get("update_fields"))
 
 
 class Delivery(models.Model):
@@ -599,3 +637,75 @@ class OrderLeg(models.Model):
         if not self.hub_pin:
             self.hub_pin = "".join(random.choices(string.digits, k=6))
         super().save(*args, **kwargs)
+
+
+class RouteCacheEntry(models.Model):
+    """
+    Cold tier of the Directions route cache (see orders.route_cache).
+    One row per geohash-rounded origin → stops chain; legs are stored raw as
+    [[distance_m, duration_s], ...].
+    """
+
+    cache_key = models.CharField(max_length=64, unique=True)
+    legs = models.JSONField(help_text="[[distance_m, duration_s], ...] per leg")
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "route_cache_entries"
+
+    def __str__(self):
+        return f"Route {self.cache_key[:12]} ({len(self.legs or [])} legs)"
+
+
+class GeocodeCacheEntry(models.Model):
+    """Cold tier of the geocoding cache (see orders.geocode_cache)."""
+
+    address_key = models.CharField(max_length=64, unique=True)
+    address = models.TextField(help_text="Normalised address text")
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "geocode_cache_entries"
+
+    def __str__(self):
+        return f"{self.address[:60]} → {self.latitude},{self.longitude}"
+
+
+class RouteEstimateCoefficient(models.Model):
+    """
+    Calibration for the offline route estimator (see orders.route_estimator).
+
+    road_factor scales great-circle km to road km; minutes_per_km turns road
+    km into minutes. A null zone or hour is the catch-all bucket for that
+    dimension. Rows are rewritten by the fit_route_estimator command.
+    """
+
+    zone = models.ForeignKey(
+        "dispatcher.Zone",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="route_estimate_coefficients",
+    )
+    hour = models.PositiveSmallIntegerField(
+        null=True, blank=True, help_text="Local hour of day (0-23); blank = all hours"
+    )
+    road_factor = models.FloatField()
+    minutes_per_km = models.FloatField()
+    samples = models.PositiveIntegerField(default=0)
+    fitted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "route_estimate_coefficients"
+        unique_together = [("zone", "hour")]
+
+    def __str__(self):
+        zone = self.zone.name if self.zone_id else "all zones"
+        hour = f"{self.hour:02d}h" if self.hour is not None else "all hours"
+        return f"{zone} / {hour}: x{self.road_factor:.2f}, {self.minutes_per_km:.2f} min/km"
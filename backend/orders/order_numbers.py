@@ -0,0 +1,101 @@
+"""
+Order number allocation.
+
+Order numbers come from the Postgres sequence ``order_number_seq`` instead
+of reading the newest order and adding one, which raced under concurrent
+creation (two requests reading the same "last" order got the same number)
+and scanned the orders table on every insert. nextval() never hands the
+same value out twice, takes no row locks and is not rolled back, so numbers
+are unique but may have gaps.
+
+The sequence is created on first use and started after the highest numeric
+order number already in the table, so it carries on from the old scheme.
+
+With ORDER_NUMBER_BLOCK_SIZE > 1 each process leases that many numbers in
+one round trip and hands them out from memory. Numbers from different
+workers then interleave, and a worker that exits leaves the rest of its
+block unused.
+
+Databases without sequences (sqlite in local development and tests) fall
+back to max(order_number) + 1 under a process lock.
+"""
+
+import os
+import threading
+from typing import List
+
+from django.conf import settings
+from django.db import connection, transaction
+
+SEQUENCE_NAME = "order_number_seq"
+FIRST_ORDER_NUMBER = 6158000
+# Arbitrary key for the advisory lock serialising sequence creation.
+SEQUENCE_INIT_LOCK_ID = 6158000
+
+_lock = threading.Lock()
+_state = {"sequence_ready": False, "block": [], "block_pid": None, "last": 0}
+
+
+def _ensure_sequence(cursor) -> None:
+    if _state["sequence_ready"]:
+        return
+    with transaction.atomic():
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [SEQUENCE_INIT_LOCK_ID])
+        cursor.execute("SELECT to_regclass(%s)", [SEQUENCE_NAME])
+        if cursor.fetchone()[0] is None:
+            cursor.execute(
+                "SELECT COALESCE(MAX(order_number::bigint), %s) FROM orders "
+                "WHERE order_number ~ '^[0-9]{1,18}$'",
+                [FIRST_ORDER_NUMBER - 1],
+            )
+            start = int(max(cursor.fetchone()[0], FIRST_ORDER_NUMBER - 1)) + 1
+            cursor.execute(f"CREATE SEQUENCE {SEQUENCE_NAME} START WITH {start}")
+    # If the caller's transaction rolls back, so does CREATE SEQUENCE: only
+    # trust it once committed.
+    transaction.on_commit(lambda: _state.update(sequence_ready=True))
+
+
+def _from_sequence(count: int) -> List[str]:
+    with connection.cursor() as cursor:
+        _ensure_sequence(cursor)
+        cursor.execute(
+            "SELECT nextval(%s) FROM generate_series(1, %s)", [SEQUENCE_NAME, count]
+        )
+        return [str(row[0]) for row in cursor.fetchall()]
+
+
+def _from_table(count: int) -> List[str]:
+    from django.db.models import BigIntegerField, Max
+    from django.db.models.functions import Cast
+
+    from .models import Order
+
+    current = Order.objects.aggregate(
+        n=Max(Cast("order_number", BigIntegerField()))
+    )["n"] or (FIRST_ORDER_NUMBER - 1)
+    start = max(current, _state["last"], FIRST_ORDER_NUMBER - 1) + 1
+    _state["last"] = start + count - 1
+    return [str(n) for n in range(start, start + count)]
+
+
+def allocate_order_numbers(count: int) -> List[str]:
+    """``count`` new unique order numbers, for bulk creation."""
+    if count <= 0:
+        return []
+    if connection.vendor != "postgresql":
+        with _lock:
+            return _from_table(count)
+    return _from_sequence(count)
+
+
+def next_order_number() -> str:
+    """A new unique order number, from this process's leased block if enabled."""
+    block_size = int(getattr(settings, "ORDER_NUMBER_BLOCK_SIZE", 1))
+    if block_size <= 1 or connection.vendor != "postgresql":
+        return allocate_order_numbers(1)[0]
+    with _lock:
+        # A forked worker must not reuse its parent's leased numbers.
+        if not _state["block"] or _state["block_pid"] != os.getpid():
+            _state["block"] = allocate_order_numbers(block_size)
+            _state["block_pid"] = os.getpid()
+        return _state["block"].pop(0)
@@ -6,53 +6,153 @@ consistent.
 
 from __future__ import annotations
 
+import logging
+import threading
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
 from decimal import Decimal
-from typing import Any, Optional
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Merchant override maps: process-local LRU in front of the shared cache.
+# The shared cache holds a per-merchant version token; a local entry is only
+# served while its token matches, so an edit in one worker is seen by all.
+OVERRIDE_CACHE_VERSION_KEY = "pricing_overrides:ver:{merchant_id}"
+OVERRIDE_CACHE_MAP_KEY = "pricing_overrides:map:{merchant_id}:{version}"
+OVERRIDE_CACHE_TTL = 24 * 3600  # 24 hours
+OVERRIDE_LOCAL_MAX_MERCHANTS = 512
+
+_override_lru: "OrderedDict[str, Tuple[str, dict]]" = OrderedDict()
+_override_lru_lock = threading.Lock()
 
 
 def _money(value: Any) -> Decimal:
     return Decimal(str(value or 0)).quantize(Decimal("0.01"))
 
 
-def calculate_tiered_fare(distance_km: Any, pricing_tiers: dict) -> Decimal:
-    """Mirror Vehicle.calculate_fare() tiered branch but for an explicit config."""
+class TieredFareSchedule:
+    """Pre-parsed ``pricing_tiers`` config.
+
+    Parsing the JSON, coercing numbers and deriving each tier's minimum floor
+    happens once here; ``fare()`` is then a bisect over the tier breakpoints.
+
+    ``breakpoints`` holds the running maximum of each tier's ``max_km`` (``inf``
+    for an unbounded tier), so a bisect lands on the same tier as the original
+    first-match walk even when tiers are not sorted.
+    """
+
+    __slots__ = (
+        "floor_km",
+        "floor_fee",
+        "breakpoints",
+        "rates",
+        "min_floors",
+        "fallback",
+    )
+
+    def __init__(self, pricing_tiers: dict):
+        pt = pricing_tiers or {}
+        if not isinstance(pt, dict) or pt.get("type") != "tiered":
+            raise ValueError("pricing_tiers.type must be 'tiered'")
+
+        floor_km = float(pt.get("floor_km", 0) or 0)
+        floor_fee = float(pt.get("floor_fee", 0) or 0)
+        tiers = pt.get("tiers") or []
+
+        self.floor_km = floor_km
+        self.floor_fee = _money(floor_fee)
+        self.breakpoints = []
+        self.rates = []
+        self.min_floors = []
+
+        prev_max_km = floor_km
+        prev_rate = None
+        running_max = float("-inf")
+        unbounded = False
+        for i, tier in enumerate(tiers):
+            if not isinstance(tier, dict):
+                continue
 
-    km = float(distance_km or 0)
-    pt = pricing_tiers or {}
+            rate = float(tier.get("rate") or 0)
+            max_km = tier.get("max_km")
+            min_floor = floor_fee if i == 0 else round(prev_max_km * float(prev_rate or 0))
 
-    if pt.get("type") != "tiered":
-        raise ValueError("pricing_tiers.type must be 'tiered'")
+            running_max = float("inf") if max_km is None else max(running_max, float(max_km))
+            self.breakpoints.append(running_max)
+            self.rates.append(rate)
+            self.min_floors.append(round(min_floor))
 
-    floor_km = float(pt.get("floor_km", 0) or 0)
-    floor_fee = float(pt.get("floor_fee", 0) or 0)
-    tiers = pt.get("tiers") or []
+            # Tiers after an unbounded one can never be reached.
+            if max_km is None:
+                unbounded = True
+                break
 
-    if km <= floor_km:
-        return _money(floor_fee)
+            prev_max_km = float(max_km)
+            prev_rate = rate
 
-    prev_max_km = floor_km
-    prev_rate = None
-    for i, tier in enumerate(tiers):
-        if not isinstance(tier, dict):
-            continue
+        # Fallback for distances beyond every bounded tier.
+        self.fallback = None
+        if not unbounded and (not tiers or isinstance(tiers[-1], dict)):
+            last_rate = float(tiers[-1].get("rate") or 0) if tiers else 0
+            min_floor = floor_fee if prev_rate is None else round(prev_max_km * float(prev_rate or 0))
+            self.fallback = (last_rate, round(min_floor))
 
-        rate = float(tier.get("rate") or 0)
-        max_km = tier.get("max_km")
+    def fare(self, distance_km: Any) -> Decimal:
+        km = float(distance_km or 0)
 
-        min_floor = floor_fee if i == 0 else round(prev_max_km * float(prev_rate or 0))
+        if km <= self.floor_km:
+            return self.floor_fee
 
-        # Unbounded tier (or missing max) applies to any remaining distances
-        if max_km is None or km <= float(max_km):
-            price = max(round(km * rate), round(min_floor))
-            return _money(price)
+        i = bisect_left(self.breakpoints, km)
+        if i < len(self.breakpoints):
+            return _money(max(round(km * self.rates[i]), self.min_floors[i]))
 
-        prev_max_km = float(max_km)
-        prev_rate = rate
+        if self.fallback is None:
+            raise ValueError("pricing_tiers has no usable tier for this distance")
+        rate, min_floor = self.fallback
+        return _money(max(round(km * rate), min_floor))
 
-    # Fallback for unexpected tier config
-    last_rate = float(tiers[-1].get("rate") or 0) if tiers else 0
-    min_floor = floor_fee if prev_rate is None else round(prev_max_km * float(prev_rate or 0))
-    return _money(max(round(km * last_rate), round(min_floor)))
+    def fares(self, distances: Sequence[Any]) -> List[Decimal]:
+        """Vectorised ``fare()``: one tier lookup per distinct distance."""
+
+        seen: Dict[float, Decimal] = {}
+        out = []
+        for d in distances:
+            km = float(d or 0)
+            fare = seen.get(km)
+            if fare is None:
+                fare = seen[km] = self.fare(km)
+            out.append(fare)
+        return out
+
+
+def calculate_tiered_fare(distance_km: Any, pricing_tiers: dict) -> Decimal:
+    """Mirror Vehicle.calculate_fare() tiered branch but for an explicit config."""
+
+    return TieredFareSchedule(pricing_tiers).fare(distance_km)
+
+
+def get_fare_schedule(obj: Any) -> Optional[TieredFareSchedule]:
+    """Return the compiled schedule for ``obj.pricing_tiers``, cached on ``obj``.
+
+    The cache is keyed on the identity of the ``pricing_tiers`` value, so
+    reassigning the field or reloading the row recompiles; ``save()`` on
+    Vehicle / MerchantPricingOverride drops it for in-place edits.
+    Returns None when the row has no tiered config.
+    """
+
+    pt = obj.pricing_tiers
+    cached = obj.__dict__.get("_fare_schedule")
+    if cached is not None and cached[0] is pt:
+        return cached[1]
+
+    schedule = None
+    if pt and isinstance(pt, dict) and pt.get("type") == "tiered":
+        schedule = TieredFareSchedule(pt)
+    obj.__dict__["_fare_schedule"] = (pt, schedule)
+    return schedule
 
 
 def calculate_effective_fare(
@@ -69,21 +169,11 @@ def calculate_effective_fare(
       3) vehicle.calculate_fare()
     """
 
-    # Avoid importing Django models at module import time in case this file is
-    # imported early during app loading.
-    from .models import MerchantPricingOverride
-
     if not merchant_user or not getattr(merchant_user, "id", None):
         return vehicle.calculate_fare(distance_km or 0, duration_minutes or 0)
 
-    override = (
-        MerchantPricingOverride.objects.filter(
-            merchant_id=merchant_user.id,
-            vehicle_id=getattr(vehicle, "id", None),
-            is_active=True,
-        )
-        .order_by("-updated_at")
-        .first()
+    override = get_merchant_overrides(merchant_user.id).get(
+        getattr(vehicle, "id", None)
     )
 
     if not override:
@@ -95,9 +185,171 @@ def calculate_effective_fare(
 
     if override.pricing_tiers and isinstance(override.pricing_tiers, dict):
         try:
-            return calculate_tiered_fare(distance_km or 0, override.pricing_tiers)
+            schedule = override.get_fare_schedule()
+            if schedule is not None:
+                return schedule.fare(distance_km or 0)
         except Exception:
             # Fall through to global vehicle fare.
             pass
 
     return vehicle.calculate_fare(distance_km or 0, duration_minutes or 0)
+
+
+def _load_merchant_overrides(merchant_id: Any) -> dict:
+    """Map vehicle_id -> newest active override for ``merchant_id`` (one query)."""
+    # Avoid importing Django models at module import time in case this file is
+    # imported early during app loading.
+    from .models import MerchantPricingOverride
+
+    overrides = {}
+    for override in MerchantPricingOverride.objects.filter(
+        merchant_id=merchant_id, is_active=True
+    ).order_by("-updated_at"):
+        overrides.setdefault(override.vehicle_id, override)
+    return overrides
+
+
+def _remember_local(merchant_id: str, version: str, overrides: dict) -> None:
+    with _override_lru_lock:
+        _override_lru[merchant_id] = (version, overrides)
+        _override_lru.move_to_end(merchant_id)
+        while len(_override_lru) > OVERRIDE_LOCAL_MAX_MERCHANTS:
+            _override_lru.popitem(last=False)
+
+
+def get_merchant_overrides(merchant_id: Any) -> dict:
+    """Return ``{vehicle_id: MerchantPricingOverride}`` for a merchant.
+
+    Served from the process-local LRU while the shared version token is
+    unchanged, then from the shared cache, and only then from the database.
+    If the cache backend is unavailable this degrades to one query per call.
+    """
+    from django.core.cache import cache
+
+    merchant_id = str(merchant_id)
+    version_key = OVERRIDE_CACHE_VERSION_KEY.format(merchant_id=merchant_id)
+
+    try:
+        version = cache.get(version_key)
+    except Exception as exc:
+        logger.warning(f"Pricing override cache unavailable: {exc}")
+        return _load_merchant_overrides(merchant_id)
+
+    if version:
+        with _override_lru_lock:
+            local = _override_lru.get(merchant_id)
+            if local is not None and local[0] == version:
+                _override_lru.move_to_end(merchant_id)
+                return local[1]
+        try:
+            overrides = cache.get(
+                OVERRIDE_CACHE_MAP_KEY.format(merchant_id=merchant_id, version=version)
+            )
+        except Exception:
+            overrides = None
+        if overrides is not None:
+            _remember_local(merchant_id, version, overrides)
+            return overrides
+
+    overrides = _load_merchant_overrides(merchant_id)
+
+    try:
+        if not version:
+            version = uuid.uuid4().hex
+            # add() so a concurrent invalidation is never overwritten.
+            if not cache.add(version_key, version, OVERRIDE_CACHE_TTL):
+                return overrides
+        cache.set(
+            OVERRIDE_CACHE_MAP_KEY.format(merchant_id=merchant_id, version=version),
+            overrides,
+            OVERRIDE_CACHE_TTL,
+        )
+        _remember_local(merchant_id, version, overrides)
+    except Exception as exc:
+        logger.warning(f"Pricing override cache write failed: {exc}")
+
+    return overrides
+
+
+def invalidate_merchant_overrides(merchant_id: Any) -> None:
+    """Drop the cached override map for a merchant in every process."""
+    from django.core.cache import cache
+
+    merchant_id = str(merchant_id)
+    with _override_lru_lock:
+        _override_lru.pop(merchant_id, None)
+    try:
+        cache.set(
+            OVERRIDE_CACHE_VERSION_KEY.format(merchant_id=merchant_id),
+            uuid.uuid4().hex,
+            OVERRIDE_CACHE_TTL,
+        )
+    except Exception as exc:
+        logger.warning(f"Pricing override cache invalidation failed: {exc}")
+
+
+def _fare_column(
+    vehicle: object,
+    override: Optional[object],
+    routes: Sequence[Tuple[Any, Any]],
+) -> List[Decimal]:
+    """Fares for one vehicle across every route, same precedence as
+    calculate_effective_fare()."""
+
+    if override is not None:
+        if override.flat_fee is not None:
+            return [_money(override.flat_fee)] * len(routes)
+
+        if override.pricing_tiers and isinstance(override.pricing_tiers, dict):
+            try:
+                schedule = override.get_fare_schedule()
+                if schedule is not None:
+                    return schedule.fares([km for km, _ in routes])
+            except Exception:
+                # Fall through to global vehicle fare.
+                pass
+
+    schedule = vehicle.get_fare_schedule()
+    if schedule is not None:
+        return schedule.fares([km for km, _ in routes])
+
+    # Legacy formula depends on duration too; memoise repeated pairs.
+    seen: Dict[Tuple[Any, Any], Decimal] = {}
+    out = []
+    for km, minutes in routes:
+        key = (km or 0, minutes or 0)
+        fare = seen.get(key)
+        if fare is None:
+            fare = seen[key] = vehicle.calculate_fare(*key)
+        out.append(fare)
+    return out
+
+
+def calculate_effective_fares(
+    merchant_user: Optional[object],
+    vehicles: Iterable[object],
+    routes: Iterable[Tuple[Any, Any]],
+) -> List[List[Decimal]]:
+    """Batch form of calculate_effective_fare().
+
+    ``routes`` is a sequence of ``(distance_km, duration_minutes)`` pairs.
+    Returns a matrix where ``fares[i][j]`` is the fare for ``routes[i]`` on
+    ``vehicles[j]``. Overrides come from the per-merchant override map and each
+    vehicle's tier schedule is compiled once, so quoting N drops across every
+    vehicle costs one bisect per distinct distance rather than N full
+    calculate_effective_fare() calls.
+    """
+
+    vehicles = list(vehicles)
+    routes = list(routes)
+    if not vehicles or not routes:
+        return [[] for _ in routes]
+
+    overrides = {}
+    if merchant_user and getattr(merchant_user, "id", None):
+        overrides = get_merchant_overrides(merchant_user.id)
+    columns = [
+        _fare_column(v, overrides.get(getattr(v, "id", None)), routes)
+        for v in vehicles
+    ]
+    return [list(row) for row in zip(*columns)]
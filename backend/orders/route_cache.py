@@ -0,0 +1,373 @@
+"""
+Shared cache for Google Directions results.
+
+Both ``orders.utils.calculate_route`` (quotes / order creation) and
+``dispatcher.tasks._directions_legs`` (relay legs) read through here.
+
+Lookups go: shared cache (Redis) -> RouteCacheEntry table -> Directions API.
+``get_route_legs_many`` answers origin -> N single drops the same way but
+fetches all misses with one Distance Matrix request per 25 destinations.
+Keys are built from geohash-rounded coordinates, so repeat pickups from the
+same warehouse share an entry even when the client sends slightly different
+GPS fixes. Legs are stored raw as ``[distance_m, duration_s]`` pairs so each
+caller can round the way it always has.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+ROUTE_CACHE_KEY_PREFIX = "route_legs:"
+ROUTE_CACHE_STATS_KEY = "route_cache:stats:{name}"
+
+# Google's per-request destination limit for the Distance Matrix API
+DISTANCE_MATRIX_MAX_DESTINATIONS = 25
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+_deadline = threading.local()
+
+
+def geohash_encode(lat: float, lng: float, precision: int = 8) -> str:
+    """Standard base32 geohash of (lat, lng)."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    out = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(out) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_lo = mid
+            else:
+                bits <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            out.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(out)
+
+
+def lat_lng(point: Dict) -> Tuple[float, float]:
+    """(lat, lng) floats from a point dict; accepts ``lng`` or ``long``."""
+    lng = point["lng"] if "lng" in point else point["long"]
+    return float(point["lat"]), float(lng)
+
+
+def route_cache_key(origin: Dict, points: List[Dict], optimize: bool = False) -> str:
+    """Cache key for origin -> points[0] -> ... -> points[-1].
+
+    Waypoint optimisation only matters with two or more stops, so single-drop
+    routes from either caller share the same entry.
+    """
+    precision = int(getattr(settings, "ROUTE_CACHE_GEOHASH_PRECISION", 8))
+    cells = [geohash_encode(*lat_lng(p), precision=precision) for p in [origin] + points]
+    mode = "opt" if optimize and len(points) > 1 else "seq"
+    raw = f"{precision}:{mode}:" + ">".join(cells)
+    return ROUTE_CACHE_KEY_PREFIX + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+    try:
+        key = ROUTE_CACHE_STATS_KEY.format(name=name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+    except Exception:
+        pass
+
+
+def route_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Hit/miss counters for this process and (best effort) across workers."""
+    names = ("cache_hit", "db_hit", "miss")
+    with _stats_lock:
+        local = {n: _stats[n] for n in names}
+    shared = {}
+    try:
+        for n in names:
+            shared[n] = int(cache.get(ROUTE_CACHE_STATS_KEY.format(name=n)) or 0)
+    except Exception:
+        shared = {}
+    return {"process": local, "shared": shared}
+
+
+@contextmanager
+def request_deadline(at: Optional[float]):
+    """Cap Maps HTTP timeouts on this thread at a time.monotonic() deadline."""
+    previous = getattr(_deadline, "at", None)
+    _deadline.at = at
+    try:
+        yield
+    finally:
+        _deadline.at = previous
+
+
+def request_timeout(default: float) -> float:
+    """HTTP timeout for a Maps call: ``default`` or what is left of the deadline."""
+    at = getattr(_deadline, "at", None)
+    if at is None:
+        return default
+    remaining = at - time.monotonic()
+    if remaining <= 0:
+        raise requests.Timeout("Route deadline passed before the request was sent")
+    return min(default, remaining)
+
+
+def _fetch_directions(
+    origin: Dict, points: List[Dict], optimize: bool
+) -> Optional[List[List[int]]]:
+    """Call the Directions API; return raw legs or None when no route."""
+    o_lat, o_lng = lat_lng(origin)
+    d_lat, d_lng = lat_lng(points[-1])
+    params = {
+        "origin": f"{o_lat},{o_lng}",
+        "destination": f"{d_lat},{d_lng}",
+        "key": settings.GOOGLE_MAPS_API_KEY,
+    }
+    waypoints = ["%s,%s" % lat_lng(p) for p in points[:-1]]
+    if waypoints:
+        prefix = "optimize:true|" if optimize else ""
+        params["waypoints"] = prefix + "|".join(waypoints)
+
+    url = getattr(
+        settings,
+        "GOOGLE_DIRECTIONS_URL",
+        "https://maps.googleapis.com/maps/api/directions/json",
+    )
+    response = requests.get(url, params=params, timeout=request_timeout(10))
+    response.raise_for_status()
+    data = response.json()
+
+    if data.get("status") != "OK" or not data.get("routes"):
+        return None
+
+    return [
+        [int(leg["distance"]["value"] or 0), int(leg["duration"]["value"] or 0)]
+        for leg in data["routes"][0].get("legs") or []
+    ]
+
+
+def _fetch_distance_matrix(
+    origin: Dict, points: List[Dict], timeout: float = 10
+) -> List[Optional[List[int]]]:
+    """One Distance Matrix call for origin -> each point.
+
+    Returns one ``[distance_m, duration_s]`` per point, None where Google has
+    no route. Transport errors and a non-OK top-level status raise.
+    """
+    params = {
+        "origins": "%s,%s" % lat_lng(origin),
+        "destinations": "|".join("%s,%s" % lat_lng(p) for p in points),
+        "key": settings.GOOGLE_MAPS_API_KEY,
+    }
+    url = getattr(
+        settings,
+        "GOOGLE_DISTANCE_MATRIX_URL",
+        "https://maps.googleapis.com/maps/api/distancematrix/json",
+    )
+    response = requests.get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+
+    if data.get("status") != "OK" or not data.get("rows"):
+        raise ValueError(f"Distance Matrix error: {data.get('status')}")
+
+    elements = data["rows"][0].get("elements") or []
+    legs = []
+    for i in range(len(points)):
+        element = elements[i] if i < len(elements) else {}
+        if element.get("status") != "OK":
+            legs.append(None)
+            continue
+        legs.append(
+            [
+                int(element["distance"]["value"] or 0),
+                int(element["duration"]["value"] or 0),
+            ]
+        )
+    return legs
+
+
+def get_route_legs(
+    origin: Dict, points: List[Dict], optimize: bool = False
+) -> Optional[List[List[int]]]:
+    """Return ``[[distance_m, duration_s], ...]`` for origin -> points.
+
+    Returns None when Directions finds no route (not cached). Network errors
+    propagate so callers keep their existing error handling.
+    """
+    from .models import RouteCacheEntry
+
+    if not points:
+        return []
+
+    key = route_cache_key(origin, points, optimize)
+    ttl = int(getattr(settings, "ROUTE_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+    try:
+        legs = cache.get(key)
+    except Exception:
+        legs = None
+    if legs is not None:
+        _count("cache_hit")
+        return legs
+
+    max_age_days = int(getattr(settings, "ROUTE_CACHE_DB_MAX_AGE_DAYS", 90))
+    entry = (
+        RouteCacheEntry.objects.filter(
+            cache_key=key,
+            created_at__gte=timezone.now() - timedelta(days=max_age_days),
+        )
+        .only("id", "legs")
+        .first()
+    )
+    if entry is not None:
+        _count("db_hit")
+        RouteCacheEntry.objects.filter(id=entry.id).update(
+            hits=F("hits") + 1, last_hit_at=timezone.now()
+        )
+        try:
+            cache.set(key, entry.legs, ttl)
+        except Exception:
+            pass
+        return entry.legs
+
+    _count("miss")
+    legs = _fetch_directions(origin, points, optimize)
+    if legs is None:
+        return None
+
+    try:
+        RouteCacheEntry.objects.update_or_create(
+            cache_key=key,
+            defaults={"legs": legs, "created_at": timezone.now()},
+        )
+    except Exception as exc:
+        logger.warning(f"route_cache: DB write failed: {exc}")
+    try:
+        cache.set(key, legs, ttl)
+    except Exception:
+        pass
+
+    return legs
+
+
+def get_route_legs_many(
+    origin: Dict, points: List[Dict], timeout: float = 10
+) -> List[Optional[List[int]]]:
+    """Single-leg ``[distance_m, duration_s]`` for origin -> each point.
+
+    Shares cache entries with ``get_route_legs(origin, [point])``. Cached
+    drops are answered from Redis / the DB; the rest are fetched in one
+    Distance Matrix request per DISTANCE_MATRIX_MAX_DESTINATIONS points.
+    Entries are None where there is no route.
+    """
+    from .models import RouteCacheEntry
+
+    keys = [route_cache_key(origin, [p]) for p in points]
+    ttl = int(getattr(settings, "ROUTE_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+    found = {}
+
+    try:
+        found.update(cache.get_many(set(keys)))
+    except Exception:
+        pass
+    for _ in found:
+        _count("cache_hit")
+
+    missing = set(keys) - found.keys()
+    if missing:
+        max_age_days = int(getattr(settings, "ROUTE_CACHE_DB_MAX_AGE_DAYS", 90))
+        rows = list(
+            RouteCacheEntry.objects.filter(
+                cache_key__in=missing,
+                created_at__gte=timezone.now() - timedelta(days=max_age_days),
+            ).values_list("id", "cache_key", "legs")
+        )
+        if rows:
+            RouteCacheEntry.objects.filter(id__in=[r[0] for r in rows]).update(
+                hits=F("hits") + 1, last_hit_at=timezone.now()
+            )
+            promote = {}
+            for _, key, legs in rows:
+                _count("db_hit")
+                found[key] = legs
+                promote[key] = legs
+            try:
+                cache.set_many(promote, ttl)
+            except Exception:
+                pass
+
+    # One request per unique uncached destination cell
+    pending = {}
+    for key, point in zip(keys, points):
+        if key not in found and key not in pending:
+            pending[key] = point
+
+    pending_items = list(pending.items())
+    for start in range(0, len(pending_items), DISTANCE_MATRIX_MAX_DESTINATIONS):
+        chunk = pending_items[start:start + DISTANCE_MATRIX_MAX_DESTINATIONS]
+        for _ in chunk:
+            _count("miss")
+        fetched = _fetch_distance_matrix(origin, [p for _, p in chunk], timeout)
+
+        to_cache = {}
+        for (key, _), legs in zip(chunk, fetched):
+            if legs is None:
+                continue
+            # Stored in the same shape as a one-stop Directions result
+            found[key] = [legs]
+            to_cache[key] = [legs]
+            try:
+                RouteCacheEntry.objects.update_or_create(
+                    cache_key=key,
+                    defaults={"legs": [legs], "created_at": timezone.now()},
+                )
+            except Exception as exc:
+                logger.warning(f"route_cache: DB write failed: {exc}")
+        if to_cache:
+            try:
+                cache.set_many(to_cache, ttl)
+            except Exception:
+                pass
+
+    out = []
+    for key in keys:
+        legs = found.get(key)
+        out.append(legs[0] if legs else None)
+    return out
@@ -0,0 +1,277 @@
+"""
+Offline route estimator: road distance and duration without a network call.
+
+    road_km = haversine_km * road_factor
+    minutes = road_km * minutes_per_km
+
+Coefficients are fitted from our own delivery history (Delivery.distance_km /
+duration_minutes against the straight-line distance of the same leg) and
+bucketed by zone of the leg's origin and local hour of day. Lookup falls back
+(zone, hour) -> (zone, any hour) -> (any zone, hour) -> global -> defaults.
+The defaults reproduce the old "raw haversine, 4 mins per km" heuristic, so
+an uncalibrated install behaves exactly as before.
+
+Refit with ``python manage.py fit_route_estimator``.
+"""
+
+import logging
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .route_cache import lat_lng
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROAD_FACTOR = 1.0
+DEFAULT_MINUTES_PER_KM = 4.0
+
+ESTIMATOR_CACHE_KEY = "route_estimator:coefficients"
+ESTIMATOR_CACHE_TTL = 60 * 60
+ESTIMATOR_LOCAL_TTL_SECONDS = 300
+
+# Legs outside these bounds are GPS noise or data-entry errors, not traffic.
+MIN_FIT_HAVERSINE_KM = 0.3
+FIT_ROAD_FACTOR_BOUNDS = (1.0, 3.5)
+FIT_MINUTES_PER_KM_BOUNDS = (0.5, 20.0)
+
+_table = {"data": None, "ts": 0.0}
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in KM."""
+    r = 6371.0
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lng2 - lng1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * r * math.asin(math.sqrt(a))
+
+
+def _load_table() -> Dict:
+    from dispatcher.models import Zone
+    from .models import RouteEstimateCoefficient
+
+    coefficients = {}
+    for zone_id, hour, road_factor, minutes_per_km in RouteEstimateCoefficient.objects.values_list(
+        "zone_id", "hour", "road_factor", "minutes_per_km"
+    ):
+        key = (str(zone_id) if zone_id else None, hour)
+        coefficients[key] = (road_factor, minutes_per_km)
+
+    zones = [
+        (str(z_id), lat, lng, radius)
+        for z_id, lat, lng, radius in Zone.objects.filter(is_active=True).values_list(
+            "id", "center_lat", "center_lng", "radius_km"
+        )
+    ]
+    return {"coefficients": coefficients, "zones": zones}
+
+
+def _get_table() -> Dict:
+    now = time.time()
+    if _table["data"] is not None and (now - _table["ts"]) < ESTIMATOR_LOCAL_TTL_SECONDS:
+        return _table["data"]
+
+    data = None
+    try:
+        data = cache.get(ESTIMATOR_CACHE_KEY)
+    except Exception:
+        pass
+
+    if data is None:
+        try:
+            data = _load_table()
+        except Exception as exc:
+            logger.warning(f"route_estimator: could not load coefficients: {exc}")
+            data = {"coefficients": {}, "zones": []}
+        else:
+            try:
+                cache.set(ESTIMATOR_CACHE_KEY, data, ESTIMATOR_CACHE_TTL)
+            except Exception:
+                pass
+
+    _table["data"] = data
+    _table["ts"] = now
+    return data
+
+
+def invalidate_coefficients() -> None:
+    _table["data"] = None
+    try:
+        cache.delete(ESTIMATOR_CACHE_KEY)
+    except Exception:
+        pass
+
+
+def zone_for(lat: float, lng: float, zones: List[Tuple]) -> Optional[str]:
+    """Id of the zone whose centre is nearest (lat, lng) and within its radius."""
+    best, best_d = None, None
+    for zone_id, z_lat, z_lng, radius in zones:
+        d = haversine_km(lat, lng, z_lat, z_lng)
+        if d <= radius and (best_d is None or d < best_d):
+            best, best_d = zone_id, d
+    return best
+
+
+def coefficients_for(lat: float, lng: float, when: Optional[datetime] = None) -> Tuple[float, float]:
+    """(road_factor, minutes_per_km) for a leg starting at (lat, lng)."""
+    table = _get_table()
+    coefficients = table["coefficients"]
+    if not coefficients:
+        return DEFAULT_ROAD_FACTOR, DEFAULT_MINUTES_PER_KM
+
+    zone_id = zone_for(lat, lng, table["zones"])
+    hour = timezone.localtime(when or timezone.now()).hour
+    keys = [(None, hour), (None, None)]
+    if zone_id is not None:
+        keys = [(zone_id, hour), (zone_id, None)] + keys
+    for key in keys:
+        found = coefficients.get(key)
+        if found:
+            return found
+    return DEFAULT_ROAD_FACTOR, DEFAULT_MINUTES_PER_KM
+
+
+def road_factor_for(lat: float, lng: float) -> float:
+    """All-hours road factor for legs starting at (lat, lng)."""
+    table = _get_table()
+    coefficients = table["coefficients"]
+    if not coefficients:
+        return DEFAULT_ROAD_FACTOR
+
+    zone_id = zone_for(lat, lng, table["zones"])
+    for key in ((zone_id, None), (None, None)):
+        found = coefficients.get(key)
+        if found:
+            return found[0]
+    return DEFAULT_ROAD_FACTOR
+
+
+def estimate_legs(origin: Dict, points: List[Dict], when: Optional[datetime] = None) -> List[Tuple[float, int]]:
+    """[(distance_km, duration_minutes), ...] for origin -> points[0] -> ..."""
+    out = []
+    prev_lat, prev_lng = lat_lng(origin)
+    for p in points:
+        lat, lng = lat_lng(p)
+        road_factor, minutes_per_km = coefficients_for(prev_lat, prev_lng, when)
+        road_km = haversine_km(prev_lat, prev_lng, lat, lng) * road_factor
+        out.append((round(road_km, 2), int(max(1, round(road_km * minutes_per_km)))))
+        prev_lat, prev_lng = lat, lng
+    return out
+
+
+def estimate_route(origin: Dict, destinations: List[Dict], when: Optional[datetime] = None) -> Dict:
+    """Same shape as orders.utils.calculate_route, plus ``estimated: True``."""
+    legs = estimate_legs(origin, destinations, when)
+    return {
+        "distance_km": round(sum(d for d, _ in legs), 2),
+        "duration_minutes": int(sum(t for _, t in legs)),
+        "estimated": True,
+    }
+
+
+def _historical_legs(since: datetime):
+    """Yield (origin_lat, origin_lng, dest_lat, dest_lng, road_km, minutes, created_at)."""
+    from .models import Delivery
+
+    rows = (
+        Delivery.objects.filter(
+            order__created_at__gte=since,
+            distance_km__isnull=False,
+            duration_minutes__isnull=False,
+        )
+        .order_by("order_id", "sequence")
+        .values_list(
+            "order_id",
+            "dropoff_latitude",
+            "dropoff_longitude",
+            "distance_km",
+            "duration_minutes",
+            "order__pickup_latitude",
+            "order__pickup_longitude",
+            "order__created_at",
+        )
+    )
+
+    current_order = None
+    prev_lat = prev_lng = None
+    for order_id, lat, lng, km, minutes, p_lat, p_lng, created_at in rows.iterator(chunk_size=2000):
+        if order_id != current_order:
+            current_order = order_id
+            prev_lat, prev_lng = p_lat, p_lng
+        if None not in (prev_lat, prev_lng, lat, lng):
+            yield prev_lat, prev_lng, lat, lng, float(km), int(minutes), created_at
+        prev_lat, prev_lng = lat, lng
+
+
+def fit_coefficients(since_days: int = 90, min_samples: int = 20, dry_run: bool = False) -> Dict:
+    """
+    Refit RouteEstimateCoefficient rows from delivery history.
+
+    Each bucket uses ratio-of-sums estimates (sum road km / sum haversine km,
+    sum minutes / sum road km), which are robust to the many short legs.
+    Buckets with fewer than ``min_samples`` legs are not written.
+    """
+    from .models import RouteEstimateCoefficient
+
+    zones = _load_table()["zones"]
+    since = timezone.now() - timedelta(days=since_days)
+
+    # bucket -> [haversine_km, road_km, minutes, samples]
+    sums = defaultdict(lambda: [0.0, 0.0, 0.0, 0])
+    scanned = kept = 0
+    lo_rf, hi_rf = FIT_ROAD_FACTOR_BOUNDS
+    lo_mpk, hi_mpk = FIT_MINUTES_PER_KM_BOUNDS
+
+    for o_lat, o_lng, d_lat, d_lng, road_km, minutes, created_at in _historical_legs(since):
+        scanned += 1
+        hav = haversine_km(o_lat, o_lng, d_lat, d_lng)
+        if hav < MIN_FIT_HAVERSINE_KM or road_km <= 0:
+            continue
+        if not (lo_rf <= road_km / hav <= hi_rf and lo_mpk <= minutes / road_km <= hi_mpk):
+            continue
+        kept += 1
+
+        zone_id = zone_for(o_lat, o_lng, zones)
+        hour = timezone.localtime(created_at).hour
+        buckets = [(None, hour), (None, None)]
+        if zone_id is not None:
+            buckets += [(zone_id, hour), (zone_id, None)]
+        for bucket in buckets:
+            s = sums[bucket]
+            s[0] += hav
+            s[1] += road_km
+            s[2] += minutes
+            s[3] += 1
+
+    now = timezone.now()
+    rows = [
+        RouteEstimateCoefficient(
+            zone_id=zone_id,
+            hour=hour,
+            road_factor=round(road / hav, 4),
+            minutes_per_km=round(minutes / road, 4),
+            samples=samples,
+            fitted_at=now,
+        )
+        for (zone_id, hour), (hav, road, minutes, samples) in sums.items()
+        if samples >= min_samples
+    ]
+
+    if not dry_run:
+        with transaction.atomic():
+            RouteEstimateCoefficient.objects.all().delete()
+            RouteEstimateCoefficient.objects.bulk_create(rows)
+        invalidate_coefficients()
+
+    return {"scanned": scanned, "kept": kept, "buckets": len(rows), "rows": rows}
@@ -0,0 +1,225 @@
+"""
+Order creation pipeline shared by Quick Send, Multi-Drop, Bulk Import and the
+bot's create-order endpoint.
+
+``create_order`` runs as one transaction:
+
+1. lock the merchant's wallet (select_for_update) and check the balance
+   before anything is written, so an unaffordable order is rejected with no
+   insert/delete round trip;
+2. insert the order (already marked escrow_held) and bulk-insert its
+   deliveries;
+3. hold the escrow and queue the new-order fan-out in the outbox.
+
+The activity-feed event and order-created webhook go through
+dispatcher.side_effects, so they only fire for orders that were committed.
+"""
+
+import logging
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELIVERY_BATCH_SIZE = 500
+
+MODE_LABELS = {"quick": "Quick Send", "multi": "Multi-Drop", "bulk": "Bulk Import"}
+
+# Order fields copied onto every Delivery row.
+PICKUP_FIELDS = ("pickup_address", "sender_name", "sender_phone")
+
+
+class OrderCreationError(Exception):
+    """Order rejected; ``errors`` is a serializer-style error dict."""
+
+    def __init__(self, errors: Dict):
+        super().__init__(str(errors))
+        self.errors = errors
+
+
+class InsufficientBalance(OrderCreationError):
+    def __init__(self, required: Decimal, available: Decimal):
+        super().__init__(
+            {"wallet": [f"Insufficient balance. Required: ₦{required}, Available: ₦{available}"]}
+        )
+        self.required = required
+        self.available = available
+
+
+def merchant_display_name(user) -> str:
+    return (
+        getattr(user, "business_name", None)
+        or getattr(user, "contact_name", None)
+        or "Unknown"
+    )
+
+
+def order_fields_from(data):
+    """Order-level fields shared by the order creation serializers."""
+    return {
+        "pickup_address": data["pickup_address"],
+        "sender_name": data["sender_name"],
+        "sender_phone": data["sender_phone"],
+        "payment_method": data["payment_method"],
+        "distance_km": data.get("distance_km", 0),
+        "duration_minutes": data.get("duration_minutes", 0),
+        "notes": data.get("notes", ""),
+        "scheduled_pickup_time": data.get("scheduled_pickup_time"),
+        "collect_on_delivery": data.get("collect_on_delivery", False),
+    }
+
+
+def stop_fields_from(stop):
+    """Delivery fields for one MultiDropDeliverySerializer item."""
+    return {
+        "dropoff_address": stop["dropoff_address"],
+        "receiver_name": stop["receiver_name"],
+        "receiver_phone": stop["receiver_phone"],
+        "package_type": stop.get("package_type", "Box"),
+        "notes": stop.get("notes", ""),
+        "cod_amount": stop.get("cod_amount", 0),
+        "distance_km": stop.get("distance_km"),
+        "duration_minutes": stop.get("duration_minutes"),
+    }
+
+
+def _lock_wallet(user, amount):
+    from wallet.models import Wallet
+
+    wallet = Wallet.objects.select_for_update().filter(user=user).first()
+    if wallet is None:
+        raise OrderCreationError(
+            {"wallet": ["Insufficient wallet balance. Please fund your wallet first."]}
+        )
+    if not wallet.can_debit(amount):
+        raise InsufficientBalance(amount, wallet.balance)
+    return wallet
+
+
+def _fan_out_body(order, num_deliveries: int) -> str:
+    label = MODE_LABELS.get(order.mode, "New order")
+    if num_deliveries > 1:
+        return f"{label} ({num_deliveries} stops) pickup from {order.pickup_address}"
+    return f"{label} pickup from {order.pickup_address}"
+
+
+def _announce(order, deliveries: List, merchant_name: str) -> None:
+    """Activity-feed event and order-created webhook, released after commit."""
+    from dispatcher.side_effects import dispatch
+
+    from .serializers import OrderSerializer
+
+    metadata = {
+        "merchant": merchant_name,
+        "amount": str(order.total_amount),
+        "pickup": order.pickup_address,
+        "mode": order.mode,
+        "deliveries": len(deliveries),
+    }
+    if len(deliveries) == 1:
+        metadata["dropoff"] = deliveries[0].dropoff_address
+        text = f"New order {order.order_number} from {merchant_name}"
+    else:
+        text = f"New order {order.order_number} ({len(deliveries)} stops) from {merchant_name}"
+
+    dispatch(
+        "activity",
+        event_type="new_order",
+        order_id=order.order_number,
+        text=text,
+        color="gold",
+        metadata=metadata,
+    )
+    dispatch(
+        "webhook",
+        event_name="order-created",
+        payload={
+            "event": "order-created",
+            "timestamp": order.created_at.isoformat(),
+            "data": OrderSerializer(order).data,
+        },
+    )
+
+
+def create_order(
+    user,
+    vehicle,
+    mode: str,
+    total_amount,
+    order_fields: Dict,
+    deliveries: List[Dict],
+    progress: Optional[Callable] = None,
+    batch_size: int = DEFAULT_DELIVERY_BATCH_SIZE,
+):
+    """
+    Create an order and its deliveries for ``user``.
+
+    ``order_fields`` are extra Order fields (pickup, sender, payment_method,
+    route metrics, ...); each dict in ``deliveries`` holds one stop's
+    Delivery fields, and is numbered in order. Wallet orders have their
+    escrow held in the same transaction. Raises OrderCreationError (with
+    nothing written) when the wallet cannot cover ``total_amount``.
+    Deliveries go in with bulk_create, ``batch_size`` rows per INSERT, and
+    ``progress(done, total)`` is called after each batch.
+    """
+    from riders.outbox import queue_new_order_fanout
+    from wallet.escrow import EscrowManager
+
+    from .models import Delivery, Order
+
+    pays_by_wallet = order_fields.get("payment_method", "wallet") == "wallet"
+
+    with transaction.atomic():
+        wallet = _lock_wallet(user, total_amount) if pays_by_wallet else None
+
+        order = Order.objects.create(
+            user=user,
+            vehicle=vehicle,
+            mode=mode,
+            total_amount=total_amount,
+            escrow_held=wallet is not None,
+            **order_fields,
+        )
+
+        common = {field: getattr(order, field) for field in PICKUP_FIELDS}
+        common.update(
+            order=order,
+            pickup_latitude=order.pickup_latitude,
+            pickup_longitude=order.pickup_longitude,
+            package_type="Box",
+        )
+        rows = [
+            Delivery(**{**common, **stop, "sequence": idx})
+            for idx, stop in enumerate(deliveries, start=1)
+        ]
+        for start in range(0, len(rows), batch_size):
+            Delivery.objects.bulk_create(rows[start : start + batch_size])
+            if progress:
+                progress(min(start + batch_size, len(rows)), len(rows))
+
+        if wallet is not None:
+            label = MODE_LABELS.get(mode, "")
+            stops = f" ({len(rows)} deliveries)" if mode != "quick" else ""
+            EscrowManager.hold_funds(
+                wallet=wallet,
+                amount=total_amount,
+                order_number=order.order_number,
+                description=f"Escrow hold for {label} order #{order.order_number}{stops}",
+            )
+
+        # Offer the order to the nearest eligible riders (sent by the outbox worker)
+        try:
+            with transaction.atomic():
+                queue_new_order_fanout(
+                    order,
+                    title="New Order Available",
+                    body=_fan_out_body(order, len(rows)),
+                    data={"order_number": order.order_number, "mode": mode},
+                )
+        except Exception as e:
+            logger.warning(f"Failed to queue new-order notifications: {e}")
+
+        _announce(order, rows, merchant_display_name(user))
+    return order
@@ -1,7 +1,9 @@
 from dispatcher.models import SystemSettings
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import Order
+from .models import MerchantPricingOverride, Order
+from .pricing import invalidate_merchant_overrides
 from riders.models import OrderOffer
 from decimal import Decimal
 from django.utils import timezone
@@ -23,16 +25,36 @@ def create_order_offer(sender, instance, created, **kwargs):
         )
 
 
+@receiver(post_save, sender=MerchantPricingOverride)
+@receiver(post_delete, sender=MerchantPricingOverride)
+def invalidate_pricing_override_cache(sender, instance, **kwargs):
+    """Drop the cached override map for the merchant whose row changed.
+
+    Invalidated again on commit so a reader that reloaded the map before the
+    write became visible cannot leave a stale copy behind.
+    """
+    merchant_id = instance.merchant_id
+    invalidate_merchant_overrides(merchant_id)
+    transaction.on_commit(lambda: invalidate_merchant_overrides(merchant_id))
+
+
 @receiver(pre_save, sender=Order)
 def track_order_status_change(sender, instance, **kwargs):
-    """Store previous status on the instance so post_save can detect transitions."""
-    if instance.pk:
-        try:
-            instance._previous_status = Order.objects.get(pk=instance.pk).status
-        except Order.DoesNotExist:
-            instance._previous_status = None
-    else:
+    """
+    Store previous status on the instance so post_save can detect transitions.
+
+    The previous status is the one this instance was loaded with (or last
+    saved), kept by Order.from_db, so no query is needed. Only an instance
+    that was built by hand or deferred ``status`` reads it from the row.
+    """
+    if instance._state.adding:
         instance._previous_status = None
+    elif "status" in (getattr(instance, "_loaded_values", None) or {}):
+        instance._previous_status = instance.loaded_value("status")
+    else:
+        instance._previous_status = (
+            Order.objects.filter(pk=instance.pk).values_list("status", flat=True).first()
+        )
 
 
 @receiver(post_save, sender=Order)
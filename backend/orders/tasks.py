@@ -0,0 +1,21 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_bulk_import(job_id, user_id, payload):
+    """
+    Create a large Bulk Import order queued by BulkImportView.
+    Progress and the result are kept in the cache (orders.bulk_import).
+    """
+    from .bulk_import import run_job
+
+    job = run_job(job_id, user_id, payload)
+    logger.info(
+        f"process_bulk_import {job_id}: {job.get('status')} "
+        f"({job.get('processed')}/{job.get('total')} deliveries)"
+    )
+    return job.get("status")
@@ -1,3 +1,6 @@
+import time
+
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -55,7 +58,7 @@ class BulkCalculateFareViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("Missing required fields", response.data["error"])
 
-    @patch("orders.views.calculate_route")
+    @patch("orders.views.calculate_route_or_estimate")
     def test_quick_send_mode(self, mock_calculate_route):
         # Mock Google Maps calculation response
         mock_calculate_route.return_value = {
@@ -75,6 +78,7 @@ class BulkCalculateFareViewTests(APITestCase):
         data = response.data
         self.assertTrue(data["success"])
         self.assertEqual(data["mode"], "quick")
+        self.assertFalse(data["estimated"])
 
         # Check Bike calculation (Base:500 + Dist:1000 + Time:600 = 2100)
         self.assertIn("Bike", data["vehicles"])
@@ -84,7 +88,7 @@ class BulkCalculateFareViewTests(APITestCase):
         self.assertIn("TieredVan", data["vehicles"])
         self.assertEqual(data["vehicles"]["TieredVan"]["price"], 3000.0)
 
-    @patch("orders.views.calculate_route")
+    @patch("orders.views.calculate_route_or_estimate")
     def test_multi_drop_mode(self, mock_calculate_route):
         # Return different routes depending on if it's the first or second call
         def mock_route_calculator(origin, destinations):
@@ -121,7 +125,7 @@ class BulkCalculateFareViewTests(APITestCase):
         # TieredVan total = 5250
         self.assertEqual(float(data["vehicles"]["TieredVan"]["price"]), 5250.0)
 
-    @patch("orders.views.calculate_route")
+    @patch("orders.views.calculate_route_or_estimate")
     def test_route_calculation_failure(self, mock_calculate_route):
         # Simulate Google API failure
         mock_calculate_route.return_value = None
@@ -135,3 +139,137 @@ class BulkCalculateFareViewTests(APITestCase):
         response = self.client.post(self.url, payload, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertFalse(response.data["success"])
+
+    @override_settings(GOOGLE_MAPS_API_KEY="test-key", ROUTE_ESTIMATE_FALLBACK=True)
+    @patch("orders.route_cache.get_route_legs", side_effect=ConnectionError("Maps down"))
+    def test_maps_failure_is_reported_as_estimated(self, mock_legs):
+        payload = {
+            "mode": "quick",
+            "pickup": {"lat": 6.5244, "long": 3.3792},
+            "deliveries": [{"lat": 6.6018, "long": 3.3515}],
+        }
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["estimated"])
+
+        payload["mode"] = "multi"
+        payload["deliveries"].append({"lat": 6.45, "long": 3.40})
+        with override_settings(ROUTE_MATRIX_MIN_DROPS=10):
+            response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["estimated"])
+        self.assertFalse(response.data["partial"])
+
+    @patch("orders.views.calculate_route_or_estimate")
+    def test_multi_drop_reports_unrouted_drops(self, mock_calculate_route):
+        def mock_route_calculator(origin, destinations):
+            if "broken" in destinations[0]:
+                raise RuntimeError("Directions unavailable")
+            if "nowhere" in destinations[0]:
+                return None
+            return {"distance_km": 4.0, "duration_minutes": 15}
+
+        mock_calculate_route.side_effect = mock_route_calculator
+
+        payload = {
+            "mode": "multi",
+            "pickup": {"lat": 6.0, "long": 3.0},
+            "deliveries": [
+                {"lat": 6.1, "long": 3.1, "nowhere": True},
+                {"lat": 6.2, "long": 3.2},
+                {"lat": 6.3, "long": 3.3, "broken": True},
+            ],
+        }
+
+        # Two drops, so the Distance Matrix path is skipped
+        with override_settings(ROUTE_MATRIX_MIN_DROPS=10):
+            response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.data
+        self.assertTrue(data["partial"])
+        self.assertEqual(
+            data["unrouted_drops"],
+            [{"index": 0, "reason": "no_route"}, {"index": 2, "reason": "error"}],
+        )
+        self.assertEqual(float(data["vehicles"]["Bike"]["price"]), 1200.0)
+        self.assertEqual(data["vehicles"]["Bike"]["drop_details"][0]["index"], 1)
+
+    @override_settings(ROUTE_DEADLINE_SECONDS=0.2, ROUTE_MATRIX_MIN_DROPS=10)
+    @patch("orders.views.calculate_route_or_estimate")
+    def test_multi_drop_deadline_returns_partial_result(self, mock_calculate_route):
+        def mock_route_calculator(origin, destinations):
+            if "slow" in destinations[0]:
+                time.sleep(1)
+            return {"distance_km": 4.0, "duration_minutes": 15}
+
+        mock_calculate_route.side_effect = mock_route_calculator
+
+        payload = {
+            "mode": "bulk",
+            "pickup": {"lat": 6.0, "long": 3.0},
+            "deliveries": [
+                {"lat": 6.1, "long": 3.1},
+                {"lat": 6.2, "long": 3.2, "slow": True},
+            ],
+        }
+
+        started = time.monotonic()
+        response = self.client.post(self.url, payload, format="json")
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["unrouted_drops"], [{"index": 1, "reason": "timeout"}]
+        )
+        self.assertEqual(float(response.data["vehicles"]["Bike"]["price"]), 1200.0)
+
+    @override_settings(ROUTE_DEADLINE_SECONDS=0.6, ROUTE_MATRIX_DEADLINE_FRACTION=0.5)
+    @patch("orders.utils.calculate_route_matrix")
+    @patch("orders.views.calculate_route_or_estimate")
+    def test_slow_distance_matrix_leaves_time_for_directions(
+        self, mock_calculate_route, mock_matrix
+    ):
+        def slow_matrix(origin, destinations, timeout):
+            time.sleep(timeout)
+            raise TimeoutError("Distance Matrix timed out")
+
+        mock_matrix.side_effect = slow_matrix
+        mock_calculate_route.return_value = {"distance_km": 4.0, "duration_minutes": 15}
+
+        payload = {
+            "mode": "bulk",
+            "pickup": {"lat": 6.0, "long": 3.0},
+            "deliveries": [{"lat": 6.1, "long": 3.1}, {"lat": 6.2, "long": 3.2}, {"lat": 6.3, "long": 3.3}],
+        }
+
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(mock_matrix.call_args.kwargs["timeout"], 0.3)
+        self.assertFalse(response.data["partial"])
+        self.assertEqual(float(response.data["vehicles"]["Bike"]["price"]), 3600.0)
+
+    @override_settings(GOOGLE_MAPS_API_KEY="test-key")
+    @patch("orders.route_cache._fetch_distance_matrix")
+    @patch("orders.views.calculate_route_or_estimate")
+    def test_bulk_mode_uses_single_distance_matrix_request(
+        self, mock_calculate_route, mock_matrix
+    ):
+        mock_matrix.return_value = [[4000, 900], [15000, 2700], [4000, 900]]
+
+        payload = {
+            "mode": "bulk",
+            "pickup": {"lat": 6.0, "long": 3.0},
+            "deliveries": [
+                {"lat": 6.1, "long": 3.1},
+                {"lat": 6.2, "long": 3.2},
+                {"lat": 6.3, "long": 3.3},
+            ],
+        }
+
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(mock_matrix.call_count, 1)
+        mock_calculate_route.assert_not_called()
+        self.assertFalse(response.data["partial"])
+        # 1200 + 2900 + 1200
+        self.assertEqual(float(response.data["vehicles"]["Bike"]["price"]), 5300.0)
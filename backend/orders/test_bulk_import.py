@@ -0,0 +1,151 @@
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from orders.models import Delivery, Order, Vehicle
+from riders.models import NotificationOutbox, OrderOffer
+from wallet.models import Wallet
+
+
+class BulkImportTests(TestCase):
+    url = "/api/orders/bulk-import/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.merchant = User.objects.create_user(
+            phone="08020202020",
+            email="bulk_import@example.com",
+            password="testpassword",
+            usertype="Merchant",
+            business_name="Bulk Ltd",
+        )
+        Vehicle.objects.create(
+            name="Bike",
+            max_weight_kg=100,
+            base_price=Decimal("500.00"),
+            base_fare=Decimal("500.00"),
+            rate_per_km=Decimal("100.00"),
+            rate_per_minute=Decimal("0.00"),
+            min_fee=Decimal("500.00"),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.merchant)
+
+    def _payload(self, stops, **overrides):
+        payload = {
+            "pickup_address": "1 Warehouse Rd",
+            "sender_name": "Bulk Ltd",
+            "sender_phone": "08020202020",
+            "vehicle": "Bike",
+            "payment_method": "cash",
+            "distance_km": "5.00",
+            "duration_minutes": 20,
+            "deliveries": [
+                {
+                    "dropoff_address": f"{i} Customer St",
+                    "receiver_name": f"Receiver {i}",
+                    "receiver_phone": f"0809000{i:04d}",
+                }
+                for i in range(stops)
+            ],
+        }
+        payload.update(overrides)
+        return payload
+
+    @override_settings(BULK_IMPORT_BATCH_SIZE=2, SIDE_EFFECTS_BACKEND="inline")
+    def test_creates_deliveries_in_batches_with_one_set_of_side_effects(self):
+        with patch("dispatcher.utils.emit_activity") as emit, patch(
+            "webhooks.utils.trigger_webhook"
+        ) as webhook, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, self._payload(5), format="json")
+
+        self.assertEqual(response.status_code, 201, response.data)
+        order = Order.objects.get(order_number=response.data["order"]["order_number"])
+        self.assertEqual(
+            list(order.deliveries.values_list("sequence", flat=True)), [1, 2, 3, 4, 5]
+        )
+        self.assertEqual(order.total_amount, Decimal("5000.00"))
+        self.assertEqual(OrderOffer.objects.filter(order=order).count(), 1)
+        self.assertEqual(NotificationOutbox.objects.filter(order=order).count(), 1)
+        emit.assert_called_once()
+        self.assertEqual(emit.call_args.kwargs["metadata"]["deliveries"], 5)
+        webhook.assert_called_once()
+
+    def test_insufficient_wallet_balance_leaves_nothing_behind(self):
+        Wallet.objects.update_or_create(user=self.merchant, defaults={"balance": Decimal("100.00")})
+
+        response = self.client.post(
+            self.url, self._payload(3, payment_method="wallet"), format="json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("wallet", response.data["errors"])
+        self.assertFalse(Order.objects.filter(user=self.merchant).exists())
+        self.assertFalse(Delivery.objects.exists())
+
+    def test_invalid_rows_are_reported_without_writing(self):
+        payload = self._payload(2)
+        payload["deliveries"][1].pop("receiver_phone")
+
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("receiver_phone", response.data["errors"]["deliveries"][1])
+        self.assertFalse(Order.objects.exists())
+
+    def test_csv_upload(self):
+        csv_body = (
+            "dropoff_address,receiver_name,receiver_phone,cod_amount\n"
+            "1 Customer St,Ada,08090000001,1500\n"
+            "2 Customer St,Bayo,08090000002,\n"
+        )
+        fields = {k: v for k, v in self._payload(0).items() if k != "deliveries"}
+        fields["file"] = SimpleUploadedFile("stops.csv", csv_body.encode(), content_type="text/csv")
+
+        response = self.client.post(self.url, fields, format="multipart")
+
+        self.assertEqual(response.status_code, 201, response.data)
+        order = Order.objects.get(order_number=response.data["order"]["order_number"])
+        self.assertEqual(
+            list(order.deliveries.values_list("receiver_name", "cod_amount")),
+            [("Ada", Decimal("1500.00")), ("Bayo", Decimal("0.00"))],
+        )
+
+    @override_settings(BULK_IMPORT_SYNC_MAX_ROWS=3)
+    def test_large_import_runs_as_background_job(self):
+        from orders.bulk_import import run_job
+
+        upload = SimpleUploadedFile(
+            "stops.json",
+            json.dumps(self._payload(4)).encode(),
+            content_type="application/json",
+        )
+        with patch("orders.tasks.process_bulk_import.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url, {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data["job"]["job_id"]
+        self.assertFalse(Order.objects.exists())
+        delay.assert_called_once()
+
+        run_job(*delay.call_args.args)
+
+        status_response = self.client.get(f"{self.url}jobs/{job_id}/")
+        self.assertEqual(status_response.status_code, 200)
+        job = status_response.data["job"]
+        self.assertEqual((job["status"], job["processed"], job["total"]), ("done", 4, 4))
+        self.assertEqual(Order.objects.get(order_number=job["order_number"]).deliveries.count(), 4)
+
+        other = User.objects.create_user(
+            phone="08020202021", email="other_bulk@example.com", password="x", usertype="Merchant"
+        )
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(f"{self.url}jobs/{job_id}/").status_code, 404)
@@ -0,0 +1,59 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from orders import geocode_cache
+from orders.models import GeocodeCacheEntry
+from orders.utils import geocode_address, geocode_many
+
+
+def _fake_fetch(address, api_key):
+    if "nowhere" in address.lower():
+        return None
+    return {"lat": 6.5, "lng": 3.3 + len(geocode_cache.normalize_address(address)) / 1000}
+
+
+@override_settings(
+    GOOGLE_MAPS_API_KEY="test-key",
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+class GeocodeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        geocode_cache._local.clear()
+
+    @patch("orders.utils._fetch_geocode", side_effect=_fake_fetch)
+    def test_geocode_address_cached_by_normalised_text(self, fetch_mock):
+        first = geocode_address("12 Allen Avenue, Ikeja")
+        self.assertEqual(geocode_address("  12 allen avenue ikeja. "), first)
+        self.assertEqual(fetch_mock.call_count, 1)
+
+        # Memory and Redis gone: the DB tier still answers.
+        cache.clear()
+        geocode_cache._local.clear()
+        self.assertEqual(geocode_address("12 Allen Avenue, Ikeja"), first)
+        self.assertEqual(fetch_mock.call_count, 1)
+        self.assertEqual(GeocodeCacheEntry.objects.get().hits, 1)
+
+    @patch("orders.utils._fetch_geocode", side_effect=_fake_fetch)
+    def test_geocode_many_dedupes_and_skips_cached(self, fetch_mock):
+        geocode_address("Lekki Phase 1")
+        fetch_mock.reset_mock()
+
+        addresses = [
+            "Lekki Phase 1",
+            "Yaba, Lagos",
+            "yaba lagos",
+            "Nowhere Street",
+            "Surulere",
+        ]
+        result = geocode_many(addresses, max_workers=4)
+
+        self.assertEqual(set(result), set(addresses))
+        self.assertEqual(result["Yaba, Lagos"], result["yaba lagos"])
+        self.assertIsNone(result["Nowhere Street"])
+        fetched = sorted(call.args[0] for call in fetch_mock.call_args_list)
+        self.assertEqual(fetched, ["Nowhere Street", "Surulere", "Yaba, Lagos"])
+        # Failed lookups are not cached.
+        self.assertEqual(GeocodeCacheEntry.objects.count(), 3)
@@ -1,11 +1,13 @@
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.test import TestCase
 from django.utils import timezone
 
 from authentication.models import User
 from orders.models import Vehicle, MerchantPricingOverride
-from orders.pricing import calculate_effective_fare
+from orders import pricing
+from orders.pricing import calculate_effective_fare, get_merchant_overrides
 
 
 class MerchantPricingOverrideTests(TestCase):
@@ -159,3 +161,106 @@ class MerchantPricingOverrideTests(TestCase):
         van_fare = calculate_effective_fare(self.merchant, other_vehicle, 10, 0)
         self.assertEqual(van_fare, Decimal("1500.00"))
 
+    # ── 7. Batch fare matrix matches the scalar path ─────────────────
+    def test_batch_fares_match_scalar_path(self):
+        from orders.pricing import calculate_effective_fares
+
+        van = Vehicle.objects.create(
+            name="TestVan",
+            max_weight_kg=500,
+            base_price=Decimal("0.00"),
+            base_fare=Decimal("500.00"),
+            rate_per_km=Decimal("100.00"),
+            rate_per_minute=Decimal("10.00"),
+            min_distance_km=Decimal("2.00"),
+            min_fee=Decimal("800.00"),
+        )
+        MerchantPricingOverride.objects.create(
+            merchant=self.merchant,
+            vehicle=self.vehicle,
+            pricing_tiers={
+                "type": "tiered",
+                "floor_km": 5,
+                "floor_fee": 1000,
+                "tiers": [{"max_km": 10, "rate": 150}, {"rate": 100}],
+            },
+            is_active=True,
+        )
+        routes = [(3, 10), (8.4, 25), (15, 40), (8.4, 25), (0, 0)]
+        vehicles = [self.vehicle, van]
+
+        with self.assertNumQueries(1):
+            matrix = calculate_effective_fares(self.merchant, vehicles, routes)
+
+        self.assertEqual(len(matrix), len(routes))
+        for (km, minutes), row in zip(routes, matrix):
+            self.assertEqual(
+                row,
+                [
+                    calculate_effective_fare(self.merchant, v, km, minutes)
+                    for v in vehicles
+                ],
+            )
+
+    # ── 8. Override map is cached and invalidated on save/delete ─────
+    def test_override_map_cached_until_override_changes(self):
+        van = Vehicle.objects.create(
+            name="TestVan",
+            max_weight_kg=500,
+            base_price=Decimal("0.00"),
+            base_fare=Decimal("500.00"),
+            rate_per_km=Decimal("100.00"),
+            rate_per_minute=Decimal("0.00"),
+            min_distance_km=Decimal("0.00"),
+            min_fee=Decimal("500.00"),
+        )
+        override = MerchantPricingOverride.objects.create(
+            merchant=self.merchant,
+            vehicle=self.vehicle,
+            flat_fee=Decimal("3000.00"),
+            is_active=True,
+        )
+        calculate_effective_fare(self.merchant, self.vehicle, 10, 0)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                calculate_effective_fare(self.merchant, self.vehicle, 10, 0),
+                Decimal("3000.00"),
+            )
+            calculate_effective_fare(self.merchant, van, 10, 0)
+
+        override.flat_fee = Decimal("3500.00")
+        override.save()
+        self.assertEqual(
+            calculate_effective_fare(self.merchant, self.vehicle, 10, 0),
+            Decimal("3500.00"),
+        )
+
+        override.delete()
+        self.assertEqual(
+            calculate_effective_fare(self.merchant, self.vehicle, 10, 0),
+            Decimal("2750.00"),
+        )
+
+    # ── 9. Local hits keep a merchant's overrides in the LRU ─────────
+    @patch.object(pricing, "OVERRIDE_LOCAL_MAX_MERCHANTS", 2)
+    def test_local_hit_refreshes_lru_position(self):
+        others = [
+            User.objects.create_user(
+                phone=f"0801111000{n}",
+                email=f"lru{n}@example.com",
+                password="testpass",
+                usertype="Merchant",
+            )
+            for n in (2, 3)
+        ]
+        first, second, third = [str(m.id) for m in [self.merchant] + others]
+
+        get_merchant_overrides(first)
+        get_merchant_overrides(second)
+        with self.assertNumQueries(0):
+            get_merchant_overrides(first)
+        get_merchant_overrides(third)
+
+        self.assertIn(first, pricing._override_lru)
+        self.assertNotIn(second, pricing._override_lru)
@@ -0,0 +1,133 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from orders.models import Delivery, Order, Vehicle
+from orders.services import InsufficientBalance, create_order
+from riders.models import NotificationOutbox
+from wallet.models import Transaction, Wallet
+
+
+class OrderCreationServiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.merchant = User.objects.create_user(
+            phone="08030303030",
+            email="order_creation@example.com",
+            password="testpassword",
+            usertype="Merchant",
+            business_name="Create Ltd",
+        )
+        cls.vehicle = Vehicle.objects.create(
+            name="Bike",
+            max_weight_kg=100,
+            base_price=Decimal("500.00"),
+            base_fare=Decimal("500.00"),
+            rate_per_km=Decimal("100.00"),
+            rate_per_minute=Decimal("0.00"),
+            min_fee=Decimal("500.00"),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.merchant)
+
+    def _fund(self, amount):
+        Wallet.objects.update_or_create(user=self.merchant, defaults={"balance": Decimal(amount)})
+
+    def _quick_send(self, **overrides):
+        payload = {
+            "pickup_address": "1 Pickup St",
+            "sender_name": "Create Ltd",
+            "sender_phone": "08030303030",
+            "dropoff_address": "2 Dropoff Rd",
+            "receiver_name": "Ada",
+            "receiver_phone": "08030303031",
+            "vehicle": "Bike",
+            "payment_method": "wallet",
+            "distance_km": "5.00",
+            "duration_minutes": 15,
+        }
+        payload.update(overrides)
+        return self.client.post("/api/orders/quick-send/", payload, format="json")
+
+    def test_wallet_order_is_written_with_escrow_in_one_transaction(self):
+        self._fund("5000.00")
+
+        with patch("orders.services._announce") as announce, self.captureOnCommitCallbacks(
+            execute=True
+        ):
+            response = self._quick_send()
+
+        self.assertEqual(response.status_code, 201, response.data)
+        order = Order.objects.get(order_number=response.data["order"]["order_number"])
+        self.assertTrue(order.escrow_held)
+        self.assertEqual(order.total_amount, Decimal("1000.00"))
+        self.assertEqual(Wallet.objects.get(user=self.merchant).balance, Decimal("4000.00"))
+        self.assertTrue(Transaction.objects.filter(reference=f"ORDER-{order.order_number}").exists())
+        delivery = order.deliveries.get()
+        self.assertEqual((delivery.sequence, delivery.sender_name), (1, "Create Ltd"))
+        self.assertEqual(NotificationOutbox.objects.filter(order=order).count(), 1)
+        announce.assert_called_once()
+
+    def test_insufficient_balance_writes_nothing(self):
+        self._fund("100.00")
+
+        with patch("orders.services._announce") as announce, self.captureOnCommitCallbacks(
+            execute=True
+        ):
+            response = self._quick_send()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Insufficient balance", response.data["errors"]["wallet"][0])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Delivery.objects.exists())
+        self.assertEqual(Wallet.objects.get(user=self.merchant).balance, Decimal("100.00"))
+        announce.assert_not_called()
+
+    def test_cash_order_skips_wallet(self):
+        self._fund("0.00")
+
+        response = self._quick_send(payment_method="cash")
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertFalse(Order.objects.get().escrow_held)
+
+    def test_multi_drop_numbers_stops_and_charges_per_stop(self):
+        self._fund("5000.00")
+        payload = {
+            "pickup_address": "1 Pickup St",
+            "sender_name": "Create Ltd",
+            "sender_phone": "08030303030",
+            "vehicle": "Bike",
+            "payment_method": "wallet",
+            "distance_km": "5.00",
+            "duration_minutes": 15,
+            "deliveries": [
+                {"dropoff_address": f"{i} Dropoff Rd", "receiver_name": "R", "receiver_phone": "0803"}
+                for i in range(3)
+            ],
+        }
+
+        response = self.client.post("/api/orders/multi-drop/", payload, format="json")
+
+        self.assertEqual(response.status_code, 201, response.data)
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, Decimal("3000.00"))
+        self.assertEqual(list(order.deliveries.values_list("sequence", flat=True)), [1, 2, 3])
+
+    def test_insufficient_balance_carries_amounts(self):
+        self._fund("100.00")
+        with self.assertRaises(InsufficientBalance) as ctx:
+            create_order(
+                self.merchant,
+                self.vehicle,
+                mode="quick",
+                total_amount=Decimal("900.00"),
+                order_fields={"pickup_address": "x", "sender_name": "y", "sender_phone": "z"},
+                deliveries=[{"dropoff_address": "a", "receiver_name": "b", "receiver_phone": "c"}],
+            )
+        self.assertEqual((ctx.exception.required, ctx.exception.available), (Decimal("900.00"), Decimal("100.00")))
@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from authentication.models import User
+from orders.models import Order, Vehicle
+
+
+class OrderDirtyTrackingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.merchant = User.objects.create_user(
+            phone="08012341111",
+            email="dirty_tracking@example.com",
+            password="testpassword",
+            usertype="Merchant",
+            business_name="Tracking Ltd",
+        )
+        cls.vehicle = Vehicle.objects.create(
+            name="Bike", max_weight_kg=100, base_price=Decimal("500.00")
+        )
+
+    def setUp(self):
+        self.order = Order.objects.create(
+            user=self.merchant,
+            vehicle=self.vehicle,
+            pickup_address="1 Pickup St",
+            sender_name="Sender",
+            sender_phone="08012341111",
+            total_amount=Decimal("1000.00"),
+        )
+
+    def test_save_updates_only_changed_fields_without_reading_the_row(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.status = "Assigned"
+
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+
+        sql = [q["sql"] for q in queries.captured_queries]
+        self.assertFalse([s for s in sql if s.lstrip().upper().startswith("SELECT")], sql)
+        (update,) = [s for s in sql if s.lstrip().upper().startswith("UPDATE")]
+        self.assertIn('"status"', update)
+        self.assertIn('"updated_at"', update)
+        self.assertNotIn('"total_amount"', update)
+        self.assertEqual(order._previous_status, "Pending")
+
+    def test_concurrent_saves_of_different_fields_both_survive(self):
+        first = Order.objects.get(pk=self.order.pk)
+        second = Order.objects.get(pk=self.order.pk)
+
+        first.status = "Assigned"
+        first.save()
+        second.notes = "Leave at the gate"
+        second.save()
+
+        order = Order.objects.get(pk=self.order.pk)
+        self.assertEqual((order.status, order.notes), ("Assigned", "Leave at the gate"))
+
+    def test_previous_status_follows_each_save(self):
+        order = Order.objects.get(pk=self.order.pk)
+
+        order.status = "Done"
+        order.save()
+        self.assertEqual(order._previous_status, "Pending")
+        self.assertEqual(order.changed_fields(), [])
+
+        order.escrow_held = True
+        order.save()
+        self.assertEqual(order._previous_status, "Done")
+
+    def test_refresh_from_db_resets_the_snapshot(self):
+        order = Order.objects.get(pk=self.order.pk)
+        Order.objects.filter(pk=order.pk).update(status="Started")
+
+        order.refresh_from_db()
+
+        self.assertEqual(order.loaded_value("status"), "Started")
+        self.assertEqual(order.changed_fields(), [])
+
+    def test_instance_without_snapshot_falls_back_to_the_row(self):
+        order = Order.objects.only("id", "order_number").get(pk=self.order.pk)
+        order.save(update_fields=["updated_at"])
+        self.assertEqual(order._previous_status, "Pending")
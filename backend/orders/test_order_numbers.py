@@ -0,0 +1,65 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from authentication.models import User
+from orders import order_numbers
+from orders.models import Order, Vehicle
+
+
+class OrderNumberAllocatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.merchant = User.objects.create_user(
+            phone="08012340000",
+            email="order_numbers@example.com",
+            password="testpassword",
+            usertype="Merchant",
+            business_name="Numbers Ltd",
+        )
+        cls.vehicle = Vehicle.objects.create(
+            name="Bike", max_weight_kg=100, base_price=Decimal("500.00")
+        )
+
+    def setUp(self):
+        order_numbers._state.update(block=[], block_pid=None, last=0)
+
+    def _order(self, **kwargs):
+        return Order.objects.create(
+            user=self.merchant,
+            vehicle=self.vehicle,
+            pickup_address="1 Pickup St",
+            sender_name="Sender",
+            sender_phone="08012340000",
+            total_amount=Decimal("1000.00"),
+            **kwargs,
+        )
+
+    def test_first_order_starts_the_series(self):
+        self.assertEqual(self._order().order_number, "6158000")
+        self.assertEqual(self._order().order_number, "6158001")
+
+    def test_continues_after_highest_existing_number_not_latest_created(self):
+        self._order(order_number="6158500")
+        self._order(order_number="6158100")  # created later, lower number
+        self.assertEqual(self._order().order_number, "6158501")
+
+    def test_bulk_allocation_is_contiguous_and_unique(self):
+        self._order(order_number="6158010")
+        numbers = order_numbers.allocate_order_numbers(3)
+        self.assertEqual(numbers, ["6158011", "6158012", "6158013"])
+        # Numbers handed out but not yet saved are not reissued
+        self.assertEqual(order_numbers.allocate_order_numbers(1), ["6158014"])
+
+    @override_settings(ORDER_NUMBER_BLOCK_SIZE=100)
+    def test_block_mode_leases_one_block_per_round_trip(self):
+        leased = [str(n) for n in range(7000000, 7000100)]
+        with patch.object(order_numbers.connection, "vendor", "postgresql"), patch(
+            "orders.order_numbers._from_sequence", side_effect=lambda n: list(leased)
+        ) as from_sequence:
+            numbers = [order_numbers.next_order_number() for _ in range(101)]
+
+        self.assertEqual(from_sequence.call_count, 2)
+        self.assertEqual(numbers[:100], leased)
+        from_sequence.assert_called_with(100)
@@ -0,0 +1,180 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from orders.models import RouteCacheEntry
+from orders.route_cache import geohash_encode, request_deadline, route_cache_stats
+from orders.utils import calculate_route, calculate_route_matrix
+
+
+class _FakeDirectionsHandler(BaseHTTPRequestHandler):
+    """Returns one 5 km / 10 min leg per stop and records each request."""
+
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        type(self).requests.append(params)
+        if url.path == "/matrix":
+            return self._send(self._matrix(params))
+        waypoints = params.get("waypoints", [""])[0]
+        stops = 1 + len([w for w in waypoints.split("|") if w and "optimize" not in w])
+        body = {
+            "status": "OK",
+            "routes": [
+                {
+                    "legs": [
+                        {"distance": {"value": 5000}, "duration": {"value": 600}}
+                        for _ in range(stops)
+                    ]
+                }
+            ],
+        }
+        self._send(body)
+
+    def _matrix(self, params):
+        destinations = params["destinations"][0].split("|")
+        return {
+            "status": "OK",
+            "rows": [
+                {
+                    "elements": [
+                        {
+                            "status": "OK",
+                            "distance": {"value": 5000},
+                            "duration": {"value": 600},
+                        }
+                        for _ in destinations
+                    ]
+                }
+            ],
+        }
+
+    def _send(self, body):
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(
+    GOOGLE_MAPS_API_KEY="test-key",
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    ROUTE_CACHE_GEOHASH_PRECISION=7,
+)
+class RouteCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = HTTPServer(("127.0.0.1", 0), _FakeDirectionsHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        _FakeDirectionsHandler.requests = []
+        cache.clear()
+        port = self.server.server_address[1]
+        self.settings_override = override_settings(
+            GOOGLE_DIRECTIONS_URL=f"http://127.0.0.1:{port}/directions",
+            GOOGLE_DISTANCE_MATRIX_URL=f"http://127.0.0.1:{port}/matrix",
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_geohash_encode_known_value(self):
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+
+    def test_repeat_pickup_served_from_cache_then_db(self):
+        warehouse = {"lat": 6.5244, "lng": 3.3792}
+        drop = {"lat": 6.6018, "lng": 3.3515}
+
+        first = calculate_route(warehouse, [drop])
+        self.assertEqual(first, {"distance_km": 5.0, "duration_minutes": 10})
+        self.assertEqual(len(_FakeDirectionsHandler.requests), 1)
+        self.assertEqual(RouteCacheEntry.objects.count(), 1)
+
+        # A GPS fix a few metres away rounds to the same geohash cell.
+        jitter = {"lat": 6.52441, "long": 3.37921}
+        self.assertEqual(calculate_route(jitter, [drop]), first)
+        self.assertEqual(len(_FakeDirectionsHandler.requests), 1)
+
+        # Redis flushed: the DB tier still answers without the network.
+        cache.clear()
+        self.assertEqual(calculate_route(warehouse, [drop]), first)
+        self.assertEqual(len(_FakeDirectionsHandler.requests), 1)
+        self.assertEqual(RouteCacheEntry.objects.get().hits, 1)
+
+        stats = route_cache_stats()["process"]
+        self.assertGreaterEqual(stats["cache_hit"], 1)
+        self.assertGreaterEqual(stats["db_hit"], 1)
+        self.assertGreaterEqual(stats["miss"], 1)
+
+    def test_relay_legs_share_route_cache(self):
+        from dispatcher.tasks import _directions_legs
+
+        pickup = {"lat": 6.45, "lng": 3.40}
+        drop = {"lat": 6.60, "lng": 3.35}
+
+        calculate_route(pickup, [drop])
+        self.assertEqual(_directions_legs(pickup, [drop]), [(5.0, 10)])
+        self.assertEqual(len(_FakeDirectionsHandler.requests), 1)
+
+        hub = {"lat": 6.50, "lng": 3.38}
+        self.assertEqual(_directions_legs(pickup, [hub, drop]), [(5.0, 10), (5.0, 10)])
+        self.assertEqual(len(_FakeDirectionsHandler.requests), 2)
+
+    def test_distance_matrix_shares_single_drop_entries(self):
+        pickup = {"lat": 6.45, "lng": 3.40}
+        drops = [
+            {"lat": 6.60, "lng": 3.35},
+            {"lat": 6.55, "lng": 3.30},
+            {"lat": 6.60, "long": 3.35},
+        ]
+
+        calculate_route(pickup, [drops[0]])
+        self.assertEqual(len(_FakeDirectionsHandler.requests), 1)
+
+        routes = calculate_route_matrix(pickup, drops)
+        self.assertEqual(routes, [{"distance_km": 5.0, "duration_minutes": 10}] * 3)
+        # Only the one uncached destination went to the network.
+        self.assertEqual(len(_FakeDirectionsHandler.requests), 2)
+        self.assertEqual(_FakeDirectionsHandler.requests[1]["destinations"], ["6.55,3.3"])
+
+        # And Directions now finds the matrix result in the cache.
+        self.assertEqual(calculate_route(pickup, [drops[1]]), routes[1])
+        self.assertEqual(len(_FakeDirectionsHandler.requests), 2)
+
+    def test_deadline_caps_directions_timeout(self):
+        pickup = {"lat": 6.45, "lng": 3.40}
+        drop = {"lat": 6.60, "lng": 3.35}
+
+        with patch("orders.route_cache.requests.get", wraps=requests.get) as mock_get:
+            with request_deadline(time.monotonic() + 0.5):
+                self.assertIsNotNone(calculate_route(pickup, [drop]))
+            self.assertLessEqual(mock_get.call_args.kwargs["timeout"], 0.5)
+
+            # Past the deadline nothing is sent at all.
+            cache.clear()
+            RouteCacheEntry.objects.all().delete()
+            with request_deadline(time.monotonic() - 1):
+                self.assertIsNone(calculate_route(pickup, [drop]))
+            self.assertEqual(mock_get.call_count, 1)
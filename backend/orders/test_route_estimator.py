@@ -0,0 +1,141 @@
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from dispatcher.models import Zone
+from orders import route_estimator
+from orders.models import Delivery, Order, RouteEstimateCoefficient, Vehicle
+from orders.route_estimator import estimate_legs, haversine_km
+from orders.utils import calculate_route, calculate_route_or_estimate
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+class RouteEstimatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        route_estimator.invalidate_coefficients()
+        self.addCleanup(route_estimator.invalidate_coefficients)
+
+        self.user = User.objects.create_user(
+            email="estimator@example.com",
+            password="testpassword123",
+            phone="08012340000",
+            first_name="Route",
+            last_name="Estimator",
+        )
+        self.vehicle = Vehicle.objects.create(
+            name="Bike", max_weight_kg=10, base_price=500, is_active=True
+        )
+        self.ikeja = Zone.objects.create(
+            name="Ikeja", center_lat=6.60, center_lng=3.35, radius_km=8
+        )
+
+    def _history(self, pickup, drop, road_factor, minutes_per_km, count):
+        hav = haversine_km(pickup[0], pickup[1], drop[0], drop[1])
+        road_km = round(hav * road_factor, 2)
+        for i in range(count):
+            order = Order.objects.create(
+                order_number=f"9{pickup[0]:.0f}{i:05d}{count}",
+                user=self.user,
+                vehicle=self.vehicle,
+                pickup_address="Pickup",
+                pickup_latitude=pickup[0],
+                pickup_longitude=pickup[1],
+                sender_name="Sender",
+                sender_phone="08011112222",
+                total_amount=Decimal("1000.00"),
+            )
+            Delivery.objects.create(
+                order=order,
+                dropoff_address="Drop",
+                dropoff_latitude=drop[0],
+                dropoff_longitude=drop[1],
+                receiver_name="Receiver",
+                receiver_phone="08055556666",
+                distance_km=Decimal(str(road_km)),
+                duration_minutes=round(road_km * minutes_per_km),
+            )
+
+    def test_uncalibrated_matches_old_heuristic(self):
+        origin = {"lat": 6.45, "lng": 3.40}
+        drop = {"lat": 6.60, "lng": 3.35}
+        d = haversine_km(6.45, 3.40, 6.60, 3.35)
+        self.assertEqual(
+            estimate_legs(origin, [drop]), [(round(d, 2), int(max(1, round(d * 4))))]
+        )
+
+    def test_fit_command_writes_zone_and_global_buckets(self):
+        # Inside Ikeja: twisty and slow. Outside any zone: straighter, faster.
+        self._history((6.60, 3.35), (6.63, 3.38), 1.5, 3.0, 4)
+        self._history((6.45, 3.50), (6.47, 3.55), 1.2, 2.0, 4)
+
+        out = StringIO()
+        call_command("fit_route_estimator", "--min-samples", "3", stdout=out)
+        self.assertIn("buckets=", out.getvalue())
+
+        zone_row = RouteEstimateCoefficient.objects.get(zone=self.ikeja, hour=None)
+        self.assertAlmostEqual(zone_row.road_factor, 1.5, places=2)
+        self.assertAlmostEqual(zone_row.minutes_per_km, 3.0, places=1)
+        self.assertEqual(zone_row.samples, 4)
+        self.assertEqual(
+            RouteEstimateCoefficient.objects.get(zone=None, hour=None).samples, 8
+        )
+
+        [(km, minutes)] = estimate_legs({"lat": 6.60, "lng": 3.35}, [{"lat": 6.63, "lng": 3.38}])
+        expected_km = haversine_km(6.60, 3.35, 6.63, 3.38) * 1.5
+        self.assertAlmostEqual(km, expected_km, places=1)
+        self.assertAlmostEqual(minutes, expected_km * 3.0, delta=1)
+
+    def test_fit_dry_run_does_not_save(self):
+        self._history((6.60, 3.35), (6.63, 3.38), 1.5, 3.0, 3)
+        call_command("fit_route_estimator", "--min-samples", "1", "--dry-run", stdout=StringIO())
+        self.assertFalse(RouteEstimateCoefficient.objects.exists())
+
+    @override_settings(GOOGLE_MAPS_API_KEY="test-key")
+    @patch(
+        "orders.route_cache._fetch_directions",
+        side_effect=requests.ConnectionError("maps down"),
+    )
+    def test_only_quotes_fall_back_to_estimate(self, _fetch):
+        pickup, drop = {"lat": 6.45, "lng": 3.40}, {"lat": 6.60, "lng": 3.35}
+        # Orders and audits keep the strict contract
+        self.assertIsNone(calculate_route(pickup, [drop]))
+
+        route = calculate_route_or_estimate(pickup, [drop])
+        self.assertTrue(route["estimated"])
+        self.assertGreater(route["distance_km"], 0)
+
+        # Malformed coordinates: no route rather than an exception
+        self.assertIsNone(calculate_route_or_estimate({"lat": 6.45}, [drop]))
+
+        with override_settings(ROUTE_ESTIMATE_FALLBACK=False):
+            self.assertIsNone(calculate_route_or_estimate(pickup, [drop]))
+
+    @patch("orders.views.calculate_route_or_estimate")
+    def test_bulk_fare_estimate_mode_skips_maps(self, mock_calculate_route):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post(
+            reverse("orders:bulk_calculate_fare"),
+            {
+                "mode": "multi",
+                "estimate": True,
+                "pickup": {"lat": 6.45, "long": 3.40},
+                "deliveries": [{"lat": 6.60, "long": 3.35}, {"lat": 6.50, "long": 3.30}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["estimated"])
+        self.assertEqual(len(response.json()["vehicles"]["Bike"]["drop_details"]), 2)
+        mock_calculate_route.assert_not_called()
@@ -62,3 +62,41 @@ class VehicleTieredPricingTests(TestCase):
         self.assertEqual(vehicle.calculate_fare(12, 0), Decimal("2820.00"))
         self.assertEqual(vehicle.calculate_fare(20, 0), Decimal("4000.00"))
         self.assertEqual(vehicle.calculate_fare(30, 0), Decimal("6000.00"))
+
+    def test_fare_schedule_compiled_once_and_rebuilt_after_save(self):
+        vehicle = self._make_vehicle(
+            {
+                "type": "tiered",
+                "floor_km": 6,
+                "floor_fee": 1700,
+                "tiers": [{"max_km": 10, "rate": 275}, {"rate": 200}],
+            }
+        )
+
+        schedule = vehicle.get_fare_schedule()
+        vehicle.calculate_fare(12, 0)
+        self.assertIs(vehicle.get_fare_schedule(), schedule)
+
+        vehicle.pricing_tiers["tiers"][0]["rate"] = 300
+        vehicle.save()
+        self.assertIsNot(vehicle.get_fare_schedule(), schedule)
+        self.assertEqual(vehicle.calculate_fare(7, 0), Decimal("2100.00"))
+
+    def test_calculate_fare_unsorted_tiers_use_first_matching_tier(self):
+        vehicle = self._make_vehicle(
+            {
+                "type": "tiered",
+                "floor_km": 2,
+                "floor_fee": 500,
+                "tiers": [
+                    {"max_km": 20, "rate": 100},
+                    {"max_km": 10, "rate": 999},
+                    {"rate": 50},
+                ],
+            }
+        )
+
+        # 8 km matches the first tier (max 20) even though tier 2 is tighter.
+        self.assertEqual(vehicle.calculate_fare(8, 0), Decimal("800.00"))
+        # 30 km: unbounded tier, floored at 10 * 999 from the previous tier.
+        self.assertEqual(vehicle.calculate_fare(30, 0), Decimal("9990.00"))
@@ -4,6 +4,7 @@ from .views import (
     QuickSendView,
     MultiDropView,
     BulkImportView,
+    BulkImportStatusView,
     OrderListView,
     OrderDetailView,
     OrderStatsView,
@@ -41,6 +42,11 @@ urlpatterns = [
     path("quick-send/", QuickSendView.as_view(), name="quick_send"),
     path("multi-drop/", MultiDropView.as_view(), name="multi_drop"),
     path("bulk-import/", BulkImportView.as_view(), name="bulk_import"),
+    path(
+        "bulk-import/jobs/<str:job_id>/",
+        BulkImportStatusView.as_view(),
+        name="bulk_import_status",
+    ),
     path("calculate-fare/", CalculateFareView.as_view(), name="calculate_fare"),
     path(
         "bulk-calculate-fare/",
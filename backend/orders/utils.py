@@ -3,27 +3,27 @@ Utility functions for the orders app.
 Includes Google Maps integration for geocoding and route calculation.
 """
 
+import logging
+import threading
+import time
 import requests
-from typing import Dict, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Tuple, Optional
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
 
-def geocode_address(address: str) -> Optional[Dict[str, float]]:
-    """
-    Geocode an address using Google Maps Geocoding API.
-
-    Args:
-        address: The address string to geocode
+_route_executor = None
+_route_executor_lock = threading.Lock()
 
-    Returns:
-        Dictionary with 'lat' and 'lng' keys, or None if geocoding fails
-    """
-    api_key = settings.GOOGLE_MAPS_API_KEY
-
-    if not api_key:
-        raise ValueError("GOOGLE_MAPS_API_KEY not configured")
 
-    url = "https://maps.googleapis.com/maps/api/geocode/json"
+def _fetch_geocode(address: str, api_key: str) -> Optional[Dict[str, float]]:
+    """Single Geocoding API call (no caching)."""
+    url = getattr(
+        settings,
+        "GOOGLE_GEOCODE_URL",
+        "https://maps.googleapis.com/maps/api/geocode/json",
+    )
     params = {
         'address': address,
         'key': api_key
@@ -48,60 +48,119 @@ def geocode_address(address: str) -> Optional[Dict[str, float]]:
         return None
 
 
-def calculate_route(origin: Dict[str, float], destinations: List[Dict[str, float]]) -> Optional[Dict]:
+def geocode_address(address: str) -> Optional[Dict[str, float]]:
     """
-    Calculate route distance and duration using Google Maps Directions API.
+    Geocode an address using Google Maps Geocoding API.
+
+    Successful results are cached by normalised address (orders.geocode_cache).
 
     Args:
-        origin: Dictionary with 'lat' and 'lng' keys for pickup location
-        destinations: List of dictionaries with 'lat' and 'lng' keys for dropoff locations
+        address: The address string to geocode
 
     Returns:
-        Dictionary with 'distance_km' and 'duration_minutes' keys, or None if calculation fails
+        Dictionary with 'lat' and 'lng' keys, or None if geocoding fails
     """
+    from . import geocode_cache
+
     api_key = settings.GOOGLE_MAPS_API_KEY
 
     if not api_key:
         raise ValueError("GOOGLE_MAPS_API_KEY not configured")
 
-    # Format origin
-    origin_str = f"{origin['lat']},{origin['lng']}"
+    cached = geocode_cache.get_cached(address)
+    if cached is not None:
+        return cached
 
-    # Format destination (last point in the route)
-    destination_str = f"{destinations[-1]['lat']},{destinations[-1]['lng']}"
+    coords = _fetch_geocode(address, api_key)
+    if coords:
+        geocode_cache.store(address, coords)
+    return coords
 
-    # Format waypoints (all points except the last one)
-    waypoints = []
-    if len(destinations) > 1:
-        for dest in destinations[:-1]:
-            waypoints.append(f"{dest['lat']},{dest['lng']}")
 
-    url = "https://maps.googleapis.com/maps/api/directions/json"
-    params = {
-        'origin': origin_str,
-        'destination': destination_str,
-        'key': api_key,
-        'optimize': 'true'  # Optimize waypoint order
-    }
+def geocode_many(addresses: List[str], max_workers: Optional[int] = None) -> Dict[str, Optional[Dict[str, float]]]:
+    """
+    Geocode many addresses at once.
 
-    if waypoints:
-        params['waypoints'] = 'optimize:true|' + '|'.join(waypoints)
+    Duplicates (after normalisation) are resolved once, cached addresses are
+    answered from the cache, and the rest are fetched concurrently on a
+    bounded thread pool (GEOCODE_MAX_WORKERS).
 
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+    Returns:
+        Dictionary mapping each input address to {'lat', 'lng'} or None
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from . import geocode_cache
 
-        if data['status'] == 'OK' and len(data['routes']) > 0:
-            route = data['routes'][0]
+    api_key = settings.GOOGLE_MAPS_API_KEY
 
-            # Sum up all legs
-            total_distance_meters = 0
-            total_duration_seconds = 0
+    if not api_key:
+        raise ValueError("GOOGLE_MAPS_API_KEY not configured")
+
+    addresses = [a for a in addresses if a]
+    cached = geocode_cache.get_cached_many(addresses)
 
-            for leg in route['legs']:
-                total_distance_meters += leg['distance']['value']
-                total_duration_seconds += leg['duration']['value']
+    # One representative address per uncached key
+    pending = {}
+    for address in addresses:
+        key = geocode_cache.address_key(address)
+        if key not in cached and key not in pending:
+            pending[key] = address
+
+    fetched = {}
+    if pending:
+        workers = max_workers or int(getattr(settings, "GEOCODE_MAX_WORKERS", 8))
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as pool:
+            results = pool.map(lambda a: _fetch_geocode(a, api_key), pending.values())
+            for key, coords in zip(pending.keys(), results):
+                fetched[key] = coords
+        geocode_cache.store_many(
+            {pending[key]: coords for key, coords in fetched.items() if coords}
+        )
+
+    out = {}
+    for address in addresses:
+        key = geocode_cache.address_key(address)
+        out[address] = cached.get(key) or fetched.get(key)
+    return out
+
+
+def calculate_route(
+    origin: Dict[str, float],
+    destinations: List[Dict[str, float]],
+    estimate_on_error: bool = False,
+) -> Optional[Dict]:
+    """
+    Calculate route distance and duration using Google Maps Directions API.
+
+    Results are served from the shared route cache (orders.route_cache) when
+    the same geohash-rounded route has been seen before.
+
+    Args:
+        origin: Dictionary with 'lat' and 'lng' keys for pickup location
+        destinations: List of dictionaries with 'lat' and 'lng' keys for dropoff locations
+
+    Returns:
+        Dictionary with 'distance_km' and 'duration_minutes' keys, or None if
+        there is no route or the Directions call failed. With
+        ``estimate_on_error`` (price quotes only, see
+        calculate_route_or_estimate) a failed call returns the offline
+        estimate instead, marked 'estimated': True.
+    """
+    from .route_cache import get_route_legs
+
+    api_key = settings.GOOGLE_MAPS_API_KEY
+
+    if not api_key:
+        raise ValueError("GOOGLE_MAPS_API_KEY not configured")
+
+    try:
+        # Waypoint order is optimised by Directions when there are several stops
+        legs = get_route_legs(origin, destinations, optimize=True)
+
+        if legs:
+            # Sum up all legs
+            total_distance_meters = sum(d for d, _ in legs)
+            total_duration_seconds = sum(t for _, t in legs)
 
             # Convert to km and minutes
             distance_km = round(total_distance_meters / 1000, 2)
@@ -115,6 +174,152 @@ def calculate_route(origin: Dict[str, float], destinations: List[Dict[str, float
             return None
 
     except Exception as e:
-        print(f"Route calculation error: {str(e)}")
+        logger.warning(f"Route calculation error: {e}")
+        if estimate_on_error and getattr(settings, "ROUTE_ESTIMATE_FALLBACK", True):
+            # Maps unreachable: fall back to the calibrated offline estimate
+            from .route_estimator import estimate_route
+
+            try:
+                return estimate_route(origin, destinations)
+            except (KeyError, TypeError, ValueError) as estimate_error:
+                logger.warning(f"Route estimate failed: {estimate_error}")
         return None
 
+
+def calculate_route_or_estimate(origin: Dict[str, float], destinations: List[Dict[str, float]]) -> Optional[Dict]:
+    """
+    calculate_route for price quotes: if Maps is unreachable, return the
+    offline estimate (marked 'estimated': True) unless
+    ROUTE_ESTIMATE_FALLBACK is off. Callers must pass the flag on to
+    whoever sees the quote; orders and audits use calculate_route.
+    """
+    return calculate_route(origin, destinations, estimate_on_error=True)
+
+
+def _legs_to_route(legs: List[List[int]]) -> Dict:
+    """Sum raw [distance_m, duration_s] legs the way calculate_route does."""
+    return {
+        'distance_km': round(sum(d for d, _ in legs) / 1000, 2),
+        'duration_minutes': int(round(sum(t for _, t in legs) / 60, 0)),
+    }
+
+
+def calculate_route_matrix(origin: Dict[str, float], destinations: List[Dict[str, float]], timeout: float = 10) -> List[Optional[Dict]]:
+    """
+    Route origin -> each destination separately, in as few API calls as possible.
+
+    Uses the route cache first and the Distance Matrix API for the misses
+    (one request per 25 destinations), so latency is one round trip rather
+    than one per drop.
+
+    Returns:
+        One {'distance_km', 'duration_minutes'} dict (or None) per destination.
+        Transport errors raise so callers can fall back to Directions.
+    """
+    from .route_cache import get_route_legs_many
+
+    if not settings.GOOGLE_MAPS_API_KEY:
+        raise ValueError("GOOGLE_MAPS_API_KEY not configured")
+
+    return [
+        _legs_to_route([legs]) if legs else None
+        for legs in get_route_legs_many(origin, destinations, timeout=timeout)
+    ]
+
+
+def _get_route_executor() -> ThreadPoolExecutor:
+    global _route_executor
+    with _route_executor_lock:
+        if _route_executor is None:
+            _route_executor = ThreadPoolExecutor(
+                max_workers=int(getattr(settings, "ROUTE_MAX_WORKERS", 8)),
+                thread_name_prefix="route",
+            )
+        return _route_executor
+
+
+def _run_route_call(
+    route_fn: Callable, origin: Dict, drop: Dict, deadline: float
+) -> Optional[Dict]:
+    from django.db import connection
+    from .route_cache import request_deadline
+
+    try:
+        # Maps calls made here never outlive the caller's deadline
+        with request_deadline(deadline):
+            return route_fn(origin=origin, destinations=[drop])
+    finally:
+        # Pool threads outlive the request; don't leave their connections open.
+        connection.close()
+
+
+def route_drops(
+    origin: Dict[str, float],
+    drops: List[Dict[str, float]],
+    route_fn: Callable = calculate_route,
+    deadline_seconds: Optional[float] = None,
+) -> Tuple[List[Optional[Dict]], Dict[int, str]]:
+    """
+    Route origin -> each drop independently within a deadline.
+
+    With ROUTE_MATRIX_MIN_DROPS or more drops a single Distance Matrix lookup
+    is tried first, with ROUTE_MATRIX_DEADLINE_FRACTION of the deadline.
+    Anything still unrouted goes through ``route_fn`` (one Directions call
+    per drop) on a shared bounded thread pool. Each call's HTTP timeout is
+    capped at the remaining deadline, so calls that miss it are reported as
+    timed out and release their pool worker instead of holding it for the
+    full Maps timeout.
+
+    Returns:
+        (routes, failures) where routes[i] is the route_fn result for
+        drops[i] or None, and failures maps the index of each unrouted drop
+        to 'no_route', 'error' or 'timeout'.
+    """
+    if deadline_seconds is None:
+        deadline_seconds = float(getattr(settings, "ROUTE_DEADLINE_SECONDS", 2.5))
+    deadline = time.monotonic() + deadline_seconds
+
+    routes: List[Optional[Dict]] = [None] * len(drops)
+    failures: Dict[int, str] = {}
+    pending = list(range(len(drops)))
+
+    if len(drops) >= int(getattr(settings, "ROUTE_MATRIX_MIN_DROPS", 3)):
+        try:
+            # Leave the rest of the deadline for the per-drop fallback
+            share = float(getattr(settings, "ROUTE_MATRIX_DEADLINE_FRACTION", 0.5))
+            matrix = calculate_route_matrix(
+                origin, drops, timeout=max(deadline_seconds * share, 0.1)
+            )
+            for i, route in enumerate(matrix):
+                if route is None:
+                    failures[i] = 'no_route'
+                routes[i] = route
+            pending = []
+        except Exception as e:
+            logger.warning(f"Distance Matrix lookup failed, routing per drop: {e}")
+
+    if pending:
+        executor = _get_route_executor()
+        futures = {
+            executor.submit(_run_route_call, route_fn, origin, drops[i], deadline): i
+            for i in pending
+        }
+        done, not_done = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+
+        for future in done:
+            i = futures[future]
+            try:
+                routes[i] = future.result()
+            except Exception as e:
+                logger.warning(f"Route calculation error: {e}")
+                failures[i] = 'error'
+                continue
+            if not routes[i]:
+                routes[i] = None
+                failures[i] = 'no_route'
+
+        for future in not_done:
+            future.cancel()
+            failures[futures[future]] = 'timeout'
+
+    return routes, failures
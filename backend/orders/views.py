@@ -1,7 +1,6 @@
 from dispatcher.models import SystemSettings
 import logging
-import threading
-from rest_framework import status, generics, permissions
+from rest_framework import status, generics, parsers, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -9,24 +8,31 @@ from django.db import transaction
 from django.utils import timezone
 from decimal import Decimal
 from .models import Order, Delivery, Vehicle, OrderEvent
-from .utils import calculate_route
+from .utils import calculate_route_or_estimate, route_drops
+from .pricing import calculate_effective_fares
+from .route_estimator import estimate_route
 from .serializers import (
     OrderSerializer,
     VehicleSerializer,
     QuickSendSerializer,
     MultiDropSerializer,
-    BulkImportSerializer,
     AssignedOrderSerializer,
     AssignedRouteSerializer,
     OrderCancelSerializer,
     OrderStatusUpdateSerializer,
 )
 from .permissions import IsRider
+from .services import (
+    OrderCreationError,
+    create_order,
+    order_fields_from,
+    stop_fields_from,
+)
 from dispatcher.models import Rider
-from dispatcher.utils import emit_activity
+from dispatcher.side_effects import dispatch
 from wallet.models import Wallet
 from wallet.escrow import EscrowManager
-from riders.notifications import notify_rider
+from riders.outbox import queue_rider_notification
 from riders.models import RiderEarning, RiderCodRecord
 import traceback
 
@@ -79,7 +85,6 @@ class QuickSendView(APIView):
 
     permission_classes = [permissions.IsAuthenticated]
 
-    @transaction.atomic
     def post(self, request):
         """Create a Quick Send order with single delivery."""
         serializer = QuickSendSerializer(data=request.data)
@@ -100,149 +105,40 @@ class QuickSendView(APIView):
         duration_minutes = data.get("duration_minutes", 0)
         total_amount = vehicle.calculate_fare(distance_km, duration_minutes)
 
-        # Create order
-        order = Order.objects.create(
-            user=request.user,
-            mode="quick",
-            vehicle=vehicle,
-            pickup_address=data["pickup_address"],
-            sender_name=data["sender_name"],
-            sender_phone=data["sender_phone"],
-            payment_method=data["payment_method"],
-            total_amount=total_amount,
-            distance_km=distance_km,
-            duration_minutes=duration_minutes,
-            notes=data.get("notes", ""),
-            scheduled_pickup_time=data.get("scheduled_pickup_time"),
-            collect_on_delivery=data.get("collect_on_delivery", False),
-            cod_amount=data.get("cod_amount"),
-        )
-
-
-        # Create single delivery
-        Delivery.objects.create(
-            order=order,
-            pickup_address=data["pickup_address"],
-            pickup_latitude=order.pickup_latitude,
-            pickup_longitude=order.pickup_longitude,
-            sender_name=data["sender_name"],
-            sender_phone=data["sender_phone"],
-            dropoff_address=data["dropoff_address"],
-            receiver_name=data["receiver_name"],
-            receiver_phone=data["receiver_phone"],
-            package_type=data.get("package_type", "Box"),
-            notes=data.get("notes", ""),
-            distance_km=distance_km,
-            duration_minutes=duration_minutes,
-            sequence=1,
-            cod_amount=data.get("cod_amount") or 0,
-        )
-
-        # Emit activity event for live feed (fire-and-forget in background thread)
-        merchant_name = (
-            getattr(request.user, "business_name", None)
-            or getattr(request.user, "contact_name", None)
-            or "Unknown"
-        )
-        threading.Thread(
-            target=emit_activity,
-            kwargs={
-                "event_type": "new_order",
-                "order_id": order.order_number,
-                "text": f"New order {order.order_number} from {merchant_name}",
-                "color": "gold",
-                "metadata": {
-                    "merchant": merchant_name,
-                    "amount": str(total_amount),
-                    "pickup": data["pickup_address"],
-                    "dropoff": data["dropoff_address"],
-                },
-            },
-            daemon=True,
-        ).start()
-
-        # Hold funds in escrow if payment method is wallet
-        if data["payment_method"] == "wallet":
-            try:
-                wallet = Wallet.objects.get(user=request.user)
-
-                # Hold funds in escrow
-                try:
-                    EscrowManager.hold_funds(
-                        wallet=wallet,
-                        amount=total_amount,
-                        order_number=order.order_number,
-                        description=f"Escrow hold for Quick Send order #{order.order_number}",
-                    )
-
-                    # Mark order as having escrow held
-                    order.escrow_held = True
-                    order.save()
-
-                except ValueError as e:
-                    # Insufficient balance - rollback order
-                    order.delete()
-                    return Response(
-                        {"success": False, "errors": {"wallet": [str(e)]}},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
-            except Wallet.DoesNotExist:
-                # Create wallet if it doesn't exist
-                wallet = Wallet.objects.create(user=request.user)
-                order.delete()
-                return Response(
+        try:
+            order = create_order(
+                request.user,
+                vehicle,
+                mode="quick",
+                total_amount=total_amount,
+                order_fields=dict(
+                    order_fields_from(data),
+                    cod_amount=data.get("cod_amount"),
+                ),
+                deliveries=[
                     {
-                        "success": False,
-                        "errors": {
-                            "wallet": [
-                                "Insufficient wallet balance. Please fund your wallet first."
-                            ]
-                        },
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-        # Notify all online riders about the new order (fire-and-forget in background)
-        def _notify_riders():
-            try:
-                online_riders = Rider.objects.filter(
-                    status=Rider.Status.ONLINE, is_active=True, is_authorized=True
-                )
-                for rider in online_riders:
-                    notify_rider(
-                        rider=rider,
-                        title="New Order Available",
-                        body=f"Quick Send pickup from {order.pickup_address}",
-                        data={"order_number": order.order_number, "mode": "quick"},
-                    )
-            except Exception as e:
-                logger.warning(f"Failed to send new-order notifications: {e}")
-
-        threading.Thread(target=_notify_riders, daemon=True).start()
-        order_serializer = OrderSerializer(order)
-
-        # Trigger order-created webhook in background
-        def _trigger_created():
-            try:
-                from webhooks.utils import trigger_webhook
-
-                payload = {
-                    "event": "order-created",
-                    "timestamp": order.created_at.isoformat(),
-                    "data": order_serializer.data,
-                }
-                trigger_webhook("order-created", payload)
-            except Exception as e:
-                logger.error(f"Failed to trigger order-created webhook: {e}")
-
-        threading.Thread(target=_trigger_created, daemon=True).start()
+                        "dropoff_address": data["dropoff_address"],
+                        "receiver_name": data["receiver_name"],
+                        "receiver_phone": data["receiver_phone"],
+                        "package_type": data.get("package_type", "Box"),
+                        "notes": data.get("notes", ""),
+                        "distance_km": distance_km,
+                        "duration_minutes": duration_minutes,
+                        "cod_amount": data.get("cod_amount") or 0,
+                    }
+                ],
+            )
+        except OrderCreationError as e:
+            return Response(
+                {"success": False, "errors": e.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         return Response(
             {
                 "success": True,
                 "message": "Quick Send order created successfully!",
-                "order": order_serializer.data,
+                "order": OrderSerializer(order).data,
             },
             status=status.HTTP_201_CREATED,
         )
@@ -253,7 +149,6 @@ class MultiDropView(APIView):
 
     permission_classes = [permissions.IsAuthenticated]
 
-    @transaction.atomic
     def post(self, request):
         """Create a Multi-Drop order with multiple deliveries."""
         serializer = MultiDropSerializer(data=request.data)
@@ -276,286 +171,100 @@ class MultiDropView(APIView):
         unit_fare = vehicle.calculate_fare(distance_km, duration_minutes)
         total_amount = unit_fare * num_deliveries
 
-        # Create order
-        order = Order.objects.create(
-            user=request.user,
-            mode="multi",
-            vehicle=vehicle,
-            pickup_address=data["pickup_address"],
-            sender_name=data["sender_name"],
-            sender_phone=data["sender_phone"],
-            payment_method=data["payment_method"],
-            total_amount=total_amount,
-            distance_km=distance_km,
-            duration_minutes=duration_minutes,
-            notes=data.get("notes", ""),
-            scheduled_pickup_time=data.get("scheduled_pickup_time"),
-            collect_on_delivery=data.get("collect_on_delivery", False),
-        )
-
-
-        # Create multiple deliveries
-        for idx, delivery_data in enumerate(data["deliveries"], start=1):
-            Delivery.objects.create(
-                order=order,
-                pickup_address=data["pickup_address"],
-                pickup_latitude=order.pickup_latitude,
-                pickup_longitude=order.pickup_longitude,
-                sender_name=data["sender_name"],
-                sender_phone=data["sender_phone"],
-                dropoff_address=delivery_data["dropoff_address"],
-                receiver_name=delivery_data["receiver_name"],
-                receiver_phone=delivery_data["receiver_phone"],
-                package_type=delivery_data.get("package_type", "Box"),
-                notes=delivery_data.get("notes", ""),
-                cod_amount=delivery_data.get("cod_amount", 0),
-                distance_km=delivery_data.get("distance_km"),
-                duration_minutes=delivery_data.get("duration_minutes"),
-                sequence=idx,
+        try:
+            order = create_order(
+                request.user,
+                vehicle,
+                mode="multi",
+                total_amount=total_amount,
+                order_fields=order_fields_from(data),
+                deliveries=[stop_fields_from(stop) for stop in data["deliveries"]],
+            )
+        except OrderCreationError as e:
+            return Response(
+                {"success": False, "errors": e.errors},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-
-        # Hold funds in escrow if payment method is wallet
-        if data["payment_method"] == "wallet":
-            try:
-                wallet = Wallet.objects.get(user=request.user)
-
-                # Hold funds in escrow
-                try:
-                    EscrowManager.hold_funds(
-                        wallet=wallet,
-                        amount=total_amount,
-                        order_number=order.order_number,
-                        description=f"Escrow hold for Multi-Drop order #{order.order_number} ({num_deliveries} deliveries)",
-                    )
-
-                    # Mark order as having escrow held
-                    order.escrow_held = True
-                    order.save()
-
-                except ValueError as e:
-                    # Insufficient balance - rollback order
-                    order.delete()
-                    return Response(
-                        {"success": False, "errors": {"wallet": [str(e)]}},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
-            except Wallet.DoesNotExist:
-                # Create wallet if it doesn't exist
-                wallet = Wallet.objects.create(user=request.user)
-                order.delete()
-                return Response(
-                    {
-                        "success": False,
-                        "errors": {
-                            "wallet": [
-                                "Insufficient wallet balance. Please fund your wallet first."
-                            ]
-                        },
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-        # Notify all online riders about the new order (fire-and-forget in background)
-        def _notify_riders_multi():
-            try:
-                online_riders = Rider.objects.filter(
-                    status=Rider.Status.ONLINE, is_active=True, is_authorized=True
-                )
-                for rider in online_riders:
-                    notify_rider(
-                        rider=rider,
-                        title="New Order Available",
-                        body=f"Multi-Drop ({num_deliveries} stops) pickup from {order.pickup_address}",
-                        data={"order_number": order.order_number, "mode": "multi"},
-                    )
-            except Exception as e:
-                logger.warning(f"Failed to send new-order notifications: {e}")
-
-        threading.Thread(target=_notify_riders_multi, daemon=True).start()
-
-        order_serializer = OrderSerializer(order)
-
-        # Trigger order-created webhook in background
-        def _trigger_multi_created():
-            try:
-                from webhooks.utils import trigger_webhook
-
-                payload = {
-                    "event": "order-created",
-                    "timestamp": order.created_at.isoformat(),
-                    "data": order_serializer.data,
-                }
-                trigger_webhook("order-created", payload)
-            except Exception as e:
-                logger.error(f"Failed to trigger order-created webhook: {e}")
-
-        threading.Thread(target=_trigger_multi_created, daemon=True).start()
 
         return Response(
             {
                 "success": True,
                 "message": f"Multi-Drop order created with {num_deliveries} deliveries!",
-                "order": order_serializer.data,
+                "order": OrderSerializer(order).data,
             },
             status=status.HTTP_201_CREATED,
         )
 
 
 class BulkImportView(APIView):
-    """API endpoint for Bulk Import order creation."""
+    """
+    API endpoint for Bulk Import order creation.
+
+    Accepts the JSON payload, or form fields plus a CSV/JSON ``file`` of
+    deliveries. Imports larger than BULK_IMPORT_SYNC_MAX_ROWS are processed
+    in the background and answered with 202 and a job id to poll.
+    """
 
     permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [parsers.JSONParser, parsers.MultiPartParser, parsers.FormParser]
 
-    @transaction.atomic
     def post(self, request):
         """Create a Bulk Import order with multiple deliveries."""
-        serializer = BulkImportSerializer(data=request.data)
-
-        if not serializer.is_valid():
-            return Response(
-                {"success": False, "errors": serializer.errors},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        data = serializer.validated_data
-
-        # Get vehicle
-        vehicle = Vehicle.objects.get(name=data["vehicle"], is_active=True)
-
-        # Calculate total amount using new fare structure
-        num_deliveries = len(data["deliveries"])
-        distance_km = data.get("distance_km", 0)
-        duration_minutes = data.get("duration_minutes", 0)
-        unit_fare = vehicle.calculate_fare(distance_km, duration_minutes)
-        total_amount = unit_fare * num_deliveries
-
-        # Create order
-        order = Order.objects.create(
-            user=request.user,
-            mode="bulk",
-            vehicle=vehicle,
-            pickup_address=data["pickup_address"],
-            sender_name=data["sender_name"],
-            sender_phone=data["sender_phone"],
-            payment_method=data["payment_method"],
-            total_amount=total_amount,
-            distance_km=distance_km,
-            duration_minutes=duration_minutes,
-            notes=data.get("notes", ""),
-            scheduled_pickup_time=data.get("scheduled_pickup_time"),
-            collect_on_delivery=data.get("collect_on_delivery", False),
+        from .bulk_import import (
+            create_bulk_order,
+            parse_upload,
+            should_run_in_background,
+            start_job,
+            validate_import,
         )
 
-
-        # Create multiple deliveries
-        for idx, delivery_data in enumerate(data["deliveries"], start=1):
-            Delivery.objects.create(
-                order=order,
-                pickup_address=data["pickup_address"],
-                pickup_latitude=order.pickup_latitude,
-                pickup_longitude=order.pickup_longitude,
-                sender_name=data["sender_name"],
-                sender_phone=data["sender_phone"],
-                dropoff_address=delivery_data["dropoff_address"],
-                receiver_name=delivery_data["receiver_name"],
-                receiver_phone=delivery_data["receiver_phone"],
-                package_type=delivery_data.get("package_type", "Box"),
-                notes=delivery_data.get("notes", ""),
-                cod_amount=delivery_data.get("cod_amount", 0),
-                distance_km=delivery_data.get("distance_km"),
-                duration_minutes=delivery_data.get("duration_minutes"),
-                sequence=idx,
-            )
-
-        # Hold funds in escrow if payment method is wallet
-        if data["payment_method"] == "wallet":
-            try:
-                wallet = Wallet.objects.get(user=request.user)
-
-                # Hold funds in escrow
-                try:
-                    EscrowManager.hold_funds(
-                        wallet=wallet,
-                        amount=total_amount,
-                        order_number=order.order_number,
-                        description=f"Escrow hold for Bulk Import order #{order.order_number} ({num_deliveries} deliveries)",
-                    )
-
-                    # Mark order as having escrow held
-                    order.escrow_held = True
-                    order.save()
-
-                except ValueError as e:
-                    # Insufficient balance - rollback order
-                    order.delete()
-                    return Response(
-                        {"success": False, "errors": {"wallet": [str(e)]}},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
-            except Wallet.DoesNotExist:
-                # Create wallet if it doesn't exist
-                wallet = Wallet.objects.create(user=request.user)
-                order.delete()
+        try:
+            payload = parse_upload(request.data, request.FILES.get("file"))
+            if should_run_in_background(payload):
+                job = start_job(request.user, payload)
                 return Response(
                     {
-                        "success": False,
-                        "errors": {
-                            "wallet": [
-                                "Insufficient wallet balance. Please fund your wallet first."
-                            ]
-                        },
+                        "success": True,
+                        "message": f"Bulk Import of {job['total']} deliveries queued.",
+                        "job": job,
                     },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-        # Notify all online riders about the new order (fire-and-forget in background)
-        def _notify_riders_bulk():
-            try:
-                online_riders = Rider.objects.filter(
-                    status=Rider.Status.ONLINE, is_active=True, is_authorized=True
+                    status=status.HTTP_202_ACCEPTED,
                 )
-                for rider in online_riders:
-                    notify_rider(
-                        rider=rider,
-                        title="New Order Available",
-                        body=f"Bulk Import ({num_deliveries} stops) pickup from {order.pickup_address}",
-                        data={"order_number": order.order_number, "mode": "bulk"},
-                    )
-            except Exception as e:
-                logger.warning(f"Failed to send new-order notifications: {e}")
-
-        threading.Thread(target=_notify_riders_bulk, daemon=True).start()
-
-        order_serializer = OrderSerializer(order)
-        # Trigger order-created webhook in background
-
-        def _trigger_bulk_created():
-            try:
-                from webhooks.utils import trigger_webhook
-
-                payload = {
-                    "event": "order-created",
-                    "timestamp": order.created_at.isoformat(),
-                    "data": order_serializer.data,
-                }
-                trigger_webhook("order-created", payload)
-            except Exception as e:
-                logger.error(f"Failed to trigger order-created webhook: {e}")
-
-        threading.Thread(target=_trigger_bulk_created, daemon=True).start()
+            order = create_bulk_order(request.user, validate_import(payload))
+        except OrderCreationError as e:
+            return Response(
+                {"success": False, "errors": e.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
+        num_deliveries = order.deliveries.count()
         return Response(
             {
                 "success": True,
                 "message": f"Bulk Import order created with {num_deliveries} deliveries!",
-                "order": order_serializer.data,
+                "order": OrderSerializer(order).data,
             },
             status=status.HTTP_201_CREATED,
         )
 
 
+class BulkImportStatusView(APIView):
+    """Progress of a background Bulk Import job."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        from .bulk_import import get_job
+
+        job = get_job(job_id)
+        if not job or job.get("user_id") != str(request.user.pk):
+            return Response(
+                {"success": False, "error": "Import job not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response({"success": True, "job": job}, status=status.HTTP_200_OK)
+
+
 class OrderListView(APIView):
     """API endpoint to list all orders for the authenticated user."""
 
@@ -740,7 +449,8 @@ class BulkCalculateFareView(APIView):
     {
         "mode": "quick", // quick, multi, or bulk
         "pickup": {"lat": 3.33, "long": 34.99},
-        "deliveries": [{"lat": 32.32, "long": 23.53}]
+        "deliveries": [{"lat": 32.32, "long": 23.53}],
+        "estimate": false // true = instant offline estimate, no Maps calls
     }
     """
 
@@ -750,6 +460,7 @@ class BulkCalculateFareView(APIView):
         mode = request.data.get("mode", "quick")
         pickup = request.data.get("pickup")
         deliveries = request.data.get("deliveries", [])
+        estimate_only = request.data.get("estimate") in (True, "true", "1", 1)
 
         if not pickup or not deliveries:
             return Response(
@@ -760,12 +471,17 @@ class BulkCalculateFareView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        vehicles = Vehicle.objects.filter(is_active=True)
+        vehicles = list(Vehicle.objects.filter(is_active=True))
         results = {}
 
         try:
             if mode == "quick":
-                route_data = calculate_route(origin=pickup, destinations=deliveries)
+                if estimate_only:
+                    route_data = estimate_route(pickup, deliveries)
+                else:
+                    route_data = calculate_route_or_estimate(
+                        origin=pickup, destinations=deliveries
+                    )
                 if not route_data:
                     return Response(
                         {"success": False, "error": "Could not calculate route"},
@@ -774,9 +490,13 @@ class BulkCalculateFareView(APIView):
 
                 dist_km = route_data["distance_km"]
                 dur_mins = route_data["duration_minutes"]
+                # The offline estimate stands in if Maps is unreachable
+                estimated = estimate_only or bool(route_data.get("estimated"))
 
-                for vehicle in vehicles:
-                    fare = vehicle.calculate_fare(dist_km, dur_mins)
+                [fares] = calculate_effective_fares(
+                    None, vehicles, [(dist_km, dur_mins)]
+                )
+                for vehicle, fare in zip(vehicles, fares):
                     results[vehicle.name] = {
                         "price": fare,
                         "distance_km": dist_km,
@@ -784,41 +504,54 @@ class BulkCalculateFareView(APIView):
                     }
 
             elif mode in ["multi", "bulk"]:
-                total_distances = 0
-                total_durations = 0
-                drop_fares = {v.name: 0 for v in vehicles}
-                drop_details = []
+                # Drops are routed concurrently within ROUTE_DEADLINE_SECONDS;
+                # any that fail or time out are reported, not silently dropped.
+                if estimate_only:
+                    route_results = [estimate_route(pickup, [d]) for d in deliveries]
+                    failures = {}
+                else:
+                    route_results, failures = route_drops(
+                        pickup, deliveries, route_fn=calculate_route_or_estimate
+                    )
+                routed = [
+                    (i, (r["distance_km"], r["duration_minutes"]))
+                    for i, r in enumerate(route_results)
+                    if r
+                ]
+                routes = [route for _, route in routed]
+                estimated = estimate_only or any(
+                    r and r.get("estimated") for r in route_results
+                )
+
+                if not routes:
+                    return Response(
+                        {
+                            "success": False,
+                            "error": "Could not calculate route for any delivery",
+                        },
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
 
-                for drop in deliveries:
-                    route_data = calculate_route(origin=pickup, destinations=[drop])
-                    if not route_data:
-                        continue
+                # One fare matrix for every drop × vehicle
+                fare_matrix = calculate_effective_fares(None, vehicles, routes)
 
-                    dist_km = route_data["distance_km"]
-                    dur_mins = route_data["duration_minutes"]
-                    total_distances += dist_km
-                    total_durations += dur_mins
+                total_distances = sum(dist_km for dist_km, _ in routes)
+                total_durations = sum(dur_mins for _, dur_mins in routes)
+                drop_fares = {v.name: 0 for v in vehicles}
+                drop_details = []
 
+                for (index, (dist_km, dur_mins)), fares in zip(routed, fare_matrix):
                     drop_info = {
+                        "index": index,
                         "distance_km": dist_km,
                         "duration_minutes": dur_mins,
                         "fares": {},
                     }
-                    for vehicle in vehicles:
-                        fare = vehicle.calculate_fare(dist_km, dur_mins)
+                    for vehicle, fare in zip(vehicles, fares):
                         drop_fares[vehicle.name] += fare
                         drop_info["fares"][vehicle.name] = fare
                     drop_details.append(drop_info)
 
-                if not drop_details:
-                    return Response(
-                        {
-                            "success": False,
-                            "error": "Could not calculate route for any delivery",
-                        },
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
                 for vehicle in vehicles:
                     results[vehicle.name] = {
                         "price": drop_fares[vehicle.name],
@@ -827,8 +560,28 @@ class BulkCalculateFareView(APIView):
                         "drop_details": drop_details,
                     }
 
+                return Response(
+                    {
+                        "success": True,
+                        "mode": mode,
+                        "vehicles": results,
+                        "estimated": estimated,
+                        "partial": bool(failures),
+                        "unrouted_drops": [
+                            {"index": i, "reason": reason}
+                            for i, reason in sorted(failures.items())
+                        ],
+                    },
+                    status=status.HTTP_200_OK,
+                )
+
             return Response(
-                {"success": True, "mode": mode, "vehicles": results},
+                {
+                    "success": True,
+                    "mode": mode,
+                    "vehicles": results,
+                    "estimated": estimated,
+                },
                 status=status.HTTP_200_OK,
             )
 
@@ -929,31 +682,24 @@ class CancelOrderView(APIView):
         order.updated_at = timezone.now()
         order.save()
 
-        # Trigger order-cancelled webhook in background
-        def _trigger_cancelled():
-            try:
-                from webhooks.utils import trigger_webhook
-                from .serializers import OrderSerializer
-
-                payload = {
-                    "event": "order-cancelled",
-                    "timestamp": order.updated_at.isoformat(),
-                    "data": OrderSerializer(order).data,
-                    "reason": reason,
-                }
-                trigger_webhook("order-cancelled", payload)
-            except Exception as e:
-                logger.error(f"Failed to trigger order-cancelled webhook: {e}")
-
-        threading.Thread(target=_trigger_cancelled, daemon=True).start()
-
-        # Emit live-feed activity event for the dispatcher
+        # Webhook and live-feed event, released once the cancellation commits
+        dispatch(
+            "webhook",
+            event_name="order-cancelled",
+            payload={
+                "event": "order-cancelled",
+                "timestamp": order.updated_at.isoformat(),
+                "data": OrderSerializer(order).data,
+                "reason": reason,
+            },
+        )
         merchant_name = (
             getattr(request.user, "business_name", None)
             or getattr(request.user, "contact_name", None)
             or "Unknown"
         )
-        emit_activity(
+        dispatch(
+            "activity",
             event_type="cancelled",
             order_id=order.order_number,
             text=f"Order {order.order_number} cancelled by {merchant_name}",
@@ -1087,30 +833,21 @@ def _advance_order(request, order_number, new_status, event_desc):
 
     order.save(update_fields=update_fields)
 
-    # Trigger order-completed webhook in background if status is Done
+    # order-completed webhook, released once the status change commits
     if new_status == "Done":
-
-        def _trigger_completed():
-            try:
-                from webhooks.utils import trigger_webhook
-                from .serializers import OrderSerializer
-
-                payload = {
-                    "event": "order-completed",
-                    "timestamp": (
-                        order.completed_at.isoformat()
-                        if order.completed_at
-                        else timezone.now().isoformat()
-                    ),
-                    "data": OrderSerializer(order).data,
-                }
-                trigger_webhook("order-completed", payload)
-            except Exception as e:
-                logger.error(
-                    f"Failed to trigger order-completed webhook in _advance_order: {e}"
-                )
-
-        threading.Thread(target=_trigger_completed, daemon=True).start()
+        dispatch(
+            "webhook",
+            event_name="order-completed",
+            payload={
+                "event": "order-completed",
+                "timestamp": (
+                    order.completed_at.isoformat()
+                    if order.completed_at
+                    else timezone.now().isoformat()
+                ),
+                "data": OrderSerializer(order).data,
+            },
+        )
 
     # Update rider location if provided
     rider_profile = getattr(request.user, "rider_profile", None)
@@ -1178,11 +915,11 @@ class OrderStartView(APIView):
 
         response = _advance_order(request, order_number, "Started", "Order Started")
 
-        # Push notification — fire-and-forget, don't block the response
+        # Push notification — queued, sent by the outbox worker
         try:
             rider = getattr(request.user, "rider_profile", None)
             if rider:
-                notify_rider(
+                queue_rider_notification(
                     rider=rider,
                     title="Trip Started 🚀",
                     body=f"You're on your way to pick up order #{order_number}.",
@@ -1243,7 +980,7 @@ class OrderStatusChangeView(APIView):
             try:
                 rider = getattr(request.user, "rider_profile", None)
                 if rider:
-                    notify_rider(
+                    queue_rider_notification(
                         rider=rider,
                         title="Trip Started 🚀",
                         body=f"You're on your way to pick up order #{order_number}.",
@@ -1410,12 +1147,14 @@ class OrderCompleteView(APIView):
 
         # ── Step 5: Push notification ─────────────────────────────────────────
         try:
-            notify_rider(
-                rider=rider,
-                title="Order Completed 🎉",
-                body=f"Order #{order_number} completed. ₦{net_earning} credited to your wallet.",
-                data={"order_number": order_number, "net_earning": str(net_earning)},
-            )
+            # Savepoint: a failed insert must not poison the completion transaction
+            with transaction.atomic():
+                queue_rider_notification(
+                    rider=rider,
+                    title="Order Completed 🎉",
+                    body=f"Order #{order_number} completed. ₦{net_earning} credited to your wallet.",
+                    data={"order_number": order_number, "net_earning": str(net_earning)},
+                )
         except Exception as exc:
             logger.warning(
                 f"Failed to send completion notification to rider {rider.rider_id}: {exc}"
@@ -1612,28 +1351,20 @@ class DeliveryCompleteView(APIView):
             order.completed_at = order.completed_at or timezone.now()
             order.save(update_fields=["status", "updated_at", "completed_at"])
 
-            # Trigger order-completed webhook in background
-            def _trigger_delivery_completed():
-                try:
-                    from webhooks.utils import trigger_webhook
-                    from .serializers import OrderSerializer
-
-                    payload = {
-                        "event": "order-completed",
-                        "timestamp": (
-                            order.completed_at.isoformat()
-                            if order.completed_at
-                            else timezone.now().isoformat()
-                        ),
-                        "data": OrderSerializer(order).data,
-                    }
-                    trigger_webhook("order-completed", payload)
-                except Exception as e:
-                    logger.error(
-                        f"Failed to trigger order-completed webhook in DeliveryCompleteView: {e}"
-                    )
-
-            threading.Thread(target=_trigger_delivery_completed, daemon=True).start()
+            # order-completed webhook, released once the delivery commits
+            dispatch(
+                "webhook",
+                event_name="order-completed",
+                payload={
+                    "event": "order-completed",
+                    "timestamp": (
+                        order.completed_at.isoformat()
+                        if order.completed_at
+                        else timezone.now().isoformat()
+                    ),
+                    "data": OrderSerializer(order).data,
+                },
+            )
 
             OrderEvent.objects.create(
                 order=order,
@@ -13,7 +13,9 @@ from .models import (
     RiderDocument,
     RiderDevice,
     RiderNotification,
+    NotificationOutbox,
     RiderLocation,
+    RiderLocationHistory,
     AreaDemand,
 )
 
@@ -212,6 +214,15 @@ class RiderNotificationAdmin(admin.ModelAdmin):
     readonly_fields = ("created_at",)
 
 
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ("kind", "rider", "order", "title", "status", "retry_count", "created_at")
+    list_filter = ("kind", "status")
+    search_fields = ("rider__rider_id", "order__order_number", "title")
+    raw_id_fields = ("rider", "order")
+    readonly_fields = ("created_at", "last_attempt_at")
+
+
 @admin.register(RiderLocation)
 class RiderLocationAdmin(admin.ModelAdmin):
     list_display = ("rider", "latitude", "longitude", "updated_at")
@@ -220,6 +231,15 @@ class RiderLocationAdmin(admin.ModelAdmin):
     readonly_fields = ("updated_at",)
 
 
+@admin.register(RiderLocationHistory)
+class RiderLocationHistoryAdmin(admin.ModelAdmin):
+    list_display = ("rider", "latitude", "longitude", "recorded_at")
+    list_filter = ("simplified",)
+    search_fields = ("rider__rider_id",)
+    raw_id_fields = ("rider",)
+    readonly_fields = ("created_at",)
+
+
 @admin.register(AreaDemand)
 class AreaDemandAdmin(admin.ModelAdmin):
     list_display = ("area_name", "level", "pending_orders", "active_riders", "updated_at")
@@ -0,0 +1,326 @@
+"""
+Buffered rider GPS ingestion.
+
+Pings are written to one Redis hash (rider id -> latest fix) and the request
+returns straight away. ``flush_location_buffer`` (Celery beat, every
+RIDER_GPS_FLUSH_SECONDS) atomically swaps the hash out and writes the latest
+fix per rider with one bulk UPDATE on riders, one bulk upsert on
+rider_locations and one bulk append to rider_location_history, so database
+load follows the flush interval rather than the ping rate.
+
+When Redis is not the cache backend (tests, local dev) or is unreachable,
+``buffer_ping`` returns False and callers write synchronously as before.
+
+``ingest_location_batch`` handles offline-buffered uploads: the whole trail
+goes to rider_location_history in one bulk insert and only the newest fix
+goes through the live path above.
+"""
+
+import json
+import logging
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LOCATION_BUFFER_KEY = "rider_gps:latest"
+LOCATION_FLUSHING_KEY = "rider_gps:flushing:{token}"
+# A flusher that dies mid-way leaves its snapshot behind; let Redis drop it.
+LOCATION_FLUSHING_TTL = 60 * 60
+
+
+def _redis():
+    if not getattr(settings, "RIDER_GPS_BUFFER_ENABLED", True):
+        return None
+    try:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+# HSET the fix only if the buffered one for the rider is older; both carry
+# their epoch time in "ts". Atomic, so a live ping arriving at the same
+# time as an offline batch is never overwritten by an older fix.
+_HSET_IF_NEWER = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if current then
+    local ok, decoded = pcall(cjson.decode, current)
+    if ok and tonumber(decoded['ts']) and tonumber(decoded['ts']) >= tonumber(ARGV[3]) then
+        return 0
+    end
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+
+
+def _ping(latitude, longitude, accuracy, heading, speed, at: Optional[datetime]) -> dict:
+    at = at or timezone.now()
+    return {
+        "lat": str(latitude),
+        "lng": str(longitude),
+        "accuracy": accuracy,
+        "heading": heading,
+        "speed": speed,
+        "at": at.isoformat(),
+        "ts": at.timestamp(),
+    }
+
+
+def buffer_ping(
+    rider_id,
+    latitude,
+    longitude,
+    accuracy: Optional[float] = None,
+    heading: Optional[float] = None,
+    speed: Optional[float] = None,
+    at: Optional[datetime] = None,
+) -> bool:
+    """Queue a GPS fix. Returns False if it must be written synchronously."""
+    r = _redis()
+    if r is None:
+        return False
+
+    ping = _ping(latitude, longitude, accuracy, heading, speed, at)
+    try:
+        r.hset(LOCATION_BUFFER_KEY, str(rider_id), json.dumps(ping))
+        return True
+    except Exception as exc:
+        logger.warning(f"GPS buffer unavailable, writing ping directly: {exc}")
+        return False
+
+
+def buffer_ping_if_newer(
+    rider_id,
+    latitude,
+    longitude,
+    accuracy: Optional[float] = None,
+    heading: Optional[float] = None,
+    speed: Optional[float] = None,
+    at: Optional[datetime] = None,
+) -> Optional[bool]:
+    """
+    Queue a fix unless the buffer already holds a newer one for the rider.
+    Returns True if queued, False if it was older, None if the buffer is
+    unavailable and the caller must write it (with write_locations).
+    """
+    r = _redis()
+    if r is None:
+        return None
+
+    ping = _ping(latitude, longitude, accuracy, heading, speed, at)
+    try:
+        stored = r.eval(
+            _HSET_IF_NEWER, 1, LOCATION_BUFFER_KEY, str(rider_id), json.dumps(ping), ping["ts"]
+        )
+        return bool(stored)
+    except Exception as exc:
+        logger.warning(f"GPS buffer unavailable, writing ping directly: {exc}")
+        return None
+
+
+def write_locations(pings: dict) -> int:
+    """
+    Persist ``{rider_id: ping}`` (ping as stored by buffer_ping) with bulk
+    statements. Every fix goes to history; it only becomes the rider's
+    current position if it is newer than the one stored. Returns the number
+    of riders whose position was updated.
+    """
+    from dispatcher.models import Rider
+    from .models import RiderLocation, RiderLocationHistory
+
+    if not pings:
+        return 0
+
+    parsed = {}
+    history = []
+    for rider_id, ping in pings.items():
+        lat, lng = Decimal(ping["lat"]), Decimal(ping["lng"])
+        at = datetime.fromisoformat(ping["at"])
+        parsed[rider_id] = (lat, lng, at, ping)
+
+    with transaction.atomic():
+        # Lock the riders and never move a position back in time: a late
+        # (offline or re-queued) fix only goes to history.
+        last_update = {
+            str(pk): last
+            for pk, last in Rider.objects.select_for_update()
+            .filter(id__in=list(pings))
+            .order_by("id")
+            .values_list("id", "last_location_update")
+        }
+
+        riders = []
+        locations = []
+        for rider_id, (lat, lng, at, ping) in parsed.items():
+            if rider_id not in last_update:
+                continue
+            history.append(
+                RiderLocationHistory(
+                    rider_id=rider_id,
+                    latitude=lat,
+                    longitude=lng,
+                    accuracy=ping.get("accuracy"),
+                    heading=ping.get("heading"),
+                    speed=ping.get("speed"),
+                    recorded_at=at,
+                )
+            )
+            last = last_update[rider_id]
+            if last is not None and last >= at:
+                continue
+            riders.append(
+                Rider(
+                    id=rider_id,
+                    current_latitude=lat,
+                    current_longitude=lng,
+                    last_location_update=at,
+                )
+            )
+            locations.append(
+                RiderLocation(
+                    rider_id=rider_id,
+                    latitude=lat,
+                    longitude=lng,
+                    accuracy=ping.get("accuracy"),
+                    heading=ping.get("heading"),
+                    speed=ping.get("speed"),
+                )
+            )
+
+        if riders:
+            Rider.objects.bulk_update(
+                riders,
+                ["current_latitude", "current_longitude", "last_location_update"],
+                batch_size=1000,
+            )
+            # updated_at is auto_now (write time); the fix time lives in
+            # Rider.last_location_update.
+            RiderLocation.objects.bulk_create(
+                locations,
+                update_conflicts=True,
+                unique_fields=["rider"],
+                update_fields=["latitude", "longitude", "accuracy", "heading", "speed", "updated_at"],
+                batch_size=1000,
+            )
+        if history:
+            RiderLocationHistory.objects.bulk_create(
+                history, ignore_conflicts=True, batch_size=1000
+            )
+    return len(riders)
+
+
+def flush_location_buffer() -> int:
+    """Write every buffered rider's latest fix. Returns riders written."""
+    r = _redis()
+    if r is None:
+        return 0
+
+    snapshot = LOCATION_FLUSHING_KEY.format(token=uuid.uuid4().hex)
+    try:
+        if not r.exists(LOCATION_BUFFER_KEY):
+            return 0
+        # RENAME is atomic: new pings start a fresh hash, and a concurrent
+        # flusher loses the race instead of double-writing.
+        r.rename(LOCATION_BUFFER_KEY, snapshot)
+        r.expire(snapshot, LOCATION_FLUSHING_TTL)
+        raw = r.hgetall(snapshot)
+    except Exception as exc:
+        logger.info(f"GPS buffer flush skipped: {exc}")
+        return 0
+
+    pings = {}
+    for rider_id, payload in raw.items():
+        if isinstance(rider_id, bytes):
+            rider_id = rider_id.decode()
+        try:
+            pings[rider_id] = json.loads(payload)
+        except (TypeError, ValueError):
+            continue
+
+    try:
+        written = write_locations(pings)
+    except Exception as exc:
+        logger.error(f"GPS buffer flush failed, re-queueing {len(raw)} fixes: {exc}")
+        # Put them back unless a newer ping for the rider has arrived since.
+        try:
+            for rider_id, payload in raw.items():
+                r.hsetnx(LOCATION_BUFFER_KEY, rider_id, payload)
+            r.delete(snapshot)
+        except Exception:
+            pass
+        return 0
+
+    try:
+        r.delete(snapshot)
+    except Exception:
+        pass
+    return written
+
+
+def ingest_location_batch(rider, points) -> dict:
+    """
+    Store a batch of validated fixes (dicts with latitude, longitude,
+    timestamp and optional accuracy/heading/speed) for ``rider``.
+
+    Points are deduplicated on timestamp (last one wins) and ordered. All of
+    them are bulk-inserted into the history table; repeats of points already
+    stored are ignored, so clients can safely retry. The newest point becomes
+    the rider's current position unless a more recent fix is already known,
+    either persisted or still waiting in the live buffer (checked atomically
+    by buffer_ping_if_newer / write_locations).
+    """
+    from .models import RiderLocationHistory
+
+    by_ts = {}
+    for p in points:
+        by_ts[p["timestamp"]] = p
+    ordered = [by_ts[ts] for ts in sorted(by_ts)]
+
+    RiderLocationHistory.objects.bulk_create(
+        [
+            RiderLocationHistory(
+                rider_id=rider.id,
+                latitude=p["latitude"],
+                longitude=p["longitude"],
+                accuracy=p.get("accuracy"),
+                heading=p.get("heading"),
+                speed=p.get("speed"),
+                recorded_at=p["timestamp"],
+            )
+            for p in ordered
+        ],
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+
+    newest = ordered[-1]
+    current = rider.last_location_update is None or newest["timestamp"] > rider.last_location_update
+    if current:
+        fields = dict(
+            accuracy=newest.get("accuracy"),
+            heading=newest.get("heading"),
+            speed=newest.get("speed"),
+            at=newest["timestamp"],
+        )
+        queued = buffer_ping_if_newer(rider.id, newest["latitude"], newest["longitude"], **fields)
+        if queued is None:
+            ping = _ping(newest["latitude"], newest["longitude"], **fields)
+            queued = bool(write_locations({str(rider.id): ping}))
+        current = queued
+
+    return {
+        "received": len(points),
+        # Unique points in the upload; repeats of stored points are skipped
+        "unique": len(ordered),
+        "duplicates": len(points) - len(ordered),
+        "current_updated": current,
+    }
@@ -0,0 +1,177 @@
+"""
+Rider location history upkeep.
+
+rider_location_history grows by one row per rider per flush, so it is kept
+in three tiers:
+
+- newer than RIDER_LOCATION_RAW_DAYS: every fix, untouched;
+- older than that: each rider's trail is split into trips (a gap longer than
+  RIDER_LOCATION_TRIP_GAP_MINUTES starts a new one) and thinned with
+  Douglas-Peucker at RIDER_LOCATION_SIMPLIFY_METERS. Survivors are flagged
+  ``simplified`` so each run only looks at new rows;
+- older than RIDER_LOCATION_RETENTION_DAYS: deleted.
+
+``maintain_location_history`` runs both passes (Celery beat, daily).
+"""
+
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371000.0
+DELETE_BATCH_SIZE = 5000
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _project(points: Sequence[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """Equirectangular projection to metres around the trail's first point."""
+    lat0, lng0 = points[0]
+    k = math.cos(math.radians(lat0))
+    return [
+        (
+            math.radians(lng - lng0) * k * EARTH_RADIUS_M,
+            math.radians(lat - lat0) * EARTH_RADIUS_M,
+        )
+        for lat, lng in points
+    ]
+
+
+def _offset_m(p, a, b) -> float:
+    """Distance in metres from p to segment a-b (projected points)."""
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    if dx == 0 and dy == 0:
+        return math.hypot(p[0] - a[0], p[1] - a[1])
+    t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(p[0] - a[0] - t * dx, p[1] - a[1] - t * dy)
+
+
+def douglas_peucker(points: Sequence[Tuple[float, float]], epsilon_m: float) -> List[int]:
+    """
+    Indices of the (lat, lng) points to keep so that no dropped point lies
+    more than ``epsilon_m`` metres off the simplified line. The first and
+    last points are always kept.
+    """
+    n = len(points)
+    if n <= 2:
+        return list(range(n))
+
+    xy = _project(points)
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        worst, worst_d = None, epsilon_m
+        for i in range(first + 1, last):
+            d = _offset_m(xy[i], xy[first], xy[last])
+            if d > worst_d:
+                worst, worst_d = i, d
+        if worst is not None:
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+    return [i for i, k in enumerate(keep) if k]
+
+
+def split_trips(times: Sequence[datetime], gap: timedelta) -> List[Tuple[int, int]]:
+    """[(start, end), ...] half-open index ranges of ``times`` split on gaps."""
+    if not times:
+        return []
+    trips = []
+    start = 0
+    for i in range(1, len(times)):
+        if times[i] - times[i - 1] > gap:
+            trips.append((start, i))
+            start = i
+    trips.append((start, len(times)))
+    return trips
+
+
+def _delete_ids(model, ids: List[int]) -> int:
+    deleted = 0
+    for i in range(0, len(ids), DELETE_BATCH_SIZE):
+        deleted += model.objects.filter(id__in=ids[i : i + DELETE_BATCH_SIZE]).delete()[0]
+    return deleted
+
+
+def simplify_history(
+    before: Optional[datetime] = None,
+    epsilon_m: Optional[float] = None,
+    trip_gap_minutes: Optional[float] = None,
+) -> Dict:
+    """Thin every unsimplified trail recorded before ``before``, one rider at a time."""
+    from .models import RiderLocationHistory
+
+    if before is None:
+        before = timezone.now() - timedelta(days=_setting("RIDER_LOCATION_RAW_DAYS", 7))
+    if epsilon_m is None:
+        epsilon_m = float(_setting("RIDER_LOCATION_SIMPLIFY_METERS", 15.0))
+    if trip_gap_minutes is None:
+        trip_gap_minutes = float(_setting("RIDER_LOCATION_TRIP_GAP_MINUTES", 10))
+    gap = timedelta(minutes=trip_gap_minutes)
+
+    pending = RiderLocationHistory.objects.filter(simplified=False, recorded_at__lt=before)
+    rider_ids = list(pending.order_by().values_list("rider_id", flat=True).distinct())
+
+    stats = {"riders": len(rider_ids), "scanned": 0, "kept": 0, "deleted": 0}
+    for rider_id in rider_ids:
+        rows = list(
+            pending.filter(rider_id=rider_id)
+            .order_by("recorded_at")
+            .values_list("id", "latitude", "longitude", "recorded_at")
+        )
+        keep_ids, drop_ids = [], []
+        for start, end in split_trips([r[3] for r in rows], gap):
+            trip = rows[start:end]
+            kept = set(douglas_peucker([(float(r[1]), float(r[2])) for r in trip], epsilon_m))
+            for i, r in enumerate(trip):
+                (keep_ids if i in kept else drop_ids).append(r[0])
+
+        with transaction.atomic():
+            stats["deleted"] += _delete_ids(RiderLocationHistory, drop_ids)
+            for i in range(0, len(keep_ids), DELETE_BATCH_SIZE):
+                RiderLocationHistory.objects.filter(
+                    id__in=keep_ids[i : i + DELETE_BATCH_SIZE]
+                ).update(simplified=True)
+        stats["scanned"] += len(rows)
+        stats["kept"] += len(keep_ids)
+    return stats
+
+
+def purge_history(before: Optional[datetime] = None) -> int:
+    """Delete history older than the retention window, in bounded batches."""
+    from .models import RiderLocationHistory
+
+    if before is None:
+        before = timezone.now() - timedelta(
+            days=_setting("RIDER_LOCATION_RETENTION_DAYS", 180)
+        )
+
+    deleted = 0
+    old = RiderLocationHistory.objects.filter(recorded_at__lt=before).order_by()
+    while True:
+        ids = list(old.values_list("id", flat=True)[:DELETE_BATCH_SIZE])
+        if not ids:
+            return deleted
+        deleted += _delete_ids(RiderLocationHistory, ids)
+
+
+def maintain_location_history() -> Dict:
+    purged = purge_history()
+    stats = simplify_history()
+    stats["purged"] = purged
+    logger.info(
+        f"location history: purged {purged}, simplified {stats['scanned']} points "
+        f"for {stats['riders']} riders ({stats['deleted']} dropped)"
+    )
+    return stats
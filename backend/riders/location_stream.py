@@ -0,0 +1,189 @@
+"""
+Batched consumer for the Ably location-update stream.
+
+Messages are coalesced per rider, keeping only the newest fix; anything
+older than what was already written for that rider is dropped as stale.
+On each flush the pending fixes are resolved to Rider primary keys (one
+query for riders not seen before) and written with
+riders.location_buffer.write_locations, i.e. a handful of bulk statements
+per flush however many messages arrived.
+
+Used by ``subscribe_location_update --batch``.
+"""
+
+import math
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+def _parse_message_time(data: Dict, message_timestamp_ms: Optional[int]) -> datetime:
+    ts = data.get("timestamp")
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        return datetime.fromtimestamp(ts / 1000, tz=dt_timezone.utc)
+    if isinstance(ts, str):
+        parsed = parse_datetime(ts)
+        if parsed is not None:
+            return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+    if message_timestamp_ms:
+        return datetime.fromtimestamp(message_timestamp_ms / 1000, tz=dt_timezone.utc)
+    return timezone.now()
+
+
+def _message_time(data: Dict, message_timestamp_ms: Optional[int]) -> datetime:
+    """
+    Device time if the payload has one, else Ably's receive time, else now.
+    Raises ValueError, OverflowError or OSError for an out-of-range timestamp,
+    including one more than RIDER_GPS_MAX_FUTURE_SKEW_SECONDS ahead of now
+    (it would make every later fix for the rider look stale).
+    """
+    at = _parse_message_time(data, message_timestamp_ms)
+    skew = float(getattr(settings, "RIDER_GPS_MAX_FUTURE_SKEW_SECONDS", 120))
+    if at > timezone.now() + timedelta(seconds=skew):
+        raise ValueError(f"timestamp {at.isoformat()} is in the future")
+    return at
+
+
+def _optional_float(value) -> Optional[float]:
+    """Numeric extras (accuracy, heading, speed); anything unusable is dropped."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+class LocationStreamBatcher:
+    """Coalesces location-update payloads per rider between flushes."""
+
+    def __init__(self):
+        self.pending: Dict[str, Dict] = {}
+        # rider code (Rider.rider_id) -> Rider pk, and last written fix time
+        self._rider_pks: Dict[str, str] = {}
+        self._last_written: Dict[str, datetime] = {}
+        self.stats = {
+            "received": 0,
+            "invalid": 0,
+            "stale": 0,
+            "unknown_rider": 0,
+            "written": 0,
+            "requeued": 0,
+            "flushes": 0,
+            "max_lag_seconds": 0.0,
+        }
+
+    def add(
+        self,
+        data,
+        message_timestamp_ms: Optional[int] = None,
+        received_at: Optional[float] = None,
+    ) -> bool:
+        """
+        Queue one payload. ``received_at`` (time.time()) is when the message
+        came off the wire, for lag reporting. Returns False if it was
+        invalid or stale.
+        """
+        self.stats["received"] += 1
+        if not isinstance(data, dict):
+            self.stats["invalid"] += 1
+            return False
+        code = data.get("rider_id")
+        lat, lng = data.get("latitude"), data.get("longitude")
+        if not code or lat in (None, "") or lng in (None, ""):
+            self.stats["invalid"] += 1
+            return False
+
+        try:
+            lat, lng = float(lat), float(lng)
+            at = _message_time(data, message_timestamp_ms)
+        except (TypeError, ValueError, OverflowError, OSError):
+            self.stats["invalid"] += 1
+            return False
+        if not (math.isfinite(lat) and math.isfinite(lng)):
+            self.stats["invalid"] += 1
+            return False
+
+        newest = self.pending.get(code)
+        last = self._last_written.get(code)
+        if (newest is not None and newest["_at"] >= at) or (last is not None and last >= at):
+            self.stats["stale"] += 1
+            return False
+
+        self.pending[code] = {
+            "lat": str(lat),
+            "lng": str(lng),
+            "accuracy": _optional_float(data.get("accuracy")),
+            "heading": _optional_float(data.get("heading")),
+            "speed": _optional_float(data.get("speed")),
+            "at": at.isoformat(),
+            "_at": at,
+            "_received": received_at or time.time(),
+        }
+        return True
+
+    def _resolve(self, codes) -> None:
+        from dispatcher.models import Rider
+
+        missing = [c for c in codes if c not in self._rider_pks]
+        if missing:
+            for code, pk in Rider.objects.filter(rider_id__in=missing).values_list(
+                "rider_id", "id"
+            ):
+                self._rider_pks[code] = str(pk)
+
+    def take_pending(self) -> Dict[str, Dict]:
+        """Hand over the coalesced fixes and start a new batch."""
+        batch, self.pending = self.pending, {}
+        return batch
+
+    def requeue(self, batch: Dict[str, Dict]) -> None:
+        """Put back a batch whose write failed, unless a newer fix has arrived since."""
+        for code, ping in batch.items():
+            newest = self.pending.get(code)
+            if newest is None or newest["_at"] < ping["_at"]:
+                self.pending[code] = ping
+                self.stats["requeued"] += 1
+
+    def write(self, batch: Dict[str, Dict]) -> int:
+        """Write a batch from take_pending (sync; run on one DB thread). Returns rows written."""
+        from .location_buffer import write_locations
+
+        if not batch:
+            return 0
+        self._resolve(batch.keys())
+
+        pings = {}
+        oldest_received = None
+        for code, ping in batch.items():
+            pk = self._rider_pks.get(code)
+            if pk is None:
+                self.stats["unknown_rider"] += 1
+                continue
+            pings[pk] = {k: v for k, v in ping.items() if not k.startswith("_")}
+            if oldest_received is None or ping["_received"] < oldest_received:
+                oldest_received = ping["_received"]
+
+        written = write_locations(pings)
+        # Only fixes that reached the database make later ones stale
+        for code, ping in batch.items():
+            last = self._last_written.get(code)
+            if code in self._rider_pks and (last is None or ping["_at"] > last):
+                self._last_written[code] = ping["_at"]
+        self.stats["written"] += written
+        self.stats["flushes"] += 1
+        if oldest_received is not None:
+            self.stats["max_lag_seconds"] = max(
+                self.stats["max_lag_seconds"], time.time() - oldest_received
+            )
+        return written
+
+    def take_stats(self) -> Dict:
+        """Counters since the last call, then reset them."""
+        stats = dict(self.stats, pending=len(self.pending))
+        for key in self.stats:
+            self.stats[key] = 0.0 if key == "max_lag_seconds" else 0
+        return stats
@@ -74,15 +74,7 @@ class Command(BaseCommand):
             f"Populating {count} orders for {user.get_full_name()} ({rider.rider_id})..."
         )
 
-        # Get the starting order number to avoid conflicts
-        last_order = Order.objects.order_by("-order_number").first()
-        try:
-            current_num = int(last_order.order_number) if last_order else 6158000
-        except ValueError:
-            current_num = 6158000 + Order.objects.count()
-
         for i in range(count):
-            current_num += 1
             pickup_area, dropoff_area = random.choice(locations)
 
             # Random time today between 8 AM and now
@@ -101,7 +93,6 @@ class Command(BaseCommand):
             cod = Decimal(str(random.choice([0, 0, 5000, 8000, 15000, 20000])))
 
             order = Order.objects.create(
-                order_number=str(current_num),
                 user=merchant,
                 rider=rider,
                 vehicle=vehicle,
@@ -1,6 +1,8 @@
 import asyncio
 import json
+import logging
 import signal as _signal
+import time
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
@@ -8,6 +10,8 @@ from asgiref.sync import sync_to_async
 from riders.models import RiderLocation
 from dispatcher.models import Rider
 
+logger = logging.getLogger(__name__)
+
 
 class Command(BaseCommand):
     help = (
@@ -34,6 +38,32 @@ class Command(BaseCommand):
             default=0,
             help="Stop automatically after N seconds (0 = run forever until Ctrl+C)",
         )
+        parser.add_argument(
+            "--batch",
+            action="store_true",
+            help=(
+                "Production mode: queue messages, keep the newest fix per rider and "
+                "write them in bulk every --flush-interval seconds"
+            ),
+        )
+        parser.add_argument(
+            "--flush-interval",
+            type=float,
+            default=1.0,
+            help="Seconds between bulk writes in --batch mode (default: 1.0)",
+        )
+        parser.add_argument(
+            "--queue-size",
+            type=int,
+            default=50000,
+            help="Max queued messages in --batch mode; excess is dropped (default: 50000)",
+        )
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=30.0,
+            help="Seconds between throughput/lag reports in --batch mode (default: 30)",
+        )
 
     def handle(self, *args, **options):
         channel_name = options["channel"]
@@ -57,6 +87,20 @@ class Command(BaseCommand):
         self.stdout.write("Press Ctrl+C to stop.\n")
         self.stdout.flush()
 
+        if options["batch"]:
+            asyncio.run(
+                self._listen_batched(
+                    api_key,
+                    channel_name,
+                    event_name,
+                    timeout,
+                    options["flush_interval"],
+                    options["queue_size"],
+                    options["stats_interval"],
+                )
+            )
+            return
+
         asyncio.run(self._listen(api_key, channel_name, event_name, timeout))
 
     async def _listen(self, api_key, channel_name, event_name, timeout):
@@ -117,31 +161,143 @@ class Command(BaseCommand):
             self.stdout.flush()
 
             try:
-                if timeout:
-                    await asyncio.sleep(timeout)
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f"\nTimeout reached ({timeout}s). Received {received_count} message(s)."
-                        )
+                reason = await self._wait_for_stop(timeout)
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"\n{reason}. Received {received_count} message(s)."
                     )
-                else:
-                    stop_event = asyncio.Event()
+                )
+            except asyncio.CancelledError:
+                pass
 
-                    def _handle_sigint():
-                        stop_event.set()
+    async def _wait_for_stop(self, timeout):
+        """Sleep for ``timeout`` seconds, or until SIGINT/SIGTERM if 0."""
+        if timeout:
+            await asyncio.sleep(timeout)
+            return f"Timeout reached ({timeout}s)"
 
-                    loop = asyncio.get_running_loop()
-                    loop.add_signal_handler(_signal.SIGINT, _handle_sigint)
-                    loop.add_signal_handler(_signal.SIGTERM, _handle_sigint)
+        stop_event = asyncio.Event()
 
-                    await stop_event.wait()
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f"\nStopped by user. Received {received_count} message(s)."
-                        )
-                    )
+        def _handle_sigint():
+            stop_event.set()
+
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(_signal.SIGINT, _handle_sigint)
+        loop.add_signal_handler(_signal.SIGTERM, _handle_sigint)
+
+        await stop_event.wait()
+        return "Stopped by user"
+
+    async def _listen_batched(
+        self,
+        api_key,
+        channel_name,
+        event_name,
+        timeout,
+        flush_interval,
+        queue_size,
+        stats_interval,
+    ):
+        """
+        Queue messages from Ably, coalesce per rider and write in bulk on a
+        timer. All writes go through one sync thread (one DB connection).
+        """
+        from ably import AblyRealtime
+        from riders.location_stream import LocationStreamBatcher
+
+        queue = asyncio.Queue(maxsize=queue_size)
+        batcher = LocationStreamBatcher()
+        write = sync_to_async(batcher.write, thread_sensitive=True)
+        overflow = 0
+
+        async def on_message(message):
+            nonlocal overflow
+            try:
+                queue.put_nowait((message.data, message.timestamp, time.time()))
+            except asyncio.QueueFull:
+                overflow += 1
+
+        def drain():
+            while True:
+                try:
+                    data, message_ts, received_at = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    if isinstance(data, str):
+                        try:
+                            data = json.loads(data)
+                        except ValueError:
+                            data = None
+                    batcher.add(data, message_ts, received_at)
+                except Exception as exc:
+                    # One malformed message must never stop the flusher
+                    batcher.stats["invalid"] += 1
+                    logger.warning(f"subscribe_location_update: dropped message: {exc}")
+
+        async def flush_once():
+            drain()
+            batch = batcher.take_pending()
+            if not batch:
+                return
+            try:
+                await write(batch)
+            except Exception as exc:
+                logger.error(f"subscribe_location_update: batch write failed, re-queued: {exc}")
+                batcher.requeue(batch)
+
+        async def flush_loop():
+            while True:
+                await asyncio.sleep(flush_interval)
+                await flush_once()
+
+        async def stats_loop():
+            nonlocal overflow
+            last = time.monotonic()
+            while True:
+                await asyncio.sleep(stats_interval)
+                now = time.monotonic()
+                stats = batcher.take_stats()
+                stats["overflow"], overflow = overflow, 0
+                stats["queued"] = queue.qsize()
+                rate = stats["received"] / max(now - last, 1e-9)
+                last = now
+                line = (
+                    f"{rate:.0f} msg/s, received {stats['received']}, written {stats['written']} "
+                    f"in {stats['flushes']} flushes, stale {stats['stale']}, invalid {stats['invalid']}, "
+                    f"unknown rider {stats['unknown_rider']}, requeued {stats['requeued']}, "
+                    f"dropped {stats['overflow']}, queued {stats['queued']}, max lag {stats['max_lag_seconds']:.2f}s"
+                )
+                logger.info(f"subscribe_location_update: {line}")
+                self.stdout.write(line)
+                self.stdout.flush()
+
+        async with AblyRealtime(api_key) as client:
+            channel = client.channels.get(channel_name)
+            if event_name == "*":
+                await channel.subscribe(on_message)
+            else:
+                await channel.subscribe(event_name, on_message)
+
+            self.stdout.write(
+                f"Connected. Writing batches every {flush_interval}s …\n"
+            )
+            self.stdout.flush()
+
+            workers = [
+                asyncio.create_task(flush_loop()),
+                asyncio.create_task(stats_loop()),
+            ]
+            try:
+                reason = await self._wait_for_stop(timeout)
+                self.stdout.write(self.style.WARNING(f"\n{reason}. Flushing …"))
             except asyncio.CancelledError:
                 pass
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                await flush_once()
 
     def _update_rider_location(self, rider_id, latitude, longitude):
         try:
@@ -1,6 +1,7 @@
 import uuid
 from django.db import models
 from django.contrib.auth.hashers import make_password, check_password
+from django.contrib.postgres.indexes import BrinIndex
 from django.utils import timezone
 
 
@@ -326,6 +327,67 @@ class RiderNotification(models.Model):
         return f"Notification for {self.rider.rider_id}: {self.title}"
 
 
+class NotificationOutbox(models.Model):
+    """
+    Rider pushes waiting to be sent. Request handlers only insert rows here;
+    the drain_notification_outbox Celery task sends them (see riders.outbox).
+    """
+
+    class Kind(models.TextChoices):
+        RIDER = "rider", "Single rider"
+        NEW_ORDER = "new_order", "New order fan-out"
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=20, choices=Kind.choices, default=Kind.RIDER)
+    rider = models.ForeignKey(
+        "dispatcher.Rider",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="outbox_notifications",
+    )
+    order = models.ForeignKey(
+        "orders.Order",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="outbox_notifications",
+        help_text="Order to fan out for new_order rows",
+    )
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending", db_index=True
+    )
+    retry_count = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_attempt_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(null=True, blank=True)
+    fanout_progress = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="new_order rows: rider id -> 'notified' (in-app only) or 'sent'",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = "rider_notification_outbox"
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} - {self.title} - {self.status}"
+
+
 class RiderLocation(models.Model):
     """
     Live GPS location for a rider.
@@ -356,6 +418,56 @@ class RiderLocation(models.Model):
         )
 
 
+class RiderLocationHistory(models.Model):
+    """
+    Append-only GPS trail for a rider, one row per distinct (rider, recorded_at).
+    Written in bulk by the batch upload endpoint and by every live location
+    write. Rows arrive roughly in time order; offline batches backfill older
+    fixes, which widens the ranges of the blocks they land in without
+    breaking the BRIN index on recorded_at. That index serves range scans and
+    retention deletes at a fraction of a B-tree's size.
+    Old trails are thinned and purged by riders.location_history.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    rider = models.ForeignKey(
+        "dispatcher.Rider", on_delete=models.CASCADE, related_name="location_history"
+    )
+    latitude = models.DecimalField(max_digits=10, decimal_places=7)
+    longitude = models.DecimalField(max_digits=10, decimal_places=7)
+    accuracy = models.FloatField(
+        null=True, blank=True, help_text="GPS accuracy in metres"
+    )
+    heading = models.FloatField(
+        null=True, blank=True, help_text="Bearing in degrees (0-360)"
+    )
+    speed = models.FloatField(null=True, blank=True, help_text="Speed in m/s")
+    recorded_at = models.DateTimeField(help_text="Device time of the fix")
+    simplified = models.BooleanField(
+        default=False, help_text="Survived downsampling of its trip"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "rider_location_history"
+        ordering = ["rider", "recorded_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["rider", "recorded_at"], name="uniq_rider_location_point"
+            ),
+        ]
+        indexes = [
+            BrinIndex(
+                fields=["recorded_at"],
+                name="rider_loc_hist_brin",
+                autosummarize=True,
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.rider_id} @ {self.recorded_at}: ({self.latitude}, {self.longitude})"
+
+
 # ---------------------------------------------------------------------------
 # Gamification Models
 # ---------------------------------------------------------------------------
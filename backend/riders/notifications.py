@@ -1,10 +1,24 @@
-from firebase_admin import messaging
-from .models import RiderDevice, RiderNotification
+import json
 import logging
+from collections import defaultdict, namedtuple
+
 import firebase_admin
+from firebase_admin import messaging
+
+from .models import RiderDevice, RiderNotification
 
 logger = logging.getLogger(__name__)
 
+FCM_MULTICAST_LIMIT = 500
+
+# FCM errors meaning the token will never work again.
+PRUNABLE_FCM_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+
+# ``persist``: also write the rider's in-app notification (off for re-sends).
+RiderPush = namedtuple(
+    "RiderPush", ["rider", "title", "body", "data", "persist"], defaults=(True,)
+)
+
 
 def send_push(token, title, body, data=None):
     """
@@ -32,25 +46,152 @@ def send_push(token, title, body, data=None):
         return None
 
 
-def notify_rider(rider, title, body, data=None):
+def _fcm_data(data):
+    # FCM data payloads only carry strings.
+    return {str(k): v if isinstance(v, str) else json.dumps(v) for k, v in (data or {}).items()}
+
+
+def send_multicast(tokens, title, body, data=None, client=None, raise_errors=False):
     """
-    Send a push notification to all active devices of a rider and persist it.
+    Send the same notification to many FCM tokens, FCM_MULTICAST_LIMIT per
+    request. ``client`` defaults to firebase_admin.messaging; anything with
+    a compatible ``send_each_for_multicast`` can stand in for it. With
+    ``raise_errors`` a failed request raises instead of being logged.
+
+    Returns (sent, failed, dead_tokens) where dead_tokens are the tokens FCM
+    reported as unregistered.
     """
-    # 1. Persist the notification
-    RiderNotification.objects.create(
-        rider=rider, title=title, body=body, data=data or {}
-    )
+    if client is None:
+        if not firebase_admin._apps:
+            logger.warning("Firebase not initialized. Push notification skipped.")
+            return 0, 0, []
+        client = messaging
 
-    # 2. Get all active FCM tokens for the rider
-    devices = RiderDevice.objects.filter(rider=rider, is_active=True).exclude(
-        fcm_token=""
-    )
-    tokens = devices.values_list("fcm_token", flat=True)
+    sent = failed = 0
+    dead = []
+    tokens = list(tokens)
+    for i in range(0, len(tokens), FCM_MULTICAST_LIMIT):
+        chunk = tokens[i : i + FCM_MULTICAST_LIMIT]
+        message = messaging.MulticastMessage(
+            notification=messaging.Notification(title=title, body=body),
+            tokens=chunk,
+            data=_fcm_data(data),
+        )
+        try:
+            response = client.send_each_for_multicast(message)
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.error(f"Error sending Firebase multicast: {e}")
+            failed += len(chunk)
+            continue
+        sent += response.success_count
+        failed += response.failure_count
+        for token, result in zip(chunk, response.responses):
+            if not result.success and isinstance(result.exception, PRUNABLE_FCM_ERRORS):
+                dead.append(token)
+    return sent, failed, dead
+
+
+def send_notifications(items, client=None, persist=True, raise_errors=False, collect_errors=False):
+    """
+    Persist and push many RiderPush(rider, title, body, data) items.
 
-    if not tokens:
-        logger.info(f"No active FCM tokens found for rider {rider.rider_id}")
-        return
+    All notification rows go in with one bulk insert (skipped when
+    ``persist`` is False, e.g. on a retry, and for items whose own
+    ``persist`` is False) and tokens are read in one query. Items with the
+    same title/body/data share FCM multicast requests of up to
+    FCM_MULTICAST_LIMIT tokens. Tokens FCM reports as unregistered have
+    their RiderDevice deactivated.
 
-    # 3. Send to each token
-    for token in tokens:
-        send_push(token, title, body, data)
+    With ``collect_errors`` a failed request does not stop the others: the
+    indexes of the items it carried are returned in ``errors``
+    ({index: exception}) so the caller can retry just those.
+
+    Returns {"notifications", "sent", "failed", "pruned"} (plus "errors").
+    """
+    items = [RiderPush(*item) for item in items]
+    stats = {"notifications": len(items), "sent": 0, "failed": 0, "pruned": 0}
+    errors = {}
+    if collect_errors:
+        stats["errors"] = errors
+    if not items:
+        return stats
+
+    if persist:
+        RiderNotification.objects.bulk_create(
+            [
+                RiderNotification(rider=item.rider, title=item.title, body=item.body, data=item.data or {})
+                for item in items
+                if item.persist
+            ]
+        )
+
+    tokens_by_rider = defaultdict(list)
+    for rider_id, token in (
+        RiderDevice.objects.filter(rider__in={item.rider.pk for item in items}, is_active=True)
+        .exclude(fcm_token="")
+        .values_list("rider_id", "fcm_token")
+    ):
+        tokens_by_rider[rider_id].append(token)
+
+    # One multicast group per distinct payload; a device gets each payload once.
+    groups = {}
+    for index, item in enumerate(items):
+        tokens = tokens_by_rider.get(item.rider.pk)
+        if not tokens:
+            continue
+        key = (item.title, item.body, json.dumps(item.data or {}, sort_keys=True, default=str))
+        token_items = groups.setdefault(key, (item.data, {}))[1]
+        for token in tokens:
+            token_items.setdefault(token, []).append(index)
+
+    if not groups:
+        logger.info(f"No active FCM tokens found for {len(items)} notifications")
+        return stats
+
+    dead = []
+    for (title, body, _), (data, token_items) in groups.items():
+        tokens = list(token_items)
+        for start in range(0, len(tokens), FCM_MULTICAST_LIMIT):
+            chunk = tokens[start : start + FCM_MULTICAST_LIMIT]
+            try:
+                sent, failed, chunk_dead = send_multicast(
+                    chunk, title, body, data, client=client,
+                    raise_errors=raise_errors or collect_errors,
+                )
+            except Exception as exc:
+                if not collect_errors:
+                    raise
+                logger.warning(f"Error sending Firebase multicast: {exc}")
+                stats["failed"] += len(chunk)
+                for token in chunk:
+                    for index in token_items[token]:
+                        errors.setdefault(index, exc)
+                continue
+            stats["sent"] += sent
+            stats["failed"] += failed
+            dead.extend(chunk_dead)
+
+    if dead:
+        stats["pruned"] = RiderDevice.objects.filter(fcm_token__in=dead, is_active=True).update(
+            is_active=False
+        )
+        logger.info(f"Deactivated {stats['pruned']} devices with unregistered FCM tokens")
+    return stats
+
+
+def notify_riders(riders, title, body, data=None, client=None):
+    """
+    Send one notification to many riders. Returns the number of riders notified.
+    """
+    riders = list(riders)
+    send_notifications([RiderPush(rider, title, body, data) for rider in riders], client=client)
+    return len(riders)
+
+
+def notify_rider(rider, title, body, data=None, client=None):
+    """
+    Send a push notification to all active devices of a rider and persist it.
+    """
+    return send_notifications([RiderPush(rider, title, body, data)], client=client)
@@ -0,0 +1,285 @@
+"""
+Durable rider notification outbox.
+
+Request handlers call ``queue_rider_notification`` / ``queue_new_order_fanout``,
+which insert a NotificationOutbox row and nothing else. The
+drain_notification_outbox task (Celery beat, every
+NOTIFICATION_OUTBOX_DRAIN_SECONDS) sends due rows:
+
+- one drainer at a time, via a cache lock;
+- new-order rows due together are expanded to their nearest riders
+  (dispatcher.fanout) and coalesced per rider, so a rider near three new
+  orders gets one "3 new orders" push rather than three. Each row records
+  the riders it has reached, so a retry only goes to the ones it missed;
+- a global limit of NOTIFICATION_MAX_PER_MINUTE pushes, counted in a shared
+  cache window; rows past the limit wait for the next drain;
+- a push that fails is retried, for the rows it carried only, with
+  exponential backoff (NOTIFICATION_RETRY_BASE_SECONDS, doubling, capped)
+  up to NOTIFICATION_MAX_ATTEMPTS, then marked failed.
+
+The rider's in-app notification row is written on the first attempt only,
+so retries do not duplicate it.
+"""
+
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_LOCK_KEY = "notification_outbox:drain_lock"
+OUTBOX_LOCK_TTL = 120
+OUTBOX_RATE_KEY = "notification_outbox:sent:{window}"
+MAX_RETRY_DELAY_SECONDS = 15 * 60
+
+# NotificationOutbox.fanout_progress values, per rider
+FANOUT_NOTIFIED = "notified"  # in-app notification written, push not delivered
+FANOUT_SENT = "sent"
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def queue_rider_notification(rider, title, body, data=None):
+    """Queue a push (and in-app notification) for one rider."""
+    from .models import NotificationOutbox
+
+    return NotificationOutbox.objects.create(
+        kind=NotificationOutbox.Kind.RIDER,
+        rider=rider,
+        title=title,
+        body=body,
+        data=data or {},
+    )
+
+
+def queue_new_order_fanout(order, title, body, data=None):
+    """Queue a new-order offer to the riders nearest the pickup."""
+    from .models import NotificationOutbox
+
+    return NotificationOutbox.objects.create(
+        kind=NotificationOutbox.Kind.NEW_ORDER,
+        order=order,
+        title=title,
+        body=body,
+        data=data or {},
+    )
+
+
+def _retry_delay(retry_count: int) -> float:
+    base = float(_setting("NOTIFICATION_RETRY_BASE_SECONDS", 15))
+    return min(base * (2 ** max(retry_count - 1, 0)), MAX_RETRY_DELAY_SECONDS)
+
+
+def _take_rate_budget(n: int) -> bool:
+    """
+    Reserve n pushes in the current one-minute window, shared by every
+    worker through the cache. A unit bigger than the whole limit may still
+    go out if it is first in its window, so it cannot be starved forever.
+    """
+    limit = int(_setting("NOTIFICATION_MAX_PER_MINUTE", 6000))
+    key = OUTBOX_RATE_KEY.format(window=int(time.time() // 60))
+    try:
+        cache.add(key, 0, 120)
+        used = cache.incr(key, n)
+        if used > limit and used > n:
+            cache.decr(key, n)
+            return False
+    except Exception:
+        # Limiter unavailable: fail open rather than stall notifications.
+        pass
+    return True
+
+
+def _fanout_units(rows) -> List[Dict]:
+    """
+    One unit per rider: the due new-order rows offered to that rider,
+    coalesced into one push. Riders a row already reached on an earlier
+    attempt (``fanout_progress``) are skipped, and the in-app notification
+    is only written if the rider has not had one for some row in the unit.
+    Orders that were taken or cancelled before the drain reached them offer
+    nothing.
+    """
+    from dispatcher.fanout import select_fanout_riders
+    from .notifications import RiderPush
+
+    offers = OrderedDict()  # rider pk -> (rider, [rows])
+    for row in rows:
+        if row.order.status != "Pending":
+            continue
+        for rider in select_fanout_riders(row.order):
+            if row.fanout_progress.get(str(rider.pk)) == FANOUT_SENT:
+                continue
+            offers.setdefault(rider.pk, (rider, []))[1].append(row)
+
+    units = []
+    for rider, rider_rows in offers.values():
+        key = str(rider.pk)
+        persist = any(key not in r.fanout_progress for r in rider_rows)
+        newest = rider_rows[-1]
+        if len(rider_rows) == 1:
+            push = RiderPush(rider, newest.title, newest.body, newest.data, persist)
+        else:
+            order_numbers = [r.order.order_number for r in rider_rows]
+            push = RiderPush(
+                rider,
+                f"{len(rider_rows)} New Orders Available",
+                newest.body,
+                {
+                    **newest.data,
+                    "order_numbers": ",".join(order_numbers),
+                    "coalesced": str(len(rider_rows)),
+                },
+                persist,
+            )
+        units.append({"rows": rider_rows, "item": push, "rider": key})
+    return units
+
+
+def _rider_units(rows) -> List[Dict]:
+    from .notifications import RiderPush
+
+    return [
+        {
+            "rows": [row],
+            "item": RiderPush(row.rider, row.title, row.body, row.data, row.retry_count == 0),
+            "rider": None,
+        }
+        for row in rows
+    ]
+
+
+def _mark_failed_attempt(rows, exc, now) -> None:
+    from .models import NotificationOutbox
+
+    max_attempts = int(_setting("NOTIFICATION_MAX_ATTEMPTS", 5))
+    for row in rows:
+        row.retry_count += 1
+        row.last_attempt_at = now
+        row.error_message = str(exc)
+        if row.retry_count >= max_attempts:
+            row.status = "failed"
+        else:
+            row.next_attempt_at = now + timedelta(seconds=_retry_delay(row.retry_count))
+    NotificationOutbox.objects.bulk_update(
+        rows, ["retry_count", "last_attempt_at", "error_message", "status", "next_attempt_at"]
+    )
+
+
+def drain_outbox(limit: Optional[int] = None, client=None) -> Dict:
+    """Send due outbox rows. Returns counters for logging."""
+    from .models import NotificationOutbox
+    from .notifications import send_notifications
+
+    stats = {"rows": 0, "sent": 0, "retried": 0, "failed": 0, "deferred": 0, "pushes": 0}
+    token = uuid.uuid4().hex
+    try:
+        if not cache.add(OUTBOX_LOCK_KEY, token, OUTBOX_LOCK_TTL):
+            return stats
+    except Exception as exc:
+        logger.warning(f"notification outbox: lock unavailable, draining anyway: {exc}")
+
+    try:
+        if limit is None:
+            limit = int(_setting("NOTIFICATION_OUTBOX_BATCH", 500))
+        now = timezone.now()
+        due = list(
+            NotificationOutbox.objects.filter(status="pending", next_attempt_at__lte=now)
+            .select_related("rider", "order", "order__vehicle")
+            .order_by("created_at")[:limit]
+        )
+        stats["rows"] = len(due)
+
+        fanout_rows = [r for r in due if r.kind == NotificationOutbox.Kind.NEW_ORDER]
+        try:
+            units = _fanout_units(fanout_rows)
+        except Exception as exc:
+            logger.warning(f"notification outbox: fan-out selection failed: {exc}")
+            _mark_failed_attempt(fanout_rows, exc, now)
+            fanout_rows, units = [], []
+        rider_rows = [r for r in due if r.kind == NotificationOutbox.Kind.RIDER]
+        units += _rider_units(rider_rows)
+
+        # Row id -> "deferred" or the exception that stopped one of its pushes.
+        # Rows with no entry were fully delivered (or had no one to offer).
+        outcome = {}
+        ready = []
+        for unit in units:
+            if _take_rate_budget(1):
+                ready.append(unit)
+            else:
+                for row in unit["rows"]:
+                    outcome.setdefault(row.id, "deferred")
+
+        if ready:
+            try:
+                result = send_notifications(
+                    [unit["item"] for unit in ready], client=client, collect_errors=True
+                )
+                errors = result["errors"]
+                stats["pushes"] += result["sent"]
+                notified = True
+            except Exception as exc:
+                errors = dict.fromkeys(range(len(ready)), exc)
+                notified = False  # nothing is known to have been written
+            for index, unit in enumerate(ready):
+                exc = errors.get(index)
+                if exc is not None:
+                    for row in unit["rows"]:
+                        outcome[row.id] = exc
+                state = FANOUT_SENT if exc is None else FANOUT_NOTIFIED
+                if unit["rider"] and (exc is None or (notified and unit["item"].persist)):
+                    for row in unit["rows"]:
+                        row.fanout_progress[unit["rider"]] = state
+
+        now = timezone.now()
+        if fanout_rows:
+            NotificationOutbox.objects.bulk_update(fanout_rows, ["fanout_progress"])
+
+        by_error = OrderedDict()
+        for row in fanout_rows + rider_rows:
+            result = outcome.get(row.id)
+            if result == "deferred":
+                stats["deferred"] += 1
+            elif result is not None:
+                by_error.setdefault(id(result), (result, []))[1].append(row)
+        for exc, rows in by_error.values():
+            logger.warning(f"notification outbox: send failed for {len(rows)} rows: {exc}")
+            _mark_failed_attempt(rows, exc, now)
+            failed = sum(r.status == "failed" for r in rows)
+            stats["failed"] += failed
+            stats["retried"] += len(rows) - failed
+
+        sent_ids = [r.id for r in fanout_rows + rider_rows if r.id not in outcome]
+        if sent_ids:
+            NotificationOutbox.objects.filter(id__in=sent_ids).update(
+                status="sent", last_attempt_at=now
+            )
+        stats["sent"] += len(sent_ids)
+        return stats
+    finally:
+        try:
+            if cache.get(OUTBOX_LOCK_KEY) == token:
+                cache.delete(OUTBOX_LOCK_KEY)
+        except Exception:
+            pass
+
+
+def purge_outbox(days: Optional[int] = None) -> int:
+    """Delete finished outbox rows older than ``days``."""
+    from .models import NotificationOutbox
+
+    if days is None:
+        days = int(_setting("NOTIFICATION_OUTBOX_RETENTION_DAYS", 7))
+    cutoff = timezone.now() - timedelta(days=days)
+    return NotificationOutbox.objects.filter(
+        status__in=["sent", "failed"], created_at__lt=cutoff
+    ).delete()[0]
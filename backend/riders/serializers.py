@@ -1,5 +1,8 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.conf import settings
 from django.utils import timezone
 from django.db.models import Sum
 from dispatcher.models import Rider
@@ -506,6 +509,69 @@ class RiderLocationSerializer(serializers.Serializer):
     speed = serializers.FloatField(required=False, allow_null=True)
 
 
+class RiderLocationPointSerializer(RiderLocationSerializer):
+    """One timestamped fix in a batch upload."""
+
+    timestamp = serializers.DateTimeField()
+
+    def validate_timestamp(self, value):
+        # A fast device clock would otherwise pin the rider's current
+        # position in the future and make every later fix look stale.
+        skew = float(getattr(settings, "RIDER_GPS_MAX_FUTURE_SKEW_SECONDS", 120))
+        if value > timezone.now() + timedelta(seconds=skew):
+            raise serializers.ValidationError("Timestamp is in the future.")
+        return value
+
+
+class RiderLocationBatchSerializer(serializers.Serializer):
+    """
+    Input serializer for the batch location upload endpoint.
+
+    ``points`` items are either objects ({"latitude", "longitude",
+    "timestamp", ...}) or compact arrays
+    [timestamp, latitude, longitude, accuracy?, heading?, speed?] where
+    timestamp is ISO-8601 or epoch milliseconds.
+    """
+
+    MAX_POINTS = 1000
+    COMPACT_FIELDS = ("timestamp", "latitude", "longitude", "accuracy", "heading", "speed")
+
+    points = serializers.ListField(
+        child=serializers.JSONField(), allow_empty=False, max_length=MAX_POINTS
+    )
+
+    def _expand(self, point):
+        if isinstance(point, (list, tuple)):
+            point = dict(zip(self.COMPACT_FIELDS, point))
+        if not isinstance(point, dict):
+            raise serializers.ValidationError("Each point must be an object or array.")
+        ts = point.get("timestamp")
+        if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+            try:
+                at = datetime.fromtimestamp(ts / 1000, tz=dt_timezone.utc)
+            except (OverflowError, OSError, ValueError):
+                raise serializers.ValidationError({"timestamp": ["Invalid timestamp."]})
+            point = {**point, "timestamp": at}
+        return point
+
+    def validate_points(self, points):
+        cleaned = []
+        errors = {}
+        for i, raw in enumerate(points):
+            try:
+                item = RiderLocationPointSerializer(data=self._expand(raw))
+            except serializers.ValidationError as exc:
+                errors[i] = exc.detail
+                continue
+            if item.is_valid():
+                cleaned.append(item.validated_data)
+            else:
+                errors[i] = item.errors
+        if errors:
+            raise serializers.ValidationError(errors)
+        return cleaned
+
+
 class RiderNotificationSerializer(serializers.ModelSerializer):
     """
     Serializer for rider notifications.
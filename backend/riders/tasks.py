@@ -55,3 +55,69 @@ def publish_random_order_offer():
     except Exception as e:
         logger.error(f"Error in publish_random_order_offer: {str(e)}")
         return False
+
+
+@shared_task
+def flush_rider_locations():
+    """
+    Write buffered rider GPS pings to the database in bulk.
+    Runs every RIDER_GPS_FLUSH_SECONDS via Celery Beat.
+    """
+    from .location_buffer import flush_location_buffer
+
+    try:
+        written = flush_location_buffer()
+        if written:
+            logger.info(f"flush_rider_locations: wrote {written} rider locations")
+        return written
+    except Exception as e:
+        logger.error(f"Error in flush_rider_locations: {str(e)}")
+        return 0
+
+
+@shared_task
+def compact_rider_location_history():
+    """
+    Purge expired rider location history and downsample old trails.
+    Runs daily via Celery Beat.
+    """
+    from .location_history import maintain_location_history
+
+    try:
+        return maintain_location_history()
+    except Exception as e:
+        logger.error(f"Error in compact_rider_location_history: {str(e)}")
+        return None
+
+
+@shared_task
+def drain_notification_outbox():
+    """
+    Send queued rider notifications.
+    Runs every NOTIFICATION_OUTBOX_DRAIN_SECONDS via Celery Beat.
+    """
+    from .outbox import drain_outbox
+
+    try:
+        stats = drain_outbox()
+        if stats["rows"]:
+            logger.info(f"drain_notification_outbox: {stats}")
+        return stats
+    except Exception as e:
+        logger.error(f"Error in drain_notification_outbox: {str(e)}")
+        return None
+
+
+@shared_task
+def purge_notification_outbox():
+    """
+    Delete finished notification outbox rows past retention.
+    Runs daily via Celery Beat.
+    """
+    from .outbox import purge_outbox
+
+    try:
+        return purge_outbox()
+    except Exception as e:
+        logger.error(f"Error in purge_notification_outbox: {str(e)}")
+        return 0
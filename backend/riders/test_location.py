@@ -1,3 +1,4 @@
+from unittest.mock import patch
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
@@ -84,3 +85,441 @@ class RiderLocationUpdateTests(TestCase):
         self.assertIsNone(loc.accuracy)
         self.assertIsNone(loc.heading)
         self.assertIsNone(loc.speed)
+
+
+class _FakeRedis:
+    """Just the hash commands the GPS buffer uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field.encode()] = value.encode()
+
+    def eval(self, script, numkeys, key, field, value, ts):
+        """The buffer's only script: HSET unless the stored fix is newer."""
+        import json
+
+        current = self.data.get(key, {}).get(field.encode())
+        if current is not None and json.loads(current).get("ts", 0) >= ts:
+            return 0
+        self.hset(key, field, value)
+        return 1
+
+    def hsetnx(self, key, field, value):
+        self.data.setdefault(key, {}).setdefault(field, value)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def rename(self, src, dst):
+        self.data[dst] = self.data.pop(src)
+
+    def expire(self, key, seconds):
+        pass
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class BufferedRiderLocationTests(TestCase):
+    def setUp(self):
+        from unittest.mock import patch
+
+        self.redis = _FakeRedis()
+        patcher = patch("riders.location_buffer._redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = APIClient()
+        self.riders = []
+        for i in range(3):
+            user = User.objects.create_user(
+                phone=f"98765000{i:02d}",
+                email=f"buffered{i}@example.com",
+                password="password123",
+            )
+            self.riders.append(Rider.objects.create(user=user, status="online"))
+        self.url = reverse("riders:rider-location-update")
+
+    def _ping(self, rider, lat, lng):
+        self.client.force_authenticate(user=rider.user)
+        response = self.client.post(self.url, {"latitude": lat, "longitude": lng}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_pings_are_coalesced_into_one_flush(self):
+        from riders.location_buffer import flush_location_buffer
+
+        for step in range(5):
+            for i, rider in enumerate(self.riders):
+                self._ping(rider, f"6.{i}0000{step}", f"3.{i}0000{step}")
+
+        # Nothing written yet
+        self.assertFalse(RiderLocation.objects.exists())
+
+        with self.assertNumQueries(6):  # select, update, upsert, history insert, savepoint + release
+            self.assertEqual(flush_location_buffer(), 3)
+
+        for i, rider in enumerate(self.riders):
+            loc = RiderLocation.objects.get(rider=rider)
+            self.assertAlmostEqual(float(loc.latitude), float(f"6.{i}00004"), places=6)
+            rider.refresh_from_db()
+            self.assertAlmostEqual(float(rider.current_longitude), float(f"3.{i}00004"), places=6)
+            self.assertIsNotNone(rider.last_location_update)
+
+        # Buffer drained; a second flush is a no-op
+        self.assertEqual(flush_location_buffer(), 0)
+
+        self._ping(self.riders[0], "6.9000000", "3.9000000")
+        self.assertEqual(flush_location_buffer(), 1)
+        self.assertEqual(RiderLocation.objects.count(), 3)
+        self.assertAlmostEqual(
+            float(RiderLocation.objects.get(rider=self.riders[0]).latitude), 6.9, places=6
+        )
+
+
+class RiderLocationBatchUploadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            phone="9876543299",
+            email="batchrider@example.com",
+            password="password123",
+        )
+        self.rider = Rider.objects.create(user=self.user, status="online")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("riders:rider-location-batch")
+
+    def test_points_are_deduped_ordered_and_stored(self):
+        from riders.models import RiderLocationHistory
+
+        points = [
+            {"latitude": "6.5000000", "longitude": "3.5000000", "timestamp": "2025-01-01T10:02:00Z"},
+            {"latitude": "6.1000000", "longitude": "3.1000000", "timestamp": "2025-01-01T10:00:00Z", "speed": 4.0},
+            {"latitude": "6.3000000", "longitude": "3.3000000", "timestamp": "2025-01-01T10:01:00Z"},
+            # Resent point: last copy wins
+            {"latitude": "6.3100000", "longitude": "3.3100000", "timestamp": "2025-01-01T10:01:00Z"},
+        ]
+        response = self.client.post(self.url, {"points": points}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["unique"], 3)
+        self.assertEqual(response.data["duplicates"], 1)
+        self.assertTrue(response.data["current_updated"])
+
+        history = list(RiderLocationHistory.objects.filter(rider=self.rider).order_by("recorded_at"))
+        self.assertEqual([float(h.latitude) for h in history], [6.1, 6.31, 6.5])
+        self.assertEqual(history[0].speed, 4.0)
+
+        # Newest point is the current position
+        loc = RiderLocation.objects.get(rider=self.rider)
+        self.assertAlmostEqual(float(loc.latitude), 6.5, places=6)
+        self.rider.refresh_from_db()
+        self.assertEqual(self.rider.last_location_update.isoformat(), "2025-01-01T10:02:00+00:00")
+
+        # Retrying the same upload adds nothing
+        self.client.post(self.url, {"points": points}, format="json")
+        self.assertEqual(RiderLocationHistory.objects.filter(rider=self.rider).count(), 3)
+
+    def test_compact_points_with_epoch_millis(self):
+        from riders.models import RiderLocationHistory
+
+        points = [
+            [1735725600000, 6.45, 3.39, 5.0, 90.0, 8.2],
+            [1735725660000, 6.46, 3.40],
+        ]
+        response = self.client.post(self.url, {"points": points}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first = RiderLocationHistory.objects.filter(rider=self.rider).order_by("recorded_at").first()
+        self.assertEqual(first.recorded_at.isoformat(), "2025-01-01T10:00:00+00:00")
+        self.assertEqual(first.heading, 90.0)
+        self.assertAlmostEqual(float(RiderLocation.objects.get(rider=self.rider).latitude), 6.46, places=6)
+
+    def test_stale_batch_does_not_move_current_position(self):
+        self.client.post(
+            reverse("riders:rider-location-update"),
+            {"latitude": "6.9000000", "longitude": "3.9000000"},
+            format="json",
+        )
+        # Fresh user, as a real request would load, so rider_profile is not stale
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        response = self.client.post(
+            self.url,
+            {"points": [[1735725600000, 6.45, 3.39]]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["current_updated"])
+        self.assertAlmostEqual(float(RiderLocation.objects.get(rider=self.rider).latitude), 6.9, places=6)
+
+    def test_stale_batch_does_not_overwrite_buffered_live_ping(self):
+        redis = _FakeRedis()
+        with patch("riders.location_buffer._redis", return_value=redis):
+            self.client.post(
+                reverse("riders:rider-location-update"),
+                {"latitude": "6.9000000", "longitude": "3.9000000"},
+                format="json",
+            )
+            # The live ping is only in the buffer, not yet on the rider row
+            self.rider.refresh_from_db()
+            self.assertIsNone(self.rider.last_location_update)
+
+            self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+            response = self.client.post(
+                self.url, {"points": [[1735725600000, 6.45, 3.39]]}, format="json"
+            )
+            self.assertFalse(response.data["current_updated"])
+
+            from riders.location_buffer import flush_location_buffer
+
+            flush_location_buffer()
+        self.assertAlmostEqual(float(RiderLocation.objects.get(rider=self.rider).latitude), 6.9, places=6)
+
+    def test_invalid_points_return_400(self):
+        for body in ({"points": []}, {"points": [[1735725600000, 6.45]]}, {"points": ["x"]}):
+            response = self.client.post(self.url, body, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body)
+            self.assertFalse(response.data["success"])
+
+    def test_future_timestamp_returns_400(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        ahead = (timezone.now() + timedelta(hours=1)).isoformat()
+        response = self.client.post(
+            self.url,
+            {"points": [{"latitude": "6.5", "longitude": "3.5", "timestamp": ahead}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("future", str(response.data))
+        self.rider.refresh_from_db()
+        self.assertIsNone(self.rider.last_location_update)
+
+    def test_write_never_moves_position_back_in_time(self):
+        from riders.location_buffer import write_locations
+        from riders.models import RiderLocationHistory
+
+        def ping(lat, at):
+            return {str(self.rider.id): {"lat": lat, "lng": "3.5", "at": at}}
+
+        self.assertEqual(write_locations(ping("6.9", "2025-01-01T10:05:00+00:00")), 1)
+        # A late fix (e.g. re-queued by a failed flush) only goes to history
+        self.assertEqual(write_locations(ping("6.1", "2025-01-01T10:00:00+00:00")), 0)
+
+        self.rider.refresh_from_db()
+        self.assertAlmostEqual(float(self.rider.current_latitude), 6.9, places=6)
+        self.assertEqual(self.rider.last_location_update.isoformat(), "2025-01-01T10:05:00+00:00")
+        self.assertAlmostEqual(float(RiderLocation.objects.get(rider=self.rider).latitude), 6.9, places=6)
+        self.assertEqual(RiderLocationHistory.objects.filter(rider=self.rider).count(), 2)
+
+    def test_out_of_range_epoch_timestamp_returns_400(self):
+        response = self.client.post(
+            self.url, {"points": [[1735725600000, 6.45, 3.39], [1e20, 6.46, 3.40]]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("timestamp", str(response.data))
+
+
+class RiderLocationHistoryMaintenanceTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            phone="9876543288",
+            email="historyrider@example.com",
+            password="password123",
+        )
+        self.rider = Rider.objects.create(user=user, status="online")
+
+    def _trail(self, start, points, step_seconds=10):
+        from datetime import timedelta
+        from riders.models import RiderLocationHistory
+
+        RiderLocationHistory.objects.bulk_create(
+            RiderLocationHistory(
+                rider=self.rider,
+                latitude=f"{lat:.7f}",
+                longitude=f"{lng:.7f}",
+                recorded_at=start + timedelta(seconds=i * step_seconds),
+            )
+            for i, (lat, lng) in enumerate(points)
+        )
+
+    def test_douglas_peucker_keeps_corners_and_endpoints(self):
+        from riders.location_history import douglas_peucker
+
+        # East along a street, then a right-angle turn north (~110m per 0.001 deg)
+        east = [(6.5, 3.3 + i * 0.0002) for i in range(11)]
+        north = [(6.5 + i * 0.0002, 3.302) for i in range(1, 11)]
+        kept = douglas_peucker(east + north, epsilon_m=5)
+        self.assertEqual(kept, [0, 10, 20])
+        self.assertEqual(douglas_peucker([(6.5, 3.3)], 5), [0])
+
+    def test_simplify_thins_old_trips_and_leaves_recent_points(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from riders.location_history import simplify_history
+        from riders.models import RiderLocationHistory
+
+        now = timezone.now()
+        line = [(6.5, 3.3 + i * 0.0002) for i in range(20)]
+        old = now - timedelta(days=10)
+        self._trail(old, line)
+        # Second trip an hour later: the gap keeps its endpoints separate
+        self._trail(old + timedelta(hours=1), line)
+        self._trail(now - timedelta(hours=1), line)
+
+        stats = simplify_history(before=now - timedelta(days=7), epsilon_m=5, trip_gap_minutes=10)
+        self.assertEqual(stats["scanned"], 40)
+        self.assertEqual(stats["kept"], 4)
+        self.assertEqual(stats["deleted"], 36)
+
+        history = RiderLocationHistory.objects.filter(rider=self.rider)
+        self.assertEqual(history.count(), 24)
+        self.assertEqual(history.filter(simplified=True).count(), 4)
+
+        # Already-simplified rows are not revisited
+        again = simplify_history(before=now - timedelta(days=7), epsilon_m=5)
+        self.assertEqual(again["scanned"], 0)
+
+    def test_purge_removes_expired_points(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from riders.location_history import purge_history
+        from riders.models import RiderLocationHistory
+
+        now = timezone.now()
+        self._trail(now - timedelta(days=400), [(6.5, 3.3), (6.6, 3.4)])
+        self._trail(now - timedelta(days=1), [(6.5, 3.3)])
+
+        self.assertEqual(purge_history(before=now - timedelta(days=180)), 2)
+        self.assertEqual(RiderLocationHistory.objects.filter(rider=self.rider).count(), 1)
+
+    def test_live_location_writes_append_history(self):
+        from riders.location_buffer import write_locations
+        from riders.models import RiderLocationHistory
+
+        ping = {"lat": "6.5", "lng": "3.3", "at": "2025-01-01T10:00:00+00:00"}
+        write_locations({str(self.rider.id): ping})
+        write_locations({str(self.rider.id): ping})
+        write_locations({str(self.rider.id): {**ping, "at": "2025-01-01T10:00:05+00:00"}})
+        self.assertEqual(RiderLocationHistory.objects.filter(rider=self.rider).count(), 2)
+
+
+class LocationStreamBatcherTests(TestCase):
+    def setUp(self):
+        self.riders = []
+        for i in range(2):
+            user = User.objects.create_user(
+                phone=f"98765111{i:02d}",
+                email=f"stream{i}@example.com",
+                password="password123",
+            )
+            self.riders.append(Rider.objects.create(user=user, status="online"))
+
+    def test_keeps_newest_fix_per_rider_and_drops_stale(self):
+        from riders.location_stream import LocationStreamBatcher
+
+        batcher = LocationStreamBatcher()
+        a, b = self.riders[0].rider_id, self.riders[1].rider_id
+        base = 1735725600000
+        self.assertTrue(batcher.add({"rider_id": a, "latitude": 6.1, "longitude": 3.1}, base))
+        self.assertTrue(batcher.add({"rider_id": a, "latitude": 6.2, "longitude": 3.2}, base + 1000))
+        # Arrived late: older than the fix already queued
+        self.assertFalse(batcher.add({"rider_id": a, "latitude": 6.0, "longitude": 3.0}, base + 500))
+        self.assertTrue(batcher.add({"rider_id": b, "latitude": 7.1, "longitude": 4.1}, base))
+        self.assertTrue(batcher.add({"rider_id": "ZZZZZZ", "latitude": 1, "longitude": 1}, base))
+        self.assertFalse(batcher.add({"rider_id": a}, base))
+        self.assertFalse(batcher.add("not json", base))
+
+        with self.assertNumQueries(7):  # resolve riders + write_locations
+            self.assertEqual(batcher.write(batcher.take_pending()), 2)
+
+        loc = RiderLocation.objects.get(rider=self.riders[0])
+        self.assertAlmostEqual(float(loc.latitude), 6.2, places=6)
+        self.riders[0].refresh_from_db()
+        self.assertEqual(
+            self.riders[0].last_location_update.isoformat(), "2025-01-01T10:00:01+00:00"
+        )
+
+        # Older than what was written: stale even in a later batch
+        self.assertFalse(batcher.add({"rider_id": a, "latitude": 6.3, "longitude": 3.3}, base + 900))
+        self.assertTrue(batcher.add({"rider_id": a, "latitude": 6.4, "longitude": 3.4}, base + 2000))
+        # Rider codes are cached: no lookup query the second time
+        with self.assertNumQueries(6):
+            self.assertEqual(batcher.write(batcher.take_pending()), 1)
+
+        stats = batcher.take_stats()
+        self.assertEqual(stats["received"], 9)
+        self.assertEqual(stats["stale"], 2)
+        self.assertEqual(stats["invalid"], 2)
+        self.assertEqual(stats["unknown_rider"], 1)
+        self.assertEqual(stats["written"], 3)
+        self.assertEqual(batcher.take_stats()["received"], 0)
+
+    def test_bad_payloads_are_rejected_and_do_not_block_good_fixes(self):
+        from riders.location_stream import LocationStreamBatcher
+
+        batcher = LocationStreamBatcher()
+        a, b = self.riders[0].rider_id, self.riders[1].rider_id
+        base = 1735725600000
+        self.assertFalse(
+            batcher.add({"rider_id": a, "latitude": 6.1, "longitude": 3.1, "timestamp": 1e20}, base)
+        )
+        self.assertFalse(batcher.add({"rider_id": a, "latitude": 6.1, "longitude": 3.1}, -1e20))
+        self.assertFalse(batcher.add({"rider_id": b, "latitude": "north", "longitude": 4.1}, base))
+        self.assertTrue(batcher.add({"rider_id": a, "latitude": 6.2, "longitude": 3.2}, base))
+        self.assertEqual(batcher.take_stats()["invalid"], 3)
+
+        self.assertEqual(batcher.write(batcher.take_pending()), 1)
+        loc = RiderLocation.objects.get(rider=self.riders[0])
+        self.assertAlmostEqual(float(loc.latitude), 6.2, places=6)
+
+    def test_failed_write_does_not_make_retried_fixes_stale(self):
+        from riders.location_stream import LocationStreamBatcher
+
+        batcher = LocationStreamBatcher()
+        a = self.riders[0].rider_id
+        base = 1735725600000
+        batcher.add({"rider_id": a, "latitude": 6.2, "longitude": 3.2}, base)
+        with patch("riders.location_buffer.write_locations", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                batcher.write(batcher.take_pending())
+
+        self.assertTrue(batcher.add({"rider_id": a, "latitude": 6.2, "longitude": 3.2}, base))
+        self.assertEqual(batcher.write(batcher.take_pending()), 1)
+
+    def test_failed_batch_is_requeued_behind_newer_fixes(self):
+        from riders.location_stream import LocationStreamBatcher
+
+        batcher = LocationStreamBatcher()
+        a, b = self.riders[0].rider_id, self.riders[1].rider_id
+        base = 1735725600000
+        batcher.add({"rider_id": a, "latitude": 6.1, "longitude": 3.1}, base)
+        batcher.add({"rider_id": b, "latitude": 7.1, "longitude": 4.1}, base)
+        failed = batcher.take_pending()
+        # Rider a moved on while the write was failing
+        batcher.add({"rider_id": a, "latitude": 6.2, "longitude": 3.2}, base + 1000)
+
+        batcher.requeue(failed)
+
+        self.assertEqual(batcher.pending[a]["lat"], "6.2")
+        self.assertEqual(batcher.pending[b]["lat"], "7.1")
+        self.assertEqual(batcher.take_stats()["requeued"], 1)
+        self.assertEqual(batcher.write(batcher.take_pending()), 2)
+
+    def test_future_device_timestamp_is_rejected(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from riders.location_stream import LocationStreamBatcher
+
+        batcher = LocationStreamBatcher()
+        a = self.riders[0].rider_id
+        ahead = (timezone.now() + timedelta(days=1)).timestamp() * 1000
+        self.assertFalse(
+            batcher.add({"rider_id": a, "latitude": 6.1, "longitude": 3.1, "timestamp": ahead})
+        )
+        # A genuine fix afterwards is not treated as stale
+        self.assertTrue(batcher.add({"rider_id": a, "latitude": 6.2, "longitude": 3.2}))
+        self.assertEqual(batcher.take_stats()["invalid"], 1)
@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+from django.test import TestCase
+from firebase_admin import messaging
+
+from authentication.models import User
+from dispatcher.models import Rider
+from riders.models import RiderDevice, RiderNotification
+from riders.notifications import RiderPush, notify_rider, send_notifications
+
+
+class _StubMessaging:
+    """Records multicast requests; tokens in ``dead`` come back unregistered."""
+
+    def __init__(self, dead=()):
+        self.dead = set(dead)
+        self.calls = []
+
+    def send_each_for_multicast(self, message):
+        self.calls.append(message)
+        responses = [
+            SimpleNamespace(success=False, exception=messaging.UnregisteredError("gone"))
+            if token in self.dead
+            else SimpleNamespace(success=True, exception=None)
+            for token in message.tokens
+        ]
+        ok = sum(r.success for r in responses)
+        return SimpleNamespace(
+            responses=responses, success_count=ok, failure_count=len(responses) - ok
+        )
+
+
+class SendNotificationsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            [
+                User(phone=f"0810{i:07d}", email=f"push-{i}@example.com", usertype="Rider")
+                for i in range(3)
+            ]
+        )
+        Rider.objects.bulk_create(
+            [Rider(user=user, rider_id=f"{810000 + i}") for i, user in enumerate(users)]
+        )
+        cls.riders = list(Rider.objects.filter(rider_id__startswith="81").order_by("rider_id"))
+        for i, rider in enumerate(cls.riders):
+            RiderDevice.objects.create(rider=rider, device_id=f"push-d{i}", fcm_token=f"tok-{i}")
+        RiderDevice.objects.create(
+            rider=cls.riders[0], device_id="push-d0b", fcm_token="tok-0b"
+        )
+        RiderDevice.objects.create(
+            rider=cls.riders[1], device_id="push-off", fcm_token="tok-off", is_active=False
+        )
+
+    def test_groups_identical_payloads_into_one_multicast(self):
+        client = _StubMessaging()
+        items = [
+            RiderPush(self.riders[0], "New Order", "Pickup A", {"order_number": "A1"}),
+            RiderPush(self.riders[1], "New Order", "Pickup A", {"order_number": "A1"}),
+            RiderPush(self.riders[2], "Order Completed", "Done", {"net_earning": 120}),
+        ]
+
+        with self.assertNumQueries(2):  # bulk insert + token lookup
+            stats = send_notifications(items, client=client)
+
+        self.assertEqual(stats, {"notifications": 3, "sent": 4, "failed": 0, "pruned": 0})
+        self.assertEqual(RiderNotification.objects.count(), 3)
+        self.assertEqual(len(client.calls), 2)
+        self.assertEqual(sorted(client.calls[0].tokens), ["tok-0", "tok-0b", "tok-1"])
+        # Data payload values are coerced to strings for FCM
+        self.assertEqual(client.calls[1].data, {"net_earning": "120"})
+
+    def test_large_audiences_are_split_into_500_token_batches(self):
+        from riders import notifications
+
+        client = _StubMessaging()
+        tokens = [f"bulk-{i}" for i in range(1203)]
+        sent, failed, dead = notifications.send_multicast(tokens, "t", "b", client=client)
+        self.assertEqual([len(c.tokens) for c in client.calls], [500, 500, 203])
+        self.assertEqual((sent, failed, dead), (1203, 0, []))
+
+    def test_unregistered_tokens_deactivate_their_devices(self):
+        client = _StubMessaging(dead={"tok-0b"})
+        stats = notify_rider(self.riders[0], "Hi", "There", client=client)
+
+        self.assertEqual(stats["sent"], 1)
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["pruned"], 1)
+        self.assertFalse(RiderDevice.objects.get(device_id="push-d0b").is_active)
+        self.assertTrue(RiderDevice.objects.get(device_id="push-d0").is_active)
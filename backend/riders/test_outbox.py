@@ -0,0 +1,204 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from authentication.models import User
+from dispatcher.models import Rider, SystemSettings
+from orders.models import Order, Vehicle
+from riders.models import NotificationOutbox, RiderDevice, RiderNotification
+from riders.outbox import drain_outbox, queue_new_order_fanout, queue_rider_notification
+from riders.test_notifications import _StubMessaging
+
+
+class _BrokenMessaging:
+    def send_each_for_multicast(self, message):
+        raise ConnectionError("FCM unreachable")
+
+
+class _PartlyBrokenMessaging(_StubMessaging):
+    """Requests carrying a token in ``broken`` raise; the rest go out."""
+
+    def __init__(self, broken):
+        super().__init__()
+        self.broken = set(broken)
+
+    def send_each_for_multicast(self, message):
+        if self.broken & set(message.tokens):
+            raise ConnectionError("FCM unreachable")
+        return super().send_each_for_multicast(message)
+
+
+class NotificationOutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.bike = Vehicle.objects.create(name="Bike", max_weight_kg=10, base_price=500)
+        SystemSettings.objects.create(auto_assign_radius_km=5, max_concurrent_bike=2)
+        users = User.objects.bulk_create(
+            [
+                User(phone=f"0811{i:07d}", email=f"outbox-{i}@example.com", usertype="Rider")
+                for i in range(2)
+            ]
+        )
+        Rider.objects.bulk_create(
+            [
+                Rider(
+                    user=user,
+                    rider_id=f"{811000 + i}",
+                    status="online",
+                    is_authorized=True,
+                    vehicle_type=cls.bike,
+                    current_latitude=Decimal(f"{6.5 + i * 0.01:.6f}"),
+                    current_longitude=Decimal("3.300000"),
+                )
+                for i, user in enumerate(users)
+            ]
+        )
+        cls.riders = list(Rider.objects.filter(rider_id__startswith="811").order_by("rider_id"))
+        for i, rider in enumerate(cls.riders):
+            RiderDevice.objects.create(rider=rider, device_id=f"outbox-d{i}", fcm_token=f"otok-{i}")
+        cls.merchant = User.objects.create(phone="08110000999", email="outbox-merchant@example.com")
+
+    def setUp(self):
+        from dispatcher import rider_index
+
+        cache.clear()
+        rider_index.invalidate_rider_index()
+        self.addCleanup(rider_index.invalidate_rider_index)
+
+    def _order(self, number):
+        return Order.objects.create(
+            order_number=number,
+            user=self.merchant,
+            vehicle=self.bike,
+            pickup_address="Pickup",
+            pickup_latitude=6.5,
+            pickup_longitude=3.3,
+            sender_name="Sender",
+            sender_phone="0800",
+            total_amount=Decimal("1000"),
+        )
+
+    def test_queueing_does_no_sending_until_drained(self):
+        client = _StubMessaging()
+        queue_rider_notification(self.riders[0], "Assigned", "Order #1", {"order_number": "1"})
+
+        self.assertFalse(RiderNotification.objects.exists())
+        stats = drain_outbox(client=client)
+
+        self.assertEqual(stats["sent"], 1)
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(RiderNotification.objects.filter(rider=self.riders[0]).count(), 1)
+        self.assertEqual(NotificationOutbox.objects.get().status, "sent")
+        # Nothing left to do
+        self.assertEqual(drain_outbox(client=client)["rows"], 0)
+
+    def test_new_order_offers_are_coalesced_per_rider(self):
+        client = _StubMessaging()
+        for number in ("OB-1", "OB-2", "OB-3"):
+            queue_new_order_fanout(self._order(number), "New Order Available", f"Pickup {number}")
+
+        drain_outbox(client=client)
+
+        # One multicast: both riders get the same coalesced payload
+        self.assertEqual(len(client.calls), 1)
+        message = client.calls[0]
+        self.assertEqual(sorted(message.tokens), ["otok-0", "otok-1"])
+        self.assertEqual(message.notification.title, "3 New Orders Available")
+        self.assertEqual(message.data["order_numbers"], "OB-1,OB-2,OB-3")
+        self.assertEqual(RiderNotification.objects.count(), 2)
+        self.assertEqual(NotificationOutbox.objects.filter(status="sent").count(), 3)
+
+    def test_orders_taken_before_drain_are_not_offered(self):
+        client = _StubMessaging()
+        order = self._order("OB-TAKEN")
+        queue_new_order_fanout(order, "New Order Available", "Pickup")
+        Order.objects.filter(pk=order.pk).update(status="Assigned")
+
+        drain_outbox(client=client)
+        self.assertEqual(client.calls, [])
+        self.assertEqual(NotificationOutbox.objects.get().status, "sent")
+
+    @override_settings(NOTIFICATION_RETRY_BASE_SECONDS=30, NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_failed_sends_back_off_then_fail(self):
+        row = queue_rider_notification(self.riders[0], "Assigned", "Order #1")
+
+        stats = drain_outbox(client=_BrokenMessaging())
+        self.assertEqual(stats["retried"], 1)
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.retry_count), ("pending", 1))
+        self.assertGreater(row.next_attempt_at, timezone.now() + timedelta(seconds=25))
+        self.assertIn("FCM unreachable", row.error_message)
+        # In-app notification written once, on the first attempt
+        self.assertEqual(RiderNotification.objects.count(), 1)
+
+        # Not due yet
+        self.assertEqual(drain_outbox(client=_BrokenMessaging())["rows"], 0)
+
+        NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+        stats = drain_outbox(client=_BrokenMessaging())
+        self.assertEqual(stats["failed"], 1)
+        row.refresh_from_db()
+        self.assertEqual(row.status, "failed")
+        self.assertEqual(RiderNotification.objects.count(), 1)
+
+    def test_retry_succeeds_without_duplicating_inbox_row(self):
+        queue_rider_notification(self.riders[0], "Assigned", "Order #1")
+        drain_outbox(client=_BrokenMessaging())
+        NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+
+        client = _StubMessaging()
+        self.assertEqual(drain_outbox(client=client)["sent"], 1)
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(RiderNotification.objects.count(), 1)
+
+    def test_partial_fanout_failure_retries_only_the_missed_riders(self):
+        from unittest.mock import patch
+
+        row = queue_new_order_fanout(self._order("OB-P1"), "New Order Available", "Pickup P1")
+
+        # One token per request, so rider 1's request fails on its own
+        with patch("riders.notifications.FCM_MULTICAST_LIMIT", 1):
+            client = _PartlyBrokenMessaging(broken={"otok-1"})
+            stats = drain_outbox(client=client)
+        self.assertEqual(stats["retried"], 1)
+        self.assertEqual([m.tokens for m in client.calls], [["otok-0"]])
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.retry_count), ("pending", 1))
+        self.assertEqual(RiderNotification.objects.count(), 2)
+
+        # A new order joins before the retry
+        queue_new_order_fanout(self._order("OB-P2"), "New Order Available", "Pickup P2")
+        NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+        client = _StubMessaging()
+        stats = drain_outbox(client=client)
+
+        self.assertEqual(stats["sent"], 2)
+        pushes = {tuple(m.tokens): m for m in client.calls}
+        # Rider 0 already had OB-P1: only the new order
+        self.assertEqual(pushes[("otok-0",)].notification.body, "Pickup P2")
+        self.assertEqual(pushes[("otok-1",)].data["order_numbers"], "OB-P1,OB-P2")
+        # Rider 1 already has the in-app row for OB-P1, but not for OB-P2
+        self.assertEqual(RiderNotification.objects.filter(rider=self.riders[0]).count(), 2)
+        self.assertEqual(RiderNotification.objects.filter(rider=self.riders[1]).count(), 2)
+        self.assertEqual(NotificationOutbox.objects.filter(status="sent").count(), 2)
+
+    @override_settings(NOTIFICATION_MAX_PER_MINUTE=1)
+    def test_global_rate_limit_defers_excess(self):
+        client = _StubMessaging()
+        queue_rider_notification(self.riders[0], "A", "a")
+        queue_rider_notification(self.riders[1], "B", "b")
+
+        stats = drain_outbox(client=client)
+        self.assertEqual((stats["sent"], stats["deferred"]), (1, 1))
+        self.assertEqual(NotificationOutbox.objects.filter(status="pending").count(), 1)
+
+    def test_only_one_drainer_at_a_time(self):
+        from riders.outbox import OUTBOX_LOCK_KEY
+
+        queue_rider_notification(self.riders[0], "A", "a")
+        cache.add(OUTBOX_LOCK_KEY, "someone-else", 60)
+        self.assertEqual(drain_outbox(client=_StubMessaging())["rows"], 0)
+        self.assertEqual(NotificationOutbox.objects.get().status, "pending")
@@ -16,6 +16,7 @@ from .views import (
     RiderWalletInfoView,
     RiderTransactionListView,
     RiderLocationUpdateView,
+    RiderLocationBatchUploadView,
     RiderNotificationListView,
     RiderNotificationDetailView,
     RiderNotificationMarkReadView,
@@ -71,6 +72,11 @@ urlpatterns = [
         RiderLocationUpdateView.as_view(),
         name="rider-location-update",
     ),
+    path(
+        "location/batch/",
+        RiderLocationBatchUploadView.as_view(),
+        name="rider-location-batch",
+    ),
     path(
         "notifications/",
         RiderNotificationListView.as_view(),
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 from datetime import timedelta
 from django.utils import timezone
@@ -24,6 +23,7 @@ from .serializers import (
     RiderWalletInfoSerializer,
     RiderTransactionSerializer,
     RiderLocationSerializer,
+    RiderLocationBatchSerializer,
     RiderNotificationSerializer,
 )
 from orders.serializers import AssignedOrderSerializer
@@ -33,7 +33,6 @@ from .models import (
     AreaDemand,
     OrderOffer,
     RiderCodRecord,
-    RiderLocation,
     RiderNotification,
 )
 from wallet.models import Wallet, Transaction
@@ -41,7 +40,8 @@ from dispatcher.models import Rider
 from orders.models import Order
 from orders.permissions import IsRider
 from dispatcher.utils import emit_activity
-from .notifications import notify_rider
+from .outbox import queue_rider_notification
+from .location_buffer import buffer_ping, ingest_location_batch, write_locations
 
 logger = logging.getLogger(__name__)
 
@@ -52,29 +52,16 @@ def publish_order_assigned_event(order, rider):
     order payload when an order is assigned to a rider.
     """
     try:
-        from django.conf import settings
-        from ably import AblyRest
-
-        api_key = getattr(settings, "ABLY_API_KEY", "")
-        if not api_key:
-            logger.warning(
-                "publish_order_assigned_event: ABLY_API_KEY not configured, skipping publish"
-            )
-            return
+        from dispatcher.ably_publisher import publish
 
         payload = AssignedOrderSerializer(order).data
         channel_name = f"for-you-{rider.rider_id}"
 
-        async def _publish():
-            client = AblyRest(api_key)
-            channel = client.channels.get(channel_name)
-            await channel.publish("order_assigned", payload)
-
-        asyncio.run(_publish())
-        logger.info(
-            f"publish_order_assigned_event: published order {order.order_number} "
-            f"to Ably channel '{channel_name}'."
-        )
+        if publish(channel_name, "order_assigned", payload):
+            logger.info(
+                f"publish_order_assigned_event: queued order {order.order_number} "
+                f"for Ably channel '{channel_name}'."
+            )
     except Exception as exc:
         logger.error(
             f"publish_order_assigned_event: Ably publish failed for order "
@@ -191,12 +178,14 @@ class OrderOfferAcceptView(APIView):
 
             # 7. Push notification to rider
             try:
-                notify_rider(
-                    rider=rider,
-                    title="Order Assigned 📦",
-                    body=f"You've been assigned order #{order.order_number}. Head to the pickup location.",
-                    data={"order_number": order.order_number, "status": "Assigned"},
-                )
+                # Savepoint: a failed insert must not roll back the assignment
+                with transaction.atomic():
+                    queue_rider_notification(
+                        rider=rider,
+                        title="Order Assigned 📦",
+                        body=f"You've been assigned order #{order.order_number}. Head to the pickup location.",
+                        data={"order_number": order.order_number, "status": "Assigned"},
+                    )
             except Exception as exc:
                 logger.warning(f"Assignment notification failed: {exc}")
 
@@ -798,6 +787,9 @@ class RiderLocationUpdateView(APIView):
     Mobile app regularly POSTs GPS coordinates here.
     Creates or updates the single RiderLocation record for the authenticated rider
     and mirrors the coords onto the Rider master profile for fast lookups.
+
+    With Redis available the ping is buffered and written in bulk by the
+    flush_rider_locations beat task (see riders.location_buffer).
     """
 
     permission_classes = [permissions.IsAuthenticated, IsRider]
@@ -819,32 +811,64 @@ class RiderLocationUpdateView(APIView):
 
         data = serializer.validated_data
 
-        # Upsert the dedicated location record (one row per rider)
-        RiderLocation.objects.update_or_create(
-            rider=rider,
-            defaults={
-                "latitude": data["latitude"],
-                "longitude": data["longitude"],
-                "accuracy": data.get("accuracy"),
-                "heading": data.get("heading"),
-                "speed": data.get("speed"),
-            },
-        )
+        if not buffer_ping(
+            rider.id,
+            data["latitude"],
+            data["longitude"],
+            accuracy=data.get("accuracy"),
+            heading=data.get("heading"),
+            speed=data.get("speed"),
+        ):
+            # No buffer: upsert the location row and mirror onto the profile now
+            write_locations(
+                {
+                    str(rider.id): {
+                        "lat": str(data["latitude"]),
+                        "lng": str(data["longitude"]),
+                        "accuracy": data.get("accuracy"),
+                        "heading": data.get("heading"),
+                        "speed": data.get("speed"),
+                        "at": timezone.now().isoformat(),
+                    }
+                }
+            )
 
-        # Mirror onto rider profile for quick access elsewhere in the system
-        rider.current_latitude = data["latitude"]
-        rider.current_longitude = data["longitude"]
-        rider.last_location_update = timezone.now()
-        rider.save(
-            update_fields=[
-                "current_latitude",
-                "current_longitude",
-                "last_location_update",
-            ]
+        return Response(
+            {"success": True, "message": "Location updated."},
+            status=status.HTTP_200_OK,
         )
 
+
+class RiderLocationBatchUploadView(APIView):
+    """
+    Offline-buffered GPS upload: many timestamped points in one request.
+
+    POST /api/riders/location/batch/
+    {"points": [{"latitude": 6.45, "longitude": 3.39, "timestamp": "2025-01-01T10:00:00Z"}, ...]}
+    or compact: {"points": [[1735725600000, 6.45, 3.39, 5.0, 90.0, 8.2], ...]}
+    """
+
+    permission_classes = [permissions.IsAuthenticated, IsRider]
+
+    def post(self, request):
+        serializer = RiderLocationBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"success": False, "errors": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rider = getattr(request.user, "rider_profile", None)
+        if not rider:
+            return Response(
+                {"success": False, "message": "Rider profile not found."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        result = ingest_location_batch(rider, serializer.validated_data["points"])
+
         return Response(
-            {"success": True, "message": "Location updated."},
+            {"success": True, "message": "Locations recorded.", **result},
             status=status.HTTP_200_OK,
         )
 